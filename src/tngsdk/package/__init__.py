@@ -33,8 +33,9 @@
 import logging
 import os
 import sys
-from tngsdk.package import rest, cli
+from tngsdk.package import cli
 from tngsdk.package.logger import TangoLogger
+from tngsdk.package.scratch import SCRATCH
 
 
 # need to use __file__ in __init__.py to avoid dupl. logs
@@ -87,13 +88,22 @@ def run(args=None):
     setup_logging(args)
 
     if args.dump_swagger:
+        from tngsdk.package import rest  # service-only dependencies
         rest.dump_swagger(args)
-        LOG.info("Dumped Swagger API model to {}".format(
-            args.dump_swagger_path))
+        LOG.info("Dumped Swagger API model to %s", args.dump_swagger_path)
         exit(0)
+    if args.bench:
+        # run benchmarks and exit (non-zero on regressions)
+        exit(cli.bench(args))
+    if args.verify:
+        # verify packages and exit (non-zero on invalid packages)
+        exit(cli.verify(args))
+    # remove scratch workspaces left behind by killed processes
+    SCRATCH.sweep()
     # TODO validate if args combination makes any sense
     if args.service:
         # start tng-sdk-package in service mode (REST API)
+        from tngsdk.package import rest  # service-only dependencies
         rest.serve_forever(args)
     else:
         # run package in CLI mode
@@ -0,0 +1,227 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+"""
+Resource accounting of single (un)packaging processes:
+CPU time and I/O of the process thread (plus the uploads done
+by helper threads), traced memory at stage boundaries and
+scratch-disk usage.
+"""
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from tngsdk.package.logger import TangoLogger
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+def start_tracemalloc():
+    """
+    Traced memory is only recorded if tracemalloc is running
+    (TRACEMALLOC=true or python -X tracemalloc), because it
+    slows down every allocation.
+    """
+    if (os.environ.get("TRACEMALLOC", "false").lower() == "true"
+            and not tracemalloc.is_tracing()):
+        tracemalloc.start()
+
+
+def thread_cpu_time():
+    """
+    CPU time of the calling thread in seconds.
+    """
+    if hasattr(time, "thread_time"):  # Python >= 3.7
+        return time.thread_time()
+    if hasattr(resource, "RUSAGE_THREAD"):  # Linux
+        r = resource.getrusage(resource.RUSAGE_THREAD)
+        return r.ru_utime + r.ru_stime
+    return None
+
+
+def thread_io_counters():
+    """
+    (bytes read, bytes written) by the calling thread
+    (Linux only) or (None, None).
+    """
+    counters = dict()
+    try:
+        with open("/proc/thread-self/io") as f:
+            for l in f:
+                k, v = l.split(":")
+                counters[k.strip()] = int(v)
+    except (IOError, OSError, ValueError):
+        return None, None
+    return counters.get("rchar"), counters.get("wchar")
+
+
+def disk_usage(path):
+    """
+    Bytes used by the files below path.
+    """
+    if path is None or not os.path.exists(path):
+        return 0
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+def _delta(end, start):
+    if end is None or start is None:
+        return None
+    return end - start
+
+
+def _plus(value, extra):
+    if value is None:
+        return extra if extra > 0 else None
+    return value + extra
+
+
+# account of the process a thread works for
+_CONTEXT = threading.local()
+
+
+def current_account():
+    """
+    ResourceAccount of the process the calling thread works for
+    or None.
+    """
+    return getattr(_CONTEXT, "account", None)
+
+
+def set_current_account(account):
+    """
+    Sets the account of the calling thread, e.g., of a helper
+    thread working for a process. Returns the previous one.
+    """
+    prev = current_account()
+    _CONTEXT.account = account
+    return prev
+
+
+class ResourceAccount(object):
+    """
+    Resource consumption of one (un)packaging process.
+    Has to be started, updated and finished in the thread
+    that runs the process. I/O of helper threads (e.g.,
+    concurrent uploads) is added with add_io().
+    Traced memory is process-wide: concurrent processes
+    influence each other's values.
+    """
+
+    def __init__(self):
+        self.stages = list()
+        self.scratch_paths = list()
+        self._t_start = None
+        self._cpu_start = None
+        self._io_start = (None, None)
+        self._stage_cpu_start = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._helper_read = 0
+        self._helper_written = 0
+        self.bytes_uploaded = 0
+
+    def start(self):
+        start_tracemalloc()
+        self._thread = threading.current_thread()
+        set_current_account(self)
+        self._t_start = time.time()
+        self._cpu_start = self._stage_cpu_start = thread_cpu_time()
+        self._io_start = thread_io_counters()
+        return self
+
+    def add_scratch_path(self, path):
+        """
+        Registers a temporary file/directory used by the process.
+        """
+        if path is not None and path not in self.scratch_paths:
+            self.scratch_paths.append(path)
+
+    def add_io(self, read=0, written=0, uploaded=0):
+        """
+        Adds I/O done for the process by a helper thread. I/O of
+        the process thread itself is already counted (Linux).
+        """
+        if threading.current_thread() is self._thread:
+            read = written = 0
+        with self._lock:
+            self._helper_read += read
+            self._helper_written += written
+            self.bytes_uploaded += uploaded
+
+    def end_stage(self, stage):
+        """
+        Called at the end of each stage.
+        """
+        cpu = thread_cpu_time()
+        s = {"stage": stage,
+             "cpu_time": _delta(cpu, self._stage_cpu_start),
+             "traced_memory": None,
+             "traced_memory_peak": None}
+        if tracemalloc.is_tracing():
+            s["traced_memory"], s["traced_memory_peak"] = \
+                tracemalloc.get_traced_memory()
+            if hasattr(tracemalloc, "reset_peak"):  # Python >= 3.9
+                tracemalloc.reset_peak()
+        self._stage_cpu_start = cpu
+        self.stages.append(s)
+
+    def finish(self):
+        """
+        Returns the resource consumption (dict).
+        """
+        read, written = thread_io_counters()
+        if current_account() is self:
+            set_current_account(None)
+        peaks = [s["traced_memory_peak"] for s in self.stages
+                 if s["traced_memory_peak"] is not None]
+        return {"wall_time": time.time() - self._t_start,
+                "cpu_time": _delta(thread_cpu_time(), self._cpu_start),
+                "traced_memory_peak": max(peaks) if peaks else None,
+                "bytes_read": _plus(_delta(read, self._io_start[0]),
+                                    self._helper_read),
+                "bytes_written": _plus(_delta(written, self._io_start[1]),
+                                       self._helper_written),
+                "bytes_uploaded": self.bytes_uploaded,
+                "scratch_bytes": sum(
+                    [disk_usage(p) for p in self.scratch_paths]),
+                "stages": self.stages}
@@ -0,0 +1,113 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+"""
+Benchmark suite for tng-sdk-package. Generates a synthetic project
+and package (configurable number of files, file size distribution,
+descriptors and subfolders) and measures hashing, (un)zipping,
+metadata parsing, NAPDR merging, full 5GTANGO (un)packaging, OSM/ONAP
+packaging and the startup time of the CLI. Results are emitted as JSON.
+
+Usage: python -m tngsdk.package.benchmark -n 20 --sizes mixed
+"""
+import argparse
+import json
+import logging
+from tngsdk.package.logger import TangoLogger
+from tngsdk.package.benchmark.generator import SIZE_DISTRIBUTIONS
+from tngsdk.package.benchmark.suite import BENCHMARKS, run_suite
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+def parse_args(input_args=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks for tng-sdk-package")
+    parser.add_argument(
+        "-b", "--benchmarks", nargs="*", default=None,
+        choices=sorted(BENCHMARKS.keys()),
+        help="Benchmarks to run (default: all)")
+    parser.add_argument(
+        "-n", "--num-files", type=int, default=10,
+        help="Number of generic files in the synthetic project")
+    parser.add_argument(
+        "--sizes", default="mixed", choices=sorted(SIZE_DISTRIBUTIONS),
+        help="File size distribution of the generic files")
+    parser.add_argument(
+        "--vnfds", type=int, default=1,
+        help="Number of VNFDs per platform (5GTANGO, OSM, ONAP)")
+    parser.add_argument(
+        "--subfolders", type=int, default=2,
+        help="Number of subfolders the generic files are spread over")
+    parser.add_argument(
+        "--meta-blocks", type=int, default=100,
+        help="Number of blocks of the parsed meta files and NAPDRs")
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=None,
+        help="Repetitions per benchmark (default: per benchmark)")
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="Seed for the generated contents")
+    parser.add_argument(
+        "--workdir", default=None,
+        help="Folder for the generated files (default: temp. folder)")
+    parser.add_argument(
+        "-o", "--output", default=None,
+        help="Write JSON results to this file (default: stdout)")
+    return parser.parse_args(input_args)
+
+
+def run(args):
+    return run_suite(benchmarks=args.benchmarks,
+                     repeat=args.repeat,
+                     workdir=args.workdir,
+                     num_files=args.num_files,
+                     size_distribution=args.sizes,
+                     num_vnfds=args.vnfds,
+                     subfolders=args.subfolders,
+                     meta_blocks=args.meta_blocks,
+                     seed=args.seed)
+
+
+def main(input_args=None):
+    args = parse_args(input_args)
+    # keep the packager logging out of the measurements
+    TangoLogger.reconfigure_all_tango_loggers(
+        log_level=logging.ERROR, log_json=False)
+    results = run(args)
+    out = json.dumps(results, indent=2, sort_keys=True)
+    if args.output is None:
+        print(out)
+    else:
+        with open(args.output, "w") as f:
+            f.write(out + "\n")
+        LOG.error("Wrote benchmark results to %s", args.output)
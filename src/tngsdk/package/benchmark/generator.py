@@ -0,0 +1,209 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+"""
+Generator for synthetic 5GTANGO projects (and packages) used by the
+benchmarks. Projects are fully determined by the given parameters
+(and seed), so that results of different runs can be compared.
+"""
+import os
+import random
+import yaml
+
+
+# named file size distributions: list of (min. size, max. size, weight)
+SIZE_DISTRIBUTIONS = {
+    "small": [(512, 16 * 1024, 1)],
+    "mixed": [(512, 16 * 1024, 8),
+              (64 * 1024, 512 * 1024, 3),
+              (2 * 1024 * 1024, 8 * 1024 * 1024, 1)],
+    "large": [(16 * 1024 * 1024, 64 * 1024 * 1024, 1)]}
+
+
+TANGO_NSD = {"descriptor_schema": "https://raw.githubusercontent.com/"
+             "sonata-nfv/tng-schema/master/service-descriptor/nsd-schema.yml",
+             "vendor": "eu.5gtango.bench",
+             "version": "0.1",
+             "author": "tng-sdk-package benchmark",
+             "description": "Synthetic network service."}
+
+
+TANGO_VNFD = {"descriptor_schema": "https://raw.githubusercontent.com/"
+              "sonata-nfv/tng-schema/master/function-descriptor/"
+              "vnfd-schema.yml",
+              "vendor": "eu.5gtango.bench",
+              "version": "0.1",
+              "author": "tng-sdk-package benchmark",
+              "description": "Synthetic VNF.",
+              "virtual_deployment_units": [
+                  {"id": "vdu01",
+                   "vm_image": "eu.5gtango.bench.image",
+                   "vm_image_format": "qcow2"}]}
+
+
+def _osm_nsd(name, vnfds):
+    return {"nsd:nsd-catalog": {"nsd": [
+        {"id": name, "name": name, "short-name": name,
+         "vendor": "eu.5gtango.bench", "version": "1.0",
+         "constituent-vnfd": [{"member-vnf-index": i + 1,
+                               "vnfd-id-ref": v}
+                              for i, v in enumerate(vnfds)]}]}}
+
+
+def _osm_vnfd(name):
+    return {"vnfd:vnfd-catalog": {"vnfd": [
+        {"id": name, "name": name, "short-name": name,
+         "vendor": "eu.5gtango.bench", "version": "1.0",
+         "vdu": [{"id": "vdu01", "image": "bench-image"}]}]}}
+
+
+def _onap_descriptor(name):
+    return {"tosca_definitions_version": "tosca_simple_yaml_1_0",
+            "metadata": {"template_name": name,
+                         "template_version": "1.0",
+                         "template_author": "tng-sdk-package benchmark"},
+            "description": name,
+            "topology_template": {"node_templates": dict()}}
+
+
+def random_bytes(rnd, size):
+    if size < 1:
+        return b""
+    return rnd.getrandbits(8 * size).to_bytes(size, "little")
+
+
+def file_sizes(num_files, distribution="mixed", seed=0):
+    """
+    Returns a list of num_files file sizes drawn from the
+    given distribution (name or list of (min, max, weight)).
+    """
+    if isinstance(distribution, str):
+        distribution = SIZE_DISTRIBUTIONS[distribution]
+    rnd = random.Random(seed)
+    weights = [d[2] for d in distribution]
+    sizes = list()
+    for _ in range(num_files):
+        lo, hi, _ = rnd.choices(distribution, weights=weights)[0]
+        sizes.append(rnd.randint(lo, hi))
+    return sizes
+
+
+def generate_project(path, num_files=10, size_distribution="mixed",
+                     platforms=("5gtango", "osm", "onap"), num_vnfds=1,
+                     subfolders=2, name="bench-ns", seed=0):
+    """
+    Writes a synthetic 5GTANGO project to path:
+    - one NSD and num_vnfds VNFDs per platform (5gtango, osm, onap)
+    - num_files generic files with random content, spread
+      over the given number of subfolders
+    Returns the path of the project.
+    """
+    rnd = random.Random(seed)
+    os.makedirs(path, exist_ok=True)
+    files = list()
+
+    def _write(rel_path, data, mime, tags=None):
+        p = os.path.join(path, rel_path)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        mode = "wb" if isinstance(data, bytes) else "w"
+        with open(p, mode) as f:
+            f.write(data)
+        files.append({"path": rel_path, "type": mime,
+                      "tags": tags if tags is not None else list()})
+
+    # descriptors
+    for pf in platforms:
+        vnfd_names = ["{}-{}-vnf{}".format(name, pf, i)
+                      for i in range(num_vnfds)]
+        if pf == "5gtango":
+            for vn in vnfd_names:
+                d = dict(TANGO_VNFD, name=vn)
+                _write("Definitions/{}.yaml".format(vn),
+                       yaml.dump(d, default_flow_style=False),
+                       "application/vnd.5gtango.vnfd")
+            d = dict(TANGO_NSD, name=name, network_functions=[
+                {"vnf_id": "vnf{}".format(i),
+                 "vnf_vendor": TANGO_VNFD["vendor"],
+                 "vnf_name": vn,
+                 "vnf_version": TANGO_VNFD["version"]}
+                for i, vn in enumerate(vnfd_names)])
+            _write("Definitions/{}-nsd.yaml".format(name),
+                   yaml.dump(d, default_flow_style=False),
+                   "application/vnd.5gtango.nsd")
+        elif pf == "osm":
+            for vn in vnfd_names:
+                _write("osm_vnfd_{}.yaml".format(vn),
+                       yaml.dump(_osm_vnfd(vn), default_flow_style=False),
+                       "application/vnd.osm.vnfd")
+            _write("osm_nsd_{}.yaml".format(name),
+                   yaml.dump(_osm_nsd(name, vnfd_names),
+                             default_flow_style=False),
+                   "application/vnd.osm.nsd")
+        elif pf == "onap":
+            for vn in vnfd_names:
+                _write("onap_vnfd_{}.yaml".format(vn),
+                       yaml.dump(_onap_descriptor(vn),
+                                 default_flow_style=False),
+                       "application/vnd.onap.vnfd")
+            _write("onap_nsd_{}.yaml".format(name),
+                   yaml.dump(_onap_descriptor(name),
+                             default_flow_style=False),
+                   "application/vnd.onap.nsd")
+    # generic files (also added to the OSM/ONAP packages)
+    folders = ["Files{}".format(i) for i in range(max(1, subfolders))]
+    for i, size in enumerate(file_sizes(num_files, size_distribution,
+                                        seed=seed)):
+        _write("{}/file{}.bin".format(folders[i % len(folders)], i),
+               random_bytes(rnd, size), "application/octet-stream",
+               tags=["etsi.osm", "lf.onap"])
+    # project descriptor
+    pd = {"descriptor_extension": "yaml",
+          "version": "0.5",
+          "package": {"vendor": "eu.5gtango.bench",
+                      "name": name,
+                      "version": "0.1",
+                      "maintainer": "tng-sdk-package benchmark",
+                      "description": "Synthetic benchmark project."},
+          "files": files}
+    with open(os.path.join(path, "project.yml"), "w") as f:
+        yaml.dump(pd, f, default_flow_style=False)
+    return path
+
+
+def project_size(path):
+    """
+    Total size (bytes) of all files in the given folder.
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            total += os.path.getsize(os.path.join(root, f))
+    return total
@@ -0,0 +1,207 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+"""
+Standard benchmark scenarios used to qualify releases: runs the
+benchmark suite for a fixed set of inputs, records throughput,
+latency, peak RSS and I/O per scenario and compares the results
+against a baseline.
+"""
+import json
+import resource
+import sys
+import time
+from tngsdk.package.benchmark.suite import run_suite, environment_info, \
+    RESULT_FORMAT_VERSION
+from tngsdk.package.logger import TangoLogger
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+# name -> arguments of the benchmark context
+SCENARIOS = {
+    "small": {"num_files": 20, "size_distribution": "small"},
+    "mixed": {"num_files": 20, "size_distribution": "mixed"},
+    "large": {"num_files": 2, "size_distribution": "large"},
+    "many_descriptors": {"num_files": 5, "size_distribution": "small",
+                         "num_vnfds": 20, "subfolders": 5}}
+
+
+def _reset_peak_rss():
+    """
+    Resets the peak RSS of this process (Linux only).
+    Returns False if the peak can not be reset.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def _peak_rss():
+    """
+    Peak resident set size of this process in bytes.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for l in f:
+                if l.startswith("VmHWM:"):
+                    return int(l.split()[1]) * 1024
+    except (IOError, OSError):
+        pass
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return r if sys.platform == "darwin" else r * 1024
+
+
+def _io_counters():
+    """
+    Bytes read and written by this process (Linux only,
+    including page cache hits), or (None, None).
+    """
+    counters = dict()
+    try:
+        with open("/proc/self/io") as f:
+            for l in f:
+                k, v = l.split(":")
+                counters[k.strip()] = int(v)
+    except (IOError, OSError, ValueError):
+        return None, None
+    return counters.get("rchar"), counters.get("wchar")
+
+
+def run_scenario(name, repeat=None, workdir=None):
+    """
+    Runs the benchmark suite for one scenario. Returns the
+    results incl. peak RSS and bytes read/written.
+    """
+    rss_reset = _reset_peak_rss()
+    read_start, written_start = _io_counters()
+    t_start = time.perf_counter()
+    r = run_suite(repeat=repeat, workdir=workdir, **SCENARIOS[name])
+    duration = time.perf_counter() - t_start
+    read_end, written_end = _io_counters()
+    r["duration"] = duration
+    r["peak_rss"] = _peak_rss()
+    # without a reset the peak covers the whole process lifetime
+    r["peak_rss_scope"] = "scenario" if rss_reset else "process"
+    r["bytes_read"] = (read_end - read_start
+                       if read_start is not None else None)
+    r["bytes_written"] = (written_end - written_start
+                          if written_start is not None else None)
+    # environment is reported once for all scenarios
+    del r["environment"]
+    del r["format_version"]
+    LOG.info("Scenario %s done (%.2fs)", name, duration)
+    return r
+
+
+def run_scenarios(scenarios=None, repeat=None, workdir=None):
+    """
+    Runs the given scenarios (default: all) and returns the
+    results file contents (dict).
+    """
+    if scenarios is None:
+        scenarios = sorted(SCENARIOS.keys())
+    for name in scenarios:
+        if name not in SCENARIOS:
+            raise ValueError("Unknown scenario: {}".format(name))
+    return {"format_version": RESULT_FORMAT_VERSION,
+            "timestamp": time.time(),
+            "environment": environment_info(),
+            "scenarios": {name: run_scenario(name, repeat, workdir)
+                          for name in scenarios}}
+
+
+def write_results(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_results(path):
+    with open(path, "r") as f:
+        results = json.load(f)
+    if results.get("format_version") != RESULT_FORMAT_VERSION:
+        raise ValueError(
+            "Unsupported format version of '{}': {} (expected: {})"
+            .format(path, results.get("format_version"),
+                    RESULT_FORMAT_VERSION))
+    return results
+
+
+def _check(checks, scenario, metric, current, baseline, threshold,
+           min_delta=0):
+    """
+    Records a single comparison. Higher values are worse.
+    """
+    if current is None or baseline is None or baseline <= 0:
+        return
+    change = (current - baseline) / baseline
+    checks.append({"scenario": scenario,
+                   "metric": metric,
+                   "baseline": baseline,
+                   "current": current,
+                   "change": change,
+                   "threshold": threshold,
+                   "regression": (change > threshold
+                                  and current - baseline > min_delta)})
+
+
+def compare(results, baseline, latency_threshold=0.1, rss_threshold=0.2,
+            min_latency_delta=0.001):
+    """
+    Compares results against a baseline. Latency (p50 wall time)
+    of each benchmark and peak RSS of each scenario regress if they
+    are more than the given fraction above the baseline.
+    Latency changes below min_latency_delta (seconds) are
+    considered noise.
+    Scenarios/benchmarks missing in one of both are skipped.
+    Returns a list of checks (dicts).
+    """
+    checks = list()
+    for sn, s in sorted(results.get("scenarios", {}).items()):
+        bs = baseline.get("scenarios", {}).get(sn)
+        if bs is None:
+            continue
+        for bn, b in sorted(s.get("results", {}).items()):
+            bb = bs.get("results", {}).get(bn)
+            if bb is None:
+                continue
+            _check(checks, sn, "{}.latency_p50".format(bn),
+                   b["wall_time"]["p50"], bb["wall_time"]["p50"],
+                   latency_threshold, min_delta=min_latency_delta)
+        _check(checks, sn, "peak_rss",
+               s.get("peak_rss"), bs.get("peak_rss"), rss_threshold)
+    return checks
@@ -0,0 +1,101 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+"""
+Startup time of tng-pkg: runs fresh interpreters to measure how
+long the tool takes to start and which modules it imports on the
+way (python -X importtime, Python >= 3.7).
+"""
+import os
+import subprocess
+import sys
+import tngsdk.package
+
+
+# only needed in service mode (REST API) or for online validation:
+# none of them must be imported to start the CLI
+LAZY_DEPENDENCIES = ["flask", "flask_restplus", "werkzeug", "requests",
+                     "jsonschema", "pyrfc3339", "coloredlogs"]
+
+# what 'tng-pkg -h' does
+CLI_HELP = ("import sys; from tngsdk.package import run;"
+            + " sys.argv = ['tng-pkg', '-h']; run()")
+
+
+def _env():
+    # make sure the subprocess imports this tngsdk.package
+    src = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(tngsdk.package.__file__))))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [src] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    return env
+
+
+def run_python(code, importtime=False):
+    """
+    Runs the given code in a fresh interpreter.
+    Returns its stderr output.
+    """
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    p = subprocess.run(cmd + ["-c", code], env=_env(),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                       universal_newlines=True, check=True)
+    return p.stderr
+
+
+def import_times(module="tngsdk.package"):
+    """
+    Imports module in a fresh interpreter.
+    Returns: {module: (self_us, cumulative_us)} for every
+    module that was imported.
+    """
+    times = dict()
+    out = run_python("import {}".format(module), importtime=True)
+    for l in out.splitlines():
+        if not l.startswith("import time:"):
+            continue
+        parts = l[len("import time:"):].split("|")
+        try:
+            times[parts[2].strip()] = (int(parts[0]), int(parts[1]))
+        except (IndexError, ValueError):
+            continue  # header line
+    return times
+
+
+def eager_dependencies(times):
+    """
+    Lazy dependencies that have been imported (see import_times).
+    """
+    roots = set([m.split(".")[0] for m in times])
+    return [d for d in LAZY_DEPENDENCIES if d in roots]
@@ -0,0 +1,411 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+"""
+Benchmarks of the hot paths of tng-sdk-package. Each benchmark
+is a function that gets a BenchmarkContext and returns a callable
+(one iteration), the number of bytes processed per iteration and,
+optionally, the number of operations per iteration.
+"""
+import io
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from tngsdk.package.helper import file_hash, \
+    creat_zip_file_from_directory, extract_zip_file_to_temp
+from tngsdk.package.packager.packager import NapdRecord, \
+    parse_block_based_meta_file
+from tngsdk.package.packager.tango_packager import TangoPackager
+from tngsdk.package.packager.osm_packager import OsmPackager
+from tngsdk.package.packager.onap_packager import OnapPackager
+from tngsdk.package.benchmark.generator import generate_project, \
+    project_size
+from tngsdk.package.benchmark.startup import run_python, CLI_HELP
+from tngsdk.package.logger import TangoLogger, TangoJsonLogHandler, \
+    JsonLogWriter
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+# version of the result format
+RESULT_FORMAT_VERSION = 1
+
+
+class BenchmarkContext(object):
+    """
+    Synthetic inputs shared by all benchmarks of one run.
+    """
+
+    def __init__(self, workdir, num_files=10, size_distribution="mixed",
+                 num_vnfds=1, subfolders=2, meta_blocks=100, seed=0):
+        self.workdir = workdir
+        self.num_files = num_files
+        self.size_distribution = size_distribution
+        self.num_vnfds = num_vnfds
+        self.subfolders = subfolders
+        self.meta_blocks = meta_blocks
+        self.seed = seed
+        self.project = None
+        self.package = None
+        self._outputs = list()
+        self._files = list()
+
+    def setup(self):
+        self.project = generate_project(
+            os.path.join(self.workdir, "project"),
+            num_files=self.num_files,
+            size_distribution=self.size_distribution,
+            num_vnfds=self.num_vnfds,
+            subfolders=self.subfolders,
+            seed=self.seed)
+        pkg_dir = os.path.join(self.workdir, "package")
+        os.makedirs(pkg_dir)
+        napdr = pack(TangoPackager, self.project, pkg_dir)
+        if napdr.error is not None:
+            raise BaseException(
+                "Could not create benchmark package: {}"
+                .format(napdr.error))
+        self.package = napdr.metadata["_storage_location"]
+        return self
+
+    def new_output_dir(self):
+        p = tempfile.mkdtemp(dir=self.workdir)
+        self._outputs.append(p)
+        return p
+
+    def cleanup_outputs(self):
+        for p in self._outputs:
+            shutil.rmtree(p, ignore_errors=True)
+        self._outputs = list()
+
+    def open_file(self, name):
+        """
+        Opens a file in the workdir for writing. It is closed
+        at the end of the run.
+        """
+        f = open(os.path.join(self.workdir, name), "w")
+        self._files.append(f)
+        return f
+
+    def close(self):
+        for f in self._files:
+            f.close()
+        self._files = list()
+
+    def largest_file(self):
+        files = list()
+        for root, _, fs in os.walk(self.project):
+            files.extend([os.path.join(root, f) for f in fs])
+        return max(files, key=os.path.getsize)
+
+    def info(self):
+        return {"num_files": self.num_files,
+                "size_distribution": self.size_distribution,
+                "num_vnfds": self.num_vnfds,
+                "subfolders": self.subfolders,
+                "meta_blocks": self.meta_blocks,
+                "seed": self.seed,
+                "project_bytes": project_size(self.project),
+                "package_bytes": os.path.getsize(self.package)}
+
+
+def _packager_args(input_args):
+    # avoid a circular import (cli imports the packagers)
+    from tngsdk.package.cli import parse_args
+    return parse_args(input_args + ["--offline", "--skip-validation"])
+
+
+def pack(packager_cls, project, output, pkg_format="eu.5gtango"):
+    """
+    Packs the given project (no validation, no PM registration).
+    """
+    args = _packager_args(["--format", pkg_format,
+                           "-p", project, "-o", output])
+    p = packager_cls(args)
+    try:
+        return p._do_package()
+    finally:
+        p.release_workspace()
+
+
+def unpack(packager_cls, package, in_memory=False):
+    """
+    Unpacks the given package (no validation, no storage).
+    in_memory: like a small upload that is kept in memory
+    """
+    args = _packager_args(["-u", package])
+    p = packager_cls(args)
+    if in_memory:
+        with open(package, "rb") as f:
+            p.package_data = f.read()
+    try:
+        return p._do_unpackage()
+    finally:
+        p.release_workspace()
+
+
+def bench_file_hash(ctx):
+    path = ctx.largest_file()
+    return lambda: file_hash(path), os.path.getsize(path)
+
+
+def bench_zip(ctx):
+    def _run():
+        creat_zip_file_from_directory(
+            ctx.project, os.path.join(ctx.new_output_dir(), "p.zip"))
+    return _run, project_size(ctx.project)
+
+
+def bench_unzip(ctx):
+    def _run():
+        extract_zip_file_to_temp(ctx.package, ctx.new_output_dir())
+    return _run, os.path.getsize(ctx.package)
+
+
+def bench_parse_meta(ctx):
+    blocks = list()
+    for i in range(ctx.meta_blocks):
+        blocks.append("Source: Files/file{}.bin\n"
+                      "Algorithm: SHA-256\n"
+                      "Hash: {}\n".format(i, "0" * 64))
+    content = "\n".join(blocks)
+
+    def _run():
+        parse_block_based_meta_file(io.StringIO(content))
+    return _run, len(content)
+
+
+def bench_napdr_update(ctx):
+    data = {"vendor": "eu.5gtango.bench", "name": "bench", "version": "0.1",
+            "metadata": {"tosca": [{"Entry-Definitions": "x"}]},
+            "package_content": [
+                {"source": "Files/file{}.bin".format(i),
+                 "algorithm": "SHA-256", "hash": "0" * 64,
+                 "content-type": "application/octet-stream",
+                 "tags": ["etsi.osm"]}
+                for i in range(ctx.meta_blocks)]}
+
+    def _run():
+        NapdRecord().update(data)
+    return _run, None
+
+
+def _bench_pack(packager_cls, pkg_format):
+    def _bench(ctx):
+        def _run():
+            r = pack(packager_cls, ctx.project, ctx.new_output_dir(),
+                     pkg_format=pkg_format)
+            if r.error is not None:
+                raise BaseException(r.error)
+        return _run, project_size(ctx.project)
+    return _bench
+
+
+def _bench_unpack(in_memory):
+    def _bench(ctx):
+        def _run():
+            r = unpack(TangoPackager, ctx.package, in_memory=in_memory)
+            if r.error is not None:
+                raise BaseException(r.error)
+        return _run, os.path.getsize(ctx.package)
+    return _bench
+
+
+def bench_inspect(ctx):
+    p = TangoPackager(_packager_args(["--inspect", ctx.package]))
+
+    def _run():
+        r = p.inspect(ctx.package)
+        if r.error is not None:
+            raise BaseException(r.error)
+    # reads the metadata only: no MB/s
+    return _run, None
+
+
+def bench_startup(ctx):
+    # 'tng-pkg -h' in a fresh interpreter
+    return lambda: run_python(CLI_HELP), None
+
+
+# records logged per iteration of the logging benchmarks
+LOG_RECORDS = 1000
+
+
+def _bench_json_logging(queue_size, flush=True):
+    def _bench(ctx):
+        # like stdout redirected to a file (every flush is a syscall)
+        stream = ctx.open_file(
+            "log-{}-{}.json".format(queue_size, flush))
+        writer = JsonLogWriter(stream=stream, queue_size=queue_size)
+        logger = logging.getLogger(
+            "benchmark.json_logging.{}.{}".format(queue_size, flush))
+        logger.propagate = False
+        logger.handlers = [TangoJsonLogHandler(writer)]
+        logger.setLevel(logging.INFO)
+
+        def _run():
+            for i in range(LOG_RECORDS):
+                logger.info("Copying 'Files/file%d.bin'", i)
+            if flush:
+                writer.flush()
+        return _run, None, LOG_RECORDS
+    return _bench
+
+
+def bench_disabled_logging(ctx):
+    # debug records with a large payload at INFO level
+    logger = logging.getLogger("benchmark.disabled_logging")
+    logger.propagate = False
+    logger.handlers = [TangoJsonLogHandler(
+        JsonLogWriter(stream=ctx.open_file("log-disabled.json")))]
+    logger.setLevel(logging.INFO)
+    napdr = NapdRecord(vendor="eu.5gtango.bench", name="bench",
+                       version="0.1",
+                       package_content=[{"source": "Files/file{}.bin"
+                                         .format(i), "hash": "0" * 64}
+                                        for i in range(ctx.meta_blocks)])
+
+    def _run():
+        for _ in range(LOG_RECORDS):
+            logger.debug("Generated NAPDR: %s", napdr)
+    return _run, None, LOG_RECORDS
+
+
+# name -> (benchmark, default repetitions)
+# OSM and ONAP packages can only be created (there is
+# no unpackager for those formats), so only packing is covered.
+BENCHMARKS = {
+    "file_hash": (bench_file_hash, 10),
+    "zip_directory": (bench_zip, 3),
+    "extract_zip": (bench_unzip, 3),
+    "parse_block_based_meta_file": (bench_parse_meta, 50),
+    "napdr_update": (bench_napdr_update, 50),
+    "tango_pack": (_bench_pack(TangoPackager, "eu.5gtango"), 3),
+    "tango_unpack": (_bench_unpack(False), 3),
+    "tango_unpack_in_memory": (_bench_unpack(True), 3),
+    "tango_inspect": (bench_inspect, 10),
+    "osm_pack": (_bench_pack(OsmPackager, "eu.etsi.osm"), 3),
+    "onap_pack": (_bench_pack(OnapPackager, "eu.lf.onap"), 3),
+    "startup": (bench_startup, 5),
+    # caller side only (records are written in the background)
+    "json_logging": (_bench_json_logging(10 ** 6, flush=False), 10),
+    "json_logging_flushed": (_bench_json_logging(10 ** 6), 10),
+    "json_logging_sync": (_bench_json_logging(0), 10),
+    "disabled_logging": (bench_disabled_logging, 10)}
+
+
+def _stats(values):
+    values = sorted(values)
+    return {"min": values[0],
+            "avg": sum(values) / len(values),
+            "p50": values[(len(values) - 1) // 2],
+            "max": values[-1]}
+
+
+def run_benchmark(ctx, name, repeat=None):
+    """
+    Runs a single benchmark and returns its result (dict).
+    """
+    bench, default_repeat = BENCHMARKS[name]
+    repeat = max(1, repeat or default_repeat)
+    b = bench(ctx)
+    func, nbytes = b[:2]
+    ops = b[2] if len(b) > 2 else 1
+    func()  # warm-up
+    ctx.cleanup_outputs()
+    wall, cpu = list(), list()
+    for _ in range(repeat):
+        t_start, c_start = time.perf_counter(), time.process_time()
+        func()
+        wall.append(time.perf_counter() - t_start)
+        cpu.append(time.process_time() - c_start)
+        ctx.cleanup_outputs()
+    r = {"repeat": repeat,
+         "wall_time": _stats(wall),
+         "cpu_time": _stats(cpu),
+         "bytes": nbytes,
+         "ops": ops}
+    if nbytes is not None and r["wall_time"]["avg"] > 0:
+        r["mb_per_s"] = nbytes / r["wall_time"]["avg"] / (1024 * 1024)
+    r["ops_per_s"] = (ops / r["wall_time"]["avg"]
+                      if r["wall_time"]["avg"] > 0 else None)
+    r["wall_time_per_op"] = r["wall_time"]["avg"] / ops
+    LOG.info("Benchmark %s: %.4fs avg", name, r["wall_time"]["avg"])
+    return r
+
+
+def _package_version():
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution("tngsdk.package").version
+    except BaseException:
+        return None
+
+
+def environment_info():
+    return {"python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "tngsdk_package": _package_version()}
+
+
+def run_suite(benchmarks=None, repeat=None, workdir=None, **ctx_args):
+    """
+    Generates the synthetic inputs, runs the given benchmarks
+    (default: all) and returns the results (dict).
+    """
+    if benchmarks is None:
+        benchmarks = list(BENCHMARKS.keys())
+    for name in benchmarks:
+        if name not in BENCHMARKS:
+            raise ValueError("Unknown benchmark: {}".format(name))
+    tmp = tempfile.mkdtemp(dir=workdir)
+    ctx = BenchmarkContext(tmp, **ctx_args)
+    try:
+        ctx.setup()
+        results = dict()
+        for name in benchmarks:
+            results[name] = run_benchmark(ctx, name, repeat=repeat)
+        return {"format_version": RESULT_FORMAT_VERSION,
+                "timestamp": time.time(),
+                "environment": environment_info(),
+                "inputs": ctx.info(),
+                "results": results}
+    finally:
+        ctx.close()
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,229 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+"""
+Content-addressed cache of created packages.
+Reproducible packaging processes (see --reproducible) produce
+the same package for the same inputs (project descriptor,
+artifact checksums, package format, options). The cache keeps
+these packages under the hash of their inputs so that an
+unchanged project is not packaged again.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from tngsdk.package.logger import TangoLogger
+from tngsdk.package.metrics import METRICS
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+# part of every key: increase if the package layout changes
+CACHE_VERSION = 1
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        LOG.warning("Invalid value of %s: %s", name, os.environ.get(name))
+        return default
+
+
+def _tool_version():
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution("tngsdk.package").version
+    except Exception:
+        return None
+
+
+class BuildCache(object):
+    """
+    Packages stored by the hash of their inputs (LRU).
+    Configured by (environment):
+    - BUILD_CACHE_DIR: folder of the cached packages
+    - BUILD_CACHE_MAX_BYTES: max. size of the cache, least
+      recently used packages are removed first (0 = unlimited)
+    - BUILD_CACHE_DISABLED: do not use the cache
+    """
+
+    def __init__(self, root=None, max_bytes=None, disabled=None):
+        if root is None:
+            root = os.environ.get(
+                "BUILD_CACHE_DIR",
+                os.path.join(os.path.expanduser("~"), ".cache",
+                             "tng-sdk-package", "builds"))
+        if max_bytes is None:
+            max_bytes = _env_int(
+                "BUILD_CACHE_MAX_BYTES", 1024 * 1024 * 1024)
+        if disabled is None:
+            disabled = os.environ.get(
+                "BUILD_CACHE_DISABLED", "false").lower() == "true"
+        self.root = root
+        self.max_bytes = max_bytes
+        self.disabled = disabled
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(inputs):
+        """
+        Hash (hex) of the given inputs (JSON-serializable).
+        """
+        data = {"cache_version": CACHE_VERSION,
+                "tool_version": _tool_version(),
+                "inputs": inputs}
+        return hashlib.sha256(
+            json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key, path_dest):
+        """
+        Copies the package cached for key to path_dest.
+        Returns True on a hit.
+        """
+        if self.disabled:
+            return False
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, path_dest)
+            os.utime(path)  # mark as recently used
+        except (IOError, OSError):
+            BUILD_CACHE_REQUESTS.inc(result="miss")
+            return False
+        BUILD_CACHE_REQUESTS.inc(result="hit")
+        LOG.debug("Build cache hit: %s", key)
+        return True
+
+    def put(self, key, path_src):
+        """
+        Adds the package at path_src to the cache.
+        """
+        if self.disabled:
+            return
+        path = self._path(key)
+        tmp = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write + rename: readers never see partial packages
+            fd, tmp = tempfile.mkstemp(
+                prefix=".tmp-", dir=os.path.dirname(path))
+            os.close(fd)
+            shutil.copyfile(path_src, tmp)
+            os.replace(tmp, path)
+        except (IOError, OSError) as e:
+            LOG.warning("Could not add package to build cache: %s", e)
+            # never evicted (not an entry): remove it right away
+            if tmp is not None and os.path.exists(tmp):
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            return
+        LOG.debug("Build cache stored: %s", key)
+        self.evict()
+
+    def entries(self):
+        """
+        Cached packages as list of (path, size, last use),
+        least recently used first.
+        """
+        r = list()
+        if not os.path.isdir(self.root):
+            return r
+        for d in os.listdir(self.root):
+            pd = os.path.join(self.root, d)
+            if not os.path.isdir(pd):
+                continue
+            for name in os.listdir(pd):
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(pd, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # removed by another process
+                r.append((path, st.st_size, st.st_mtime))
+        return sorted(r, key=lambda e: e[2])
+
+    def size(self):
+        return sum([e[1] for e in self.entries()])
+
+    def evict(self):
+        """
+        Removes least recently used packages until the
+        cache is not larger than max_bytes.
+        Returns the removed paths.
+        """
+        removed = list()
+        if self.max_bytes <= 0:
+            return removed
+        with self._lock:
+            entries = self.entries()
+            total = sum([e[1] for e in entries])
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+                removed.append(path)
+        if len(removed) > 0:
+            BUILD_CACHE_EVICTIONS.inc(len(removed))
+            LOG.debug("Removed %d package(s) from build cache",
+                      len(removed))
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+# have one global instance of the cache
+BUILD_CACHE = BuildCache()
+
+
+BUILD_CACHE_REQUESTS = METRICS.counter(
+    "tng_package_build_cache_requests_total",
+    "Build cache lookups of reproducible packaging processes.",
+    ["result"])
+BUILD_CACHE_EVICTIONS = METRICS.counter(
+    "tng_package_build_cache_evictions_total",
+    "Packages removed from the build cache (size limit).")
@@ -0,0 +1,289 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import os
+import json
+import time
+import queue
+import threading
+import collections
+from requests.exceptions import RequestException
+from tngsdk.package.httpclient import HTTP
+from tngsdk.package.metrics import METRICS
+from tngsdk.package.tracing import TRACER
+from tngsdk.package.logger import TangoLogger
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+class CallbackRequest(object):
+    """
+    A single callback (POST of a JSON body to an URL)
+    handled by the CallbackDispatcher.
+    """
+
+    def __init__(self, url, body):
+        self.url = url
+        self.body = body
+        self.attempts = 0
+        self.status_code = None
+        self.error = None
+        self.t_submitted = time.time()
+        self._done = threading.Event()
+        # span of the process that submitted the callback (if any)
+        self.parent_span = TRACER.current_span()
+
+    def __repr__(self):
+        return "CallbackRequest({}, attempts={}, status_code={})".format(
+            self.url, self.attempts, self.status_code)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the callback was delivered (or given up).
+        Returns the HTTP status code of the last attempt (-1 if
+        there was no response, e.g., connection error or full queue)
+        or None on timeout. Undelivered callbacks have an error.
+        """
+        if not self._done.wait(timeout=timeout):
+            return None
+        return self.status_code
+
+
+class CallbackDispatcher(object):
+    """
+    Delivers callback requests asynchronously so that
+    packager threads are not blocked by slow or dead
+    callback receivers.
+    - background queue processed by a set of worker threads
+    - pooled HTTP session (keep-alive) per callback host
+    - connect and read timeouts
+    - retries with exponential backoff (5xx, 429, connection errors)
+    - dead-letter log for callbacks that cannot be delivered
+      (or that do not fit into the queue anymore)
+    - delivery metrics
+    """
+
+    def __init__(self):
+        self.num_workers = int(os.environ.get("CALLBACK_WORKERS", 2))
+        self.timeout = (
+            float(os.environ.get("CALLBACK_CONNECT_TIMEOUT", 3.05)),
+            float(os.environ.get("CALLBACK_READ_TIMEOUT", 10)))
+        self.max_retries = int(os.environ.get("CALLBACK_MAX_RETRIES", 5))
+        self.backoff = float(os.environ.get("CALLBACK_BACKOFF", 0.5))
+        self.backoff_max = float(os.environ.get("CALLBACK_BACKOFF_MAX", 30))
+        self.pool_size = int(os.environ.get("CALLBACK_POOL_SIZE", 4))
+        self.dead_letter_path = os.environ.get("CALLBACK_DEAD_LETTER_FILE")
+        self._queue = queue.Queue(
+            maxsize=int(os.environ.get("CALLBACK_QUEUE_SIZE", 1000)))
+        self._lock = threading.Lock()
+        self._idle_cond = threading.Condition(self._lock)
+        self._pending = 0
+        self._workers = list()
+        # keep the most recent undeliverable callbacks in memory
+        self.dead_letters = collections.deque(maxlen=100)
+        self.metrics = {"submitted": 0,
+                        "delivered": 0,
+                        "retried": 0,
+                        "dead_lettered": 0,
+                        "dropped": 0,
+                        "failed_attempts": 0,
+                        "delivery_time_total": 0.0}
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.metrics[key] += value
+
+    def get_metrics(self):
+        """
+        Returns a copy of the delivery metrics.
+        """
+        with self._lock:
+            m = self.metrics.copy()
+            m["pending"] = self._pending
+            m["queue_depth"] = self._queue.qsize()
+        return m
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._workers = [w for w in self._workers if w.is_alive()]
+            while len(self._workers) < self.num_workers:
+                w = threading.Thread(
+                    target=self._worker,
+                    name="CallbackWorker-{}".format(len(self._workers)))
+                w.daemon = True
+                w.start()
+                self._workers.append(w)
+
+    def submit(self, url, body):
+        """
+        Enqueues a callback. Returns immediately with a
+        CallbackRequest that can be used to wait for the result.
+        If the queue is full, the callback is dead-lettered.
+        """
+        cb = CallbackRequest(url, body)
+        self._ensure_workers()
+        with self._lock:
+            self._pending += 1
+            self.metrics["submitted"] += 1
+        self._enqueue(cb)
+        return cb
+
+    def _enqueue(self, cb):
+        """
+        Never blocks the caller (packager thread or retry timer).
+        """
+        try:
+            self._queue.put_nowait(cb)
+        except queue.Full:
+            self._count("dropped")
+            self._dead_letter(cb, -1, "Callback queue full ({} entries)"
+                              .format(self._queue.maxsize))
+
+    def wait_idle(self, timeout=None):
+        """
+        Blocks until all submitted callbacks are delivered
+        or given up. Returns False on timeout.
+        """
+        with self._idle_cond:
+            return self._idle_cond.wait_for(
+                lambda: self._pending < 1, timeout=timeout)
+
+    def _get_session(self, url):
+        """
+        Returns the pooled (keep-alive) session for the host of url.
+        """
+        return HTTP.get_session(
+            url, pool_size=self.pool_size, timeout=self.timeout)
+
+    def _worker(self):
+        while True:
+            cb = self._queue.get()
+            try:
+                self._process(cb)
+            except BaseException as e:
+                LOG.exception("Callback worker error: %s", e)
+                self._finish(cb, -1, str(e))
+            finally:
+                self._queue.task_done()
+
+    def _backoff_delay(self, attempt):
+        return min(self.backoff * (2 ** (attempt - 1)), self.backoff_max)
+
+    def _process(self, cb):
+        cb.attempts += 1
+        if cb.parent_span is None:
+            return self._process_attempt(cb)
+        with TRACER.span("callback", parent=cb.parent_span,
+                         url=cb.url, attempt=cb.attempts) as span:
+            self._process_attempt(cb)
+            span.set_attribute("status", cb.status_code)
+            if cb.error is not None:
+                span.status = "error"
+
+    def _process_attempt(self, cb):
+        retryable = False
+        try:
+            r = self._get_session(cb.url).post(
+                cb.url, json=cb.body, timeout=self.timeout)
+            status_code = r.status_code
+            error = None
+            if status_code >= 500 or status_code == 429:
+                retryable = True
+                error = "Callback receiver returned {}".format(status_code)
+            elif status_code >= 400:
+                error = "Callback receiver rejected callback: {}".format(
+                    status_code)
+        except RequestException as e:
+            status_code = -1
+            error = str(e)
+            retryable = True
+        if error is None:
+            self._finish(cb, status_code)
+            return
+        self._count("failed_attempts")
+        if retryable and cb.attempts <= self.max_retries:
+            delay = self._backoff_delay(cb.attempts)
+            LOG.warning("Callback to '%s' failed (%s). Retry %s/%s in %ss.",
+                        cb.url, error, cb.attempts, self.max_retries, delay)
+            self._count("retried")
+            t = threading.Timer(delay, self._enqueue, args=(cb,))
+            t.daemon = True
+            t.start()
+            return
+        self._dead_letter(cb, status_code, error)
+
+    def _dead_letter(self, cb, status_code, error):
+        LOG.error("Callback to '%s' given up after %s attempt(s): %s", cb.url,
+                  cb.attempts, error)
+        entry = {"url": cb.url,
+                 "body": cb.body,
+                 "attempts": cb.attempts,
+                 "status_code": status_code,
+                 "error": error,
+                 "timestamp": time.time()}
+        self.dead_letters.append(entry)
+        self._count("dead_lettered")
+        if self.dead_letter_path is not None:
+            try:
+                with self._lock:
+                    with open(self.dead_letter_path, "a") as f:
+                        f.write(json.dumps(entry, default=str) + "\n")
+            except BaseException as e:
+                LOG.error("Could not write dead-letter log: %s", e)
+        self._finish(cb, status_code, error)
+
+    def _finish(self, cb, status_code, error=None):
+        cb.status_code = status_code
+        cb.error = error
+        with self._idle_cond:
+            if error is None:
+                self.metrics["delivered"] += 1
+                self.metrics["delivery_time_total"] += (
+                    time.time() - cb.t_submitted)
+            self._pending -= 1
+            self._idle_cond.notify_all()
+        cb._done.set()
+        LOG.info("DONE: Callback to '%s' status %s (attempts: %s)", cb.url,
+                 status_code, cb.attempts)
+
+
+# have one global instance of the dispatcher
+CD = CallbackDispatcher()
+
+
+METRICS.gauge("tng_package_callback_queue_depth",
+              "Number of callbacks waiting for delivery.",
+              func=lambda: CD.get_metrics()["queue_depth"])
@@ -32,11 +32,9 @@
 import argparse
 import os
 import sys
+import time
 from tngsdk.package.packager import PM
-from tngsdk.package.storage.tngcat import TangoCatalogBackend
-from tngsdk.package.storage.tngprj import TangoProjectFilesystemBackend
-from tngsdk.package.storage.osmnbi import OsmNbiBackend
-from tngsdk.package.logger import TangoLogger
+from tngsdk.package.logger import TangoLogger, JSON_LOG_WRITER
 
 
 LOG = TangoLogger.getLogger(__name__)
@@ -52,8 +50,9 @@ def dispatch(args):
         # instantiate packager
         p = PM.new_packager(args, pkg_format=args.pkg_format)
         p.package()
-        LOG.debug("Packager result: {}".format(p.result))
+        LOG.debug("Packager result: %s", p.result)
         display_result_package(args, p.result)
+        display_profile_report(args, p)
     elif args.unpackage:
         # select and instantiate storage backend
         # default in CLI mode: TangoProjectFilesystemBackend
@@ -64,21 +63,34 @@ def dispatch(args):
             if sb_env is None:
                 sb_env = os.environ.get(
                     "STORE_BACKEND", "TangoProjectFilesystemBackend")
+            # backends are imported on demand: the remote ones
+            # pull in the HTTP stack (requests)
             if sb_env == "TangoCatalogBackend":
+                from tngsdk.package.storage.tngcat import TangoCatalogBackend
                 sb = TangoCatalogBackend(args)
             elif sb_env == "TangoProjectFilesystemBackend":
+                from tngsdk.package.storage.tngprj import \
+                    TangoProjectFilesystemBackend
                 sb = TangoProjectFilesystemBackend(args)
             elif sb_env == "OsmNbiBackend":
+                from tngsdk.package.storage.osmnbi import OsmNbiBackend
                 sb = OsmNbiBackend(args)
             else:
-                LOG.warning("Unknown storage backend: {}. Stop."
-                            .format(sb_env))
+                LOG.warning("Unknown storage backend: %s. Stop.", sb_env)
                 exit(1)
         # instantiate packager
         p = PM.new_packager(args, storage_backend=sb)
         p.unpackage()
-        LOG.debug("Packager result: {}".format(p.result))
+        LOG.debug("Packager result: %s", p.result)
         display_result_unpackage(args, p.result)
+        display_profile_report(args, p)
+    elif args.inspect:
+        # only read the metadata: no extraction, validation, storage
+        p = PM.packager_class(args.pkg_format)(args)
+        r = p.inspect(args.inspect)
+        LOG.debug("Inspection result: %s", r)
+        display_result_inspect(args, r)
+        return r
     else:
         print("Missing arguments. Type tng-package -h.")
         exit(1)
@@ -107,6 +119,41 @@ def display_result_unpackage(args, r):
     print("=" * 79)
 
 
+def display_result_inspect(args, r):
+    if args.quiet:
+        return
+    if os.environ.get("LOGJSON", args.logjson):
+        return
+    print("=" * 79)
+    print("I N S P E C T I O N   R E P O R T")
+    print("=" * 79)
+    print("Package:     {}".format(args.inspect))
+    if r.error is None:
+        print("Project:     {}.{}.{}"
+              .format(r.vendor, r.name, r.version))
+        print("Type:        {}".format(r.package_type))
+        print("Released:    {}".format(r.release_date_time))
+        print("Artifacts:   {}".format(len(r.package_content)))
+        for pc in r.package_content:
+            print("  {}".format(pc.get("source")))
+            print("    {}, {} compressed, {} uncompressed".format(
+                pc.get("content-type"),
+                _format_size(pc.get("compressed_size")),
+                _format_size(pc.get("size"))))
+            print("    {}: {}".format(pc.get("algorithm"), pc.get("hash")))
+        print("Result:      Success.")
+    else:
+        print("Error:       {}".format(r.error))
+        print("Result:      Failed.")
+    print("=" * 79)
+
+
+def _format_size(size):
+    if size is None:
+        return "missing"
+    return "{} B".format(size)
+
+
 def display_result_package(args, r):
     if args.quiet:
         return
@@ -129,6 +176,118 @@ def display_result_package(args, r):
     print("=" * 79)
 
 
+def display_profile_report(args, p):
+    if not args.profile_report:
+        return
+    rows = p.trace.breakdown()
+    total = sum([r["total"] for r in rows if r["depth"] == 0])
+    print("=" * 79)
+    print("P R O F I L E   R E P O R T")
+    print("=" * 79)
+    print("Trace:       {}".format(p.trace.trace_id))
+    print("{:<44} {:>6} {:>7} {:>11} {:>7}".format(
+        "Stage", "Count", "Errors", "Total [s]", "Share"))
+    for r in rows:
+        print("{:<44} {:>6} {:>7} {:>11.4f} {:>6.1f}%".format(
+            ("  " * r["depth"] + r["name"])[:44], r["count"], r["errors"],
+            r["total"], 100.0 * r["total"] / total if total > 0 else 0))
+    print("=" * 79)
+
+
+def bench(args):
+    """
+    Runs the standard benchmark scenarios, writes the results
+    and compares them against a baseline (if given).
+    Returns the exit code (1 if a regression was found).
+    """
+    # only needed in bench mode
+    from tngsdk.package.benchmark import scenarios
+    results = scenarios.run_scenarios(
+        scenarios=args.bench_scenarios,
+        repeat=args.bench_repeat)
+    path = args.bench_output
+    if path is None:
+        path = "tngsdk-package-bench-{}-{}.json".format(
+            results["environment"].get("tngsdk_package") or "dev",
+            time.strftime("%Y%m%d%H%M%S",
+                          time.localtime(results["timestamp"])))
+    scenarios.write_results(results, path)
+    LOG.info("Wrote benchmark results to %s", path)
+    checks = list()
+    if args.bench_baseline:
+        checks = scenarios.compare(
+            results, scenarios.load_results(args.bench_baseline),
+            latency_threshold=args.bench_threshold,
+            rss_threshold=args.bench_rss_threshold,
+            min_latency_delta=args.bench_min_delta)
+    display_result_bench(args, results, checks, path)
+    return 1 if any([c["regression"] for c in checks]) else 0
+
+
+def verify(args):
+    """
+    Verifies the given packages (metadata, checksums) and writes
+    one JSON report per package (JSON lines).
+    Reports written to stdout are not mixed with JSON log lines:
+    those are written to stderr instead.
+    Returns the exit code (worst exit code of all packages).
+    """
+    # only needed in verify mode
+    from tngsdk.package import verify as v
+    paths = v.read_package_list(args.verify)
+    t_start = time.time()
+    counts = {s: 0 for s in v.EXIT_CODES.keys()}
+    f = sys.stdout
+    if args.verify_report is not None and args.verify_report != "-":
+        f = open(args.verify_report, "w")
+    log_stream = JSON_LOG_WRITER.stream
+    if f is sys.stdout:
+        # set before the worker processes are forked
+        JSON_LOG_WRITER.stream = sys.stderr
+    try:
+        for r in v.verify_packages(paths, args, args.verify_workers):
+            counts[r["status"]] += 1
+            v.write_report(r, f)
+        LOG.info("Verified %d packages (%.2fs): %s",
+                 len(paths), time.time() - t_start, counts)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+        # records are written in the background
+        JSON_LOG_WRITER.flush()
+        JSON_LOG_WRITER.stream = log_stream
+    return max([v.EXIT_CODES[s] for s, c in counts.items() if c > 0] + [0])
+
+
+def display_result_bench(args, results, checks, path):
+    if args.quiet:
+        return
+    if os.environ.get("LOGJSON", args.logjson):
+        return
+    print("=" * 79)
+    print("B E N C H M A R K   R E P O R T")
+    print("=" * 79)
+    for sn, s in sorted(results["scenarios"].items()):
+        print("Scenario:    {} ({:.2f}s, peak RSS: {:.1f} MB)".format(
+            sn, s["duration"], s["peak_rss"] / (1024 * 1024)))
+        for bn, b in sorted(s["results"].items()):
+            print("  {:<30} p50: {:>9.4f}s {:>10}".format(
+                bn, b["wall_time"]["p50"],
+                "{:.1f} MB/s".format(b["mb_per_s"])
+                if "mb_per_s" in b else ""))
+    print("Output:      {}".format(path))
+    if args.bench_baseline:
+        print("Baseline:    {}".format(args.bench_baseline))
+        regressions = [c for c in checks if c["regression"]]
+        for c in regressions:
+            print("  REGRESSION {}: {} {:+.1%} (threshold: {:.0%})".format(
+                c["scenario"], c["metric"], c["change"], c["threshold"]))
+        print("Result:      {} ({} checks, {} regressions)".format(
+            "Failed." if regressions else "Success.",
+            len(checks), len(regressions)))
+    print("=" * 79)
+
+
 def parse_args(input_args=None):
     parser = argparse.ArgumentParser(
         description="5GTANGO SDK packager")
@@ -150,6 +309,42 @@ def parse_args(input_args=None):
         default=None,
         dest="unpackage")
 
+    parser.add_argument(
+        "--inspect",
+        help="Show the metadata and contents of the given package "
+        + "(no extraction, validation or storage).",
+        required=False,
+        default=None,
+        dest="inspect")
+
+    parser.add_argument(
+        "--verify",
+        help="Verify the metadata and checksums of the given packages "
+        + "('-': read paths from stdin) without extracting, validating "
+        + "or storing them. Writes a JSON report per package. Exit code: "
+        + "0 (valid), 1 (invalid packages), 2 (unreadable packages).",
+        required=False,
+        default=None,
+        nargs="+",
+        dest="verify")
+
+    parser.add_argument(
+        "--verify-workers",
+        help="Number of parallel workers of --verify. "
+        + "Default: number of CPUs",
+        required=False,
+        default=None,
+        type=int,
+        dest="verify_workers")
+
+    parser.add_argument(
+        "--verify-report",
+        help="File to write the --verify reports to (JSON lines). "
+        + "Default: stdout",
+        required=False,
+        default=None,
+        dest="verify_report")
+
     parser.add_argument(
         "-o",
         "--output",
@@ -208,6 +403,16 @@ def parse_args(input_args=None):
         dest="no_checksums",
         action="store_true")
 
+    parser.add_argument(
+        "--reproducible",
+        help="Create reproducible packages (sorted members, fixed "
+        + "timestamps: SOURCE_DATE_EPOCH or 1980-01-01) and reuse "
+        + "unchanged packages from the build cache.",
+        required=False,
+        default=False,
+        dest="reproducible",
+        action="store_true")
+
     parser.add_argument(
         "--autoversion",
         help="Auto increase of package version field.",
@@ -310,6 +515,82 @@ def parse_args(input_args=None):
         required=False,
         default=5099,
         dest="service_port")
+
+    parser.add_argument(
+        "--profile-report",
+        help="Print the duration of all stages when done.",
+        required=False,
+        default=False,
+        dest="profile_report",
+        action="store_true")
+
+    # benchmarks
+    parser.add_argument(
+        "--bench",
+        help="Run the standard benchmark scenarios and exit.",
+        required=False,
+        default=False,
+        dest="bench",
+        action="store_true")
+
+    parser.add_argument(
+        "--bench-scenarios",
+        help="Benchmark scenarios to run. Default: all",
+        nargs="+",
+        required=False,
+        default=None,
+        dest="bench_scenarios")
+
+    parser.add_argument(
+        "--bench-repeat",
+        help="Repetitions per benchmark. Default: per benchmark",
+        type=int,
+        required=False,
+        default=None,
+        dest="bench_repeat")
+
+    parser.add_argument(
+        "--bench-output",
+        help="Path of the benchmark results file."
+        + "\nDefault: tngsdk-package-bench-<version>-<time>.json",
+        required=False,
+        default=None,
+        dest="bench_output")
+
+    parser.add_argument(
+        "--bench-baseline",
+        help="Results file to compare the benchmark results with.",
+        required=False,
+        default=None,
+        dest="bench_baseline")
+
+    parser.add_argument(
+        "--bench-threshold",
+        help="Max. latency increase compared to the baseline"
+        + " (fraction). Default: 0.1",
+        type=float,
+        required=False,
+        default=0.1,
+        dest="bench_threshold")
+
+    parser.add_argument(
+        "--bench-rss-threshold",
+        help="Max. peak RSS increase compared to the baseline"
+        + " (fraction). Default: 0.2",
+        type=float,
+        required=False,
+        default=0.2,
+        dest="bench_rss_threshold")
+
+    parser.add_argument(
+        "--bench-min-delta",
+        help="Latency increases below this value (seconds) are ignored."
+        + " Default: 0.001",
+        type=float,
+        required=False,
+        default=0.001,
+        dest="bench_min_delta")
+
     parser.add_argument(
         "--no-subfolder-compression",
         help="Ignore type application/vnd.folder.compressed.zip",
@@ -29,19 +29,28 @@
 # the Horizon 2020 and 5G-PPP programmes. The authors would like to
 # acknowledge the contributions of their colleagues of the SONATA
 # partner consortium (www.5gtango.eu).
+import contextlib
 import copy
+import fnmatch
 import hashlib
+import io
 import os
+import shutil
 import zipfile
 import tempfile
 import time
 import glob
 from tngsdk.package.logger import TangoLogger
+from tngsdk.package.metrics import BYTES_HASHED, BYTES_COMPRESSED
 
 
 LOG = TangoLogger.getLogger(__name__)
 
 
+# chunk size used to stream file contents to remote endpoints
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
 def dictionary_deep_merge(d1, d2, skip=None):
     """
     Recursively merges dicts containing other dicts or lists.
@@ -72,15 +81,32 @@ def dictionary_deep_merge(d1, d2, skip=None):
 
 def file_hash(path, h_func=hashlib.sha256):
     h = h_func()
-    with open(path, 'rb', buffering=0) as f:
+    size = 0
+    with open_binary(path) as f:
         for b in iter(lambda: f.read(128 * 1024), b''):
             h.update(b)
+            size += len(b)
+    BYTES_HASHED.inc(size)
     return h.hexdigest()
 
 
+@contextlib.contextmanager
+def open_binary(src):
+    """
+    Opens a file on disk (path) or a file that
+    is not on disk (ZipMember, MemoryFile) for reading.
+    """
+    if isinstance(src, (ZipMember, MemoryFile)):
+        with src.open() as f:
+            yield f
+    else:
+        with open(src, "rb", buffering=0) as f:
+            yield f
+
+
 def _makedirs(p):
     if not os.path.exists(p) and p != "":
-        LOG.debug("Creating: {}".format(p))
+        LOG.debug("Creating: %s", p)
         os.makedirs(p)
 
 
@@ -100,7 +126,7 @@ def search_for_file(path="**/TOSCA.meta", recursive=True):
         f_lst = list(glob.iglob(path, recursive=recursive))
     except BaseException:
         f_lst = list(glob.iglob(path))
-    LOG.debug("Searching for '{}' found: {}".format(path, f_lst))
+    LOG.debug("Searching for '%s' found: %s", path, f_lst)
     if len(f_lst) > 0:
         return f_lst[0]
     return None
@@ -114,15 +140,15 @@ def extract_zip_file_to_temp(path_zip, path_dest=None):
     """
     if path_dest is None:
         path_dest = tempfile.mkdtemp()
-    LOG.debug("Unzipping '{}' ...".format(path_zip))
+    LOG.debug("Unzipping '%s' ...", path_zip)
     t_start = time.time()
     # unzipping
     with zipfile.ZipFile(path_zip, "r") as f:
         f.extractall(path_dest)
-    LOG.debug("Unzipping done ({:.4f}s)".format(time.time()-t_start))
+    LOG.debug("Unzipping done (%.4fs)", time.time()-t_start)
     # get path of output folder (it is based on zip name)
     wd = find_root_folder_of_pkg(path_dest)
-    LOG.debug("Working root '{}'".format(wd))
+    LOG.debug("Working root '%s'", wd)
     return wd
 
 
@@ -141,17 +167,43 @@ def find_root_folder_of_pkg(d):
     return d
 
 
-def creat_zip_file_from_directory(path_src, path_dest):
-    LOG.debug("Zipping '{}' ...".format(path_dest))
+def creat_zip_file_from_directory(path_src, path_dest, date_time=None):
+    """
+    Zips the contents of path_src to path_dest.
+    date_time: if given (tuple like time.localtime()[:6]), the
+    archive is reproducible: members are sorted and get this
+    timestamp and fixed permissions instead of the values
+    found in the file system.
+    """
+    LOG.debug("Zipping '%s' ...", path_dest)
     t_start = time.time()
-    zf = zipfile.ZipFile(path_dest, 'w', zipfile.ZIP_DEFLATED)
+    members = list()
     for root, _, files in os.walk(path_src):
         for f in files:
-            zf.write(os.path.join(root, f),
-                     os.path.relpath(
-                         os.path.join(root, f), path_src))
+            path = os.path.join(root, f)
+            members.append((os.path.relpath(path, path_src), path))
+    if date_time is not None:
+        members.sort()
+    zf = zipfile.ZipFile(path_dest, 'w', zipfile.ZIP_DEFLATED)
+    size = 0
+    for arcname, path in members:
+        if date_time is None:
+            zf.write(path, arcname)
+        else:
+            _write_zip_member(zf, path, arcname, date_time)
+        size += os.path.getsize(path)
     zf.close()
-    LOG.debug("Zipping done ({:.4f}s)".format(time.time()-t_start))
+    BYTES_COMPRESSED.inc(size)
+    LOG.debug("Zipping done (%.4fs)", time.time()-t_start)
+
+
+def _write_zip_member(zf, path, arcname, date_time):
+    zi = zipfile.ZipInfo(arcname.replace(os.sep, "/"), date_time=date_time)
+    zi.compress_type = zipfile.ZIP_DEFLATED
+    zi.external_attr = 0o644 << 16  # -rw-r--r--
+    zi.file_size = os.path.getsize(path)  # large files need ZIP64
+    with open(path, "rb") as fsrc, zf.open(zi, "w") as fdst:
+        shutil.copyfileobj(fsrc, fdst, 128 * 1024)
 
 
 def write_block_based_meta_file(data, path):
@@ -166,3 +218,233 @@ def write_block_based_meta_file(data, path):
             for k, v in block.items():
                 f.write("{}: {}\n".format(k, v))
             f.write("\n")  # block separator
+
+
+class ZipMember(object):
+    """
+    Reference to a single file inside a ZIP archive.
+    Allows to stream the file without extracting the archive.
+    """
+
+    def __init__(self, archive, name):
+        self.archive = archive  # path or ZipFile object
+        self.name = name
+
+    def __repr__(self):
+        return "ZipMember({}, {})".format(self.archive, self.name)
+
+    def __str__(self):
+        return self.name
+
+    @contextlib.contextmanager
+    def open(self):
+        if isinstance(self.archive, zipfile.ZipFile):
+            with self.archive.open(self.name, "r") as f:
+                yield f
+        else:
+            with zipfile.ZipFile(self.archive, "r") as zf:
+                with zf.open(self.name, "r") as f:
+                    yield f
+
+    @property
+    def size(self):
+        if isinstance(self.archive, zipfile.ZipFile):
+            return self.archive.getinfo(self.name).file_size
+        with zipfile.ZipFile(self.archive, "r") as zf:
+            return zf.getinfo(self.name).file_size
+
+
+class MemoryFile(object):
+    """
+    A file (e.g. an uploaded package) that is kept in memory.
+    """
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+    def __repr__(self):
+        return "MemoryFile({}, {} bytes)".format(self.name, len(self.data))
+
+    def __str__(self):
+        return self.name
+
+    @contextlib.contextmanager
+    def open(self):
+        yield io.BytesIO(self.data)
+
+    @property
+    def size(self):
+        return len(self.data)
+
+
+class ChunkStream(object):
+    """
+    Request body that reads the given file-like object
+    chunk by chunk. Its size is unknown, so it is sent
+    using chunked transfer encoding.
+    """
+
+    def __init__(self, f, chunk_size=UPLOAD_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        for b in iter(lambda: self.f.read(self.chunk_size), b''):
+            yield b
+
+
+class SizedChunkStream(ChunkStream):
+    """
+    Request body that reads the given file-like object
+    chunk by chunk. Its size is known, so it is sent with
+    a Content-Length header.
+    """
+
+    def __init__(self, f, length, chunk_size=UPLOAD_CHUNK_SIZE):
+        super().__init__(f, chunk_size=chunk_size)
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+
+@contextlib.contextmanager
+def open_upload_body(src, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Yields a request body that streams the contents of src
+    (a path, ZipMember, MemoryFile or file-like object) instead
+    of loading them into memory.
+    - files on disk are passed as file objects (read blockwise)
+    - ZIP members are decompressed on the fly, chunk by chunk
+    - other file-like objects have an unknown size and are
+      sent using chunked transfer encoding
+    """
+    if isinstance(src, (ZipMember, MemoryFile)):
+        with src.open() as f:
+            yield SizedChunkStream(f, src.size, chunk_size)
+    elif hasattr(src, "read"):
+        yield ChunkStream(src, chunk_size)
+    else:
+        with open(src, "rb") as f:
+            yield f
+
+
+class SeekableStream(object):
+    """
+    Wraps file-like objects that support seek() but do not
+    implement seekable(), e.g., SpooledTemporaryFile (used for
+    uploads) before Python 3.11, so that zipfile can read them.
+    """
+
+    def __init__(self, f):
+        self.f = f
+
+    def read(self, *args):
+        return self.f.read(*args)
+
+    def seek(self, *args):
+        return self.f.seek(*args)
+
+    def tell(self):
+        return self.f.tell()
+
+    def seekable(self):
+        return True
+
+
+class PackageArchive(object):
+    """
+    Read-only access to the members of a package (ZIP) file
+    without extracting it. Member names are relative to the
+    package root (the folder containing 'TOSCA-Metadata').
+    path: path or file-like object, e.g. io.BytesIO
+    """
+
+    def __init__(self, path):
+        self.path = path if isinstance(path, str) else "<memory>"
+        self.zf = zipfile.ZipFile(path, "r")
+        self.root = self._find_root()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.zf.close()
+
+    def _find_root(self):
+        for n in self.zf.namelist():
+            i = n.find("TOSCA-Metadata/")
+            if i == 0 or (i > 0 and n[i - 1] == "/"):
+                return n[:i]
+        return ""
+
+    def namelist(self):
+        """
+        Names of all files (no folders) in the package.
+        """
+        return [n[len(self.root):] for n in self.zf.namelist()
+                if n.startswith(self.root) and not n.endswith("/")]
+
+    def find(self, pattern):
+        """
+        Returns the name of the first member matching the given
+        pattern (like search_for_file), e.g., '**/TOSCA.meta',
+        or None.
+        """
+        pattern = os.path.normpath(pattern)
+        patterns = [pattern]
+        if pattern.startswith("**/"):
+            patterns = [pattern[3:], "*/{}".format(pattern[3:])]
+        for n in self.namelist():
+            for p in patterns:
+                # like glob: '*' does not match across folders
+                if (n.count("/") == p.count("/")
+                        or p.startswith("*/")) and fnmatch.fnmatchcase(n, p):
+                    return n
+        return None
+
+    def getinfo(self, name):
+        return self.zf.getinfo(self.root + name)
+
+    def member(self, name):
+        return ZipMember(self.zf, self.root + name)
+
+    def read(self, name):
+        return self.zf.read(self.root + name)
+
+    def read_text(self, name, encoding="utf-8"):
+        return self.read(name).decode(encoding)
+
+    def extractall(self, path_dest):
+        """
+        Extracts the package (like extract_zip_file_to_temp)
+        and returns the path of its root.
+        """
+        self.zf.extractall(path_dest)
+        return os.path.join(path_dest, self.root)
+
+
+def package_file(wd, source):
+    """
+    The package content file 'source' in wd: a path if
+    wd is a folder (extracted package) or a ZipMember if wd
+    is a PackageArchive.
+    """
+    if isinstance(wd, PackageArchive):
+        name = wd.find(source)
+        return wd.member(source if name is None else name)
+    return os.path.join(wd, source)
+
+
+def package_file_source(wd, f):
+    """
+    Inverse of package_file: The source of the given file
+    relative to the package root.
+    """
+    if isinstance(wd, PackageArchive):
+        return f.name[len(wd.root):]
+    return f.replace(wd, "")
@@ -0,0 +1,401 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import os
+import time
+import random
+import threading
+import collections
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from tngsdk.package.logger import TangoLogger
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+def endpoint_key(url):
+    """
+    Returns the 'scheme://host:port' part of the given URL.
+    Used to group connections (and everything related
+    to them) by remote endpoint.
+    """
+    u = urlparse(url)
+    return "{}://{}".format(u.scheme, u.netloc)
+
+
+# only these requests are retried automatically
+IDEMPOTENT_METHODS = ["GET", "HEAD", "OPTIONS", "PUT", "DELETE"]
+RETRY_STATUS_CODES = [502, 503, 504]
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised instead of doing a request to an endpoint
+    that is considered to be unhealthy.
+    """
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    Per-endpoint circuit breaker:
+    - closed: requests pass, consecutive failures are counted
+    - open: after failure_threshold consecutive failures, requests
+      fail fast (CircuitOpenError) for reset_timeout seconds
+    - half_open: afterwards, a single trial request is let through;
+      its outcome closes or re-opens the breaker
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitBreaker.CLOSED
+        self.consecutive_failures = 0
+        self.num_opened = 0
+        self.num_rejected = 0
+        self._t_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """
+        Raises CircuitOpenError if no request should be made.
+        """
+        with self._lock:
+            if self.state == CircuitBreaker.OPEN:
+                if time.time() - self._t_opened < self.reset_timeout:
+                    self.num_rejected += 1
+                    raise CircuitOpenError(
+                        "Circuit breaker open for {}".format(self.name))
+                self.state = CircuitBreaker.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == CircuitBreaker.HALF_OPEN:
+                if self._trial_in_flight:
+                    self.num_rejected += 1
+                    raise CircuitOpenError(
+                        "Circuit breaker half-open for {}".format(self.name))
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CircuitBreaker.CLOSED:
+                LOG.info("Circuit breaker closed for %s", self.name)
+            self.state = CircuitBreaker.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def abort_trial(self):
+        """
+        The request failed without an answer of the endpoint (e.g.,
+        the request body could not be read): its health is still
+        unknown, so let the next request be the trial.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if (self.state == CircuitBreaker.HALF_OPEN
+                    or (self.state == CircuitBreaker.CLOSED
+                        and self.consecutive_failures
+                        >= self.failure_threshold)):
+                LOG.warning("Circuit breaker opened for %s (%s failures)",
+                            self.name, self.consecutive_failures)
+                self.state = CircuitBreaker.OPEN
+                self._t_opened = time.time()
+                self.num_opened += 1
+
+
+class LatencyStats(object):
+    """
+    Request latencies of an endpoint (in seconds).
+    Percentiles are computed over the most recent requests.
+    """
+
+    def __init__(self, window=1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, value):
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+            self._recent.append(value)
+
+    def summary(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            count, total, max_value = self.count, self.total, self.max
+
+        def _p(q):
+            if len(recent) < 1:
+                return None
+            return round(recent[min(len(recent) - 1,
+                                    int(q * len(recent)))], 4)
+
+        return {"count": count,
+                "avg": round(total / count, 4) if count > 0 else None,
+                "p50": _p(.50),
+                "p95": _p(.95),
+                "p99": _p(.99),
+                "max": round(max_value, 4)}
+
+
+def call_with_timeout(func, timeout, *args, **kwargs):
+    """
+    Runs func in a separate (daemon) thread and waits at most
+    timeout seconds for its result. Used for clients that do not
+    support timeouts themselves. Raises requests' Timeout.
+    """
+    result = dict()
+
+    def _run():
+        try:
+            result["value"] = func(*args, **kwargs)
+        except BaseException as e:
+            result["error"] = e
+
+    t = threading.Thread(target=_run, name="TimeoutCall")
+    t.daemon = True
+    t.start()
+    t.join(timeout)
+    if t.is_alive():
+        raise requests.exceptions.Timeout(
+            "Call to {} did not finish within {}s".format(
+                getattr(func, "__name__", func), timeout))
+    if "error" in result:
+        raise result["error"]
+    return result.get("value")
+
+
+class PooledSession(requests.Session):
+    """
+    A requests session with a fixed-size keep-alive connection
+    pool and default timeouts. Thread-safe as long as the session's
+    configuration (headers, cookies, ...) is not changed after creation.
+    - idempotent requests are retried (jittered exponential backoff)
+    - a circuit breaker fails fast while the endpoint is unhealthy
+    - request latencies are recorded
+    """
+
+    def __init__(self, pool_size, timeout, name=None, max_retries=3,
+                 backoff=0.2, backoff_max=5.0, breaker=None):
+        super().__init__()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker = breaker if breaker is not None else CircuitBreaker(
+            name)
+        self.latency = LatencyStats()
+        self.num_requests = 0
+        self.num_retries = 0
+        self._lock = threading.Lock()
+        self.adapter = HTTPAdapter(pool_connections=1,
+                                   pool_maxsize=pool_size,
+                                   pool_block=False)
+        self.mount("http://", self.adapter)
+        self.mount("https://", self.adapter)
+
+    def _backoff_delay(self, attempt):
+        """
+        'Full jitter' exponential backoff.
+        """
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+
+    def _retry(self, method, url, attempt, reason):
+        delay = self._backoff_delay(attempt)
+        LOG.warning("%s %s failed (%s). Retry %s/%s in %.2fs.", method, url,
+                    reason, attempt, self.max_retries, delay)
+        with self._lock:
+            self.num_retries += 1
+        time.sleep(delay)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        retries = 0
+        if str(method).upper() in IDEMPOTENT_METHODS:
+            retries = self.max_retries
+        attempt = 0
+        while True:
+            self.breaker.before_request()
+            with self._lock:
+                self.num_requests += 1
+            t_start = time.time()
+            try:
+                r = super().request(method, url, **kwargs)
+            except RequestException as e:
+                self.latency.add(time.time() - t_start)
+                self.breaker.record_failure()
+                if attempt < retries:
+                    attempt += 1
+                    self._retry(method, url, attempt, e)
+                    continue
+                raise e
+            except BaseException:
+                # not a request error: never leave a trial in flight
+                self.breaker.abort_trial()
+                raise
+            self.latency.add(time.time() - t_start)
+            if r.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            if r.status_code in RETRY_STATUS_CODES and attempt < retries:
+                r.close()
+                attempt += 1
+                self._retry(method, url, attempt, r.status_code)
+                continue
+            return r
+
+    def num_connections(self):
+        """
+        Number of TCP connections opened by this session so far.
+        """
+        pools = self.adapter.poolmanager.pools
+        return sum([pools[k].num_connections for k in pools.keys()])
+
+
+class HttpSessionPool(object):
+    """
+    Shared, thread-safe registry of pooled sessions:
+    One keep-alive session per remote endpoint that is
+    reused by all jobs (e.g. in service mode).
+    """
+
+    def __init__(self):
+        self.pool_size = int(os.environ.get("HTTP_POOL_SIZE", 10))
+        self.timeout = (
+            float(os.environ.get("HTTP_CONNECT_TIMEOUT", 3.05)),
+            float(os.environ.get("HTTP_READ_TIMEOUT", 60)))
+        self.max_retries = int(os.environ.get("HTTP_MAX_RETRIES", 3))
+        self.backoff = float(os.environ.get("HTTP_RETRY_BACKOFF", 0.2))
+        self.backoff_max = float(
+            os.environ.get("HTTP_RETRY_BACKOFF_MAX", 5))
+        self.breaker_failures = int(
+            os.environ.get("HTTP_BREAKER_FAILURES", 5))
+        self.breaker_reset = float(
+            os.environ.get("HTTP_BREAKER_RESET_TIMEOUT", 30))
+        self._sessions = dict()
+        self._lock = threading.Lock()
+
+    def get_session(self, url, pool_size=None, timeout=None):
+        """
+        Returns the shared session for the endpoint of url.
+        pool_size and timeout are only used if the session
+        does not exist yet.
+        """
+        key = endpoint_key(url)
+        with self._lock:
+            s = self._sessions.get(key)
+            if s is None:
+                s = PooledSession(
+                    pool_size if pool_size is not None else self.pool_size,
+                    timeout if timeout is not None else self.timeout,
+                    name=key,
+                    max_retries=self.max_retries,
+                    backoff=self.backoff,
+                    backoff_max=self.backoff_max,
+                    breaker=CircuitBreaker(
+                        key, self.breaker_failures, self.breaker_reset))
+                self._sessions[key] = s
+                LOG.debug("Created HTTP session pool for %s", key)
+            return s
+
+    def call(self, url, func, *args, timeout=None, **kwargs):
+        """
+        Calls func (e.g. a method of a 3rd party client library
+        talking to the endpoint of url) protected by the endpoint's
+        circuit breaker and with a timeout.
+        """
+        s = self.get_session(url)
+        if timeout is None:
+            timeout = sum(s.timeout) if isinstance(
+                s.timeout, tuple) else s.timeout
+        s.breaker.before_request()
+        t_start = time.time()
+        try:
+            r = call_with_timeout(func, timeout, *args, **kwargs)
+        except BaseException as e:
+            s.latency.add(time.time() - t_start)
+            s.breaker.record_failure()
+            raise e
+        s.latency.add(time.time() - t_start)
+        s.breaker.record_success()
+        return r
+
+    def get_metrics(self):
+        """
+        Returns connection (re-)use statistics, circuit breaker
+        states and latencies per endpoint.
+        """
+        with self._lock:
+            sessions = list(self._sessions.items())
+        r = dict()
+        for key, s in sessions:
+            conns = s.num_connections()
+            r[key] = {"requests": s.num_requests,
+                      "connections": conns,
+                      "reused": max(0, s.num_requests - conns),
+                      "retries": s.num_retries,
+                      "breaker": {
+                          "state": s.breaker.state,
+                          "consecutive_failures":
+                          s.breaker.consecutive_failures,
+                          "opened": s.breaker.num_opened,
+                          "rejected": s.breaker.num_rejected},
+                      "latency": s.latency.summary()}
+        return r
+
+    def close_all(self):
+        with self._lock:
+            for s in self._sessions.values():
+                s.close()
+            self._sessions = dict()
+
+
+# have one global instance of the session pool
+HTTP = HttpSessionPool()
@@ -0,0 +1,237 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+"""
+Load-testing harness for tng-sdk-package. Runs entirely on the local
+machine (no network needed):
+- a fake tng-cat (latency and error injection)
+- a callback receiver that records delivery times
+- a driver that fires concurrent /packages and /projects requests
+  and reports throughput and p50/p95/p99 latencies
+
+Usage: python -m tngsdk.package.loadtest --packages misc/*.tgo -n 50 -c 8
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from tngsdk.package.logger import TangoLogger
+from tngsdk.package.loadtest.server import BackgroundServer
+from tngsdk.package.loadtest.fakecat import FakeCatalogue
+from tngsdk.package.loadtest.receiver import CallbackReceiver
+from tngsdk.package.loadtest.driver import LoadDriver
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+def parse_args(input_args=None):
+    parser = argparse.ArgumentParser(
+        description="Local load tests for tng-sdk-package")
+    parser.add_argument(
+        "--packages", nargs="*", default=list(),
+        help="Package files posted to /api/v1/packages")
+    parser.add_argument(
+        "--projects", nargs="*", default=list(),
+        help="Zipped projects posted to /api/v1/projects")
+    parser.add_argument(
+        "-n", "--requests", type=int, default=20,
+        help="Number of requests per kind (packages, projects)")
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=4,
+        help="Number of concurrent requests")
+    parser.add_argument(
+        "--service-url", default=None,
+        help="Use a running service instead of an in-process one")
+    parser.add_argument(
+        "--catalogue-url", default=None,
+        help="Use a running catalogue instead of the fake one")
+    parser.add_argument(
+        "--cat-latency", type=float, default=0.0,
+        help="Fake catalogue: delay per request in seconds")
+    parser.add_argument(
+        "--cat-latency-jitter", type=float, default=0.0,
+        help="Fake catalogue: max. additional random delay in seconds")
+    parser.add_argument(
+        "--cat-error-rate", type=float, default=0.0,
+        help="Fake catalogue: fraction of requests that fail (0...1)")
+    parser.add_argument(
+        "--skip-store", action="store_true", default=False,
+        help="Do not store unpacked packages")
+    parser.add_argument(
+        "--validation", action="store_true", default=False,
+        help="Run tng-validate (skipped by default)")
+    parser.add_argument(
+        "--no-callbacks", action="store_true", default=False,
+        help="Do not use the callback receiver")
+    parser.add_argument(
+        "--timeout", type=float, default=300,
+        help="Max. time per request (incl. processing) in seconds")
+    parser.add_argument(
+        "--workdir", default=None,
+        help="Working directory of the in-process service")
+    parser.add_argument(
+        "-o", "--output", default=None,
+        help="Write JSON report to this file (default: stdout)")
+    return parser.parse_args(input_args)
+
+
+def _start_service(args):
+    """
+    Starts the tng-sdk-package REST API in-process.
+    """
+    # only needed for the in-process service
+    from tngsdk.package import rest, cli
+    cli_args = ["--offline"]
+    if not args.validation:
+        cli_args.append("--skip-validation")
+    rest.app.cliargs = cli.parse_args(cli_args)
+    return BackgroundServer(rest.app).start()
+
+
+# process globals changed for the in-process service
+SERVICE_ENV = ["CATALOGUE_URL", "STORE_BACKEND", "CATALOGUE_JOURNAL"]
+
+
+class _ProcessState(object):
+    """
+    Saves the process globals changed by run() (environment,
+    working directory, caches, service configuration) and
+    restores them afterwards.
+    """
+
+    def __init__(self):
+        # imported here: only needed for the in-process service
+        from tngsdk.package import rest
+        from tngsdk.package.storage.tngcat import EXISTS_CACHE
+        self.env = {k: os.environ.get(k) for k in SERVICE_ENV}
+        self.cwd = os.getcwd()
+        self.exists_cache_ttl = EXISTS_CACHE.ttl
+        self.cliargs = getattr(rest.app, "cliargs", None)
+
+    def restore(self):
+        from tngsdk.package import rest
+        from tngsdk.package.storage.tngcat import EXISTS_CACHE
+        for k, v in self.env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        os.chdir(self.cwd)
+        EXISTS_CACHE.ttl = self.exists_cache_ttl
+        rest.app.cliargs = self.cliargs
+
+
+def run(args):
+    """
+    Sets up all components, runs the load test and
+    returns the report (dict). Process globals changed
+    for the in-process service are restored afterwards.
+    """
+    servers = list()
+    report = dict()
+    # resolve inputs before changing the working directory
+    jobs = list()
+    for kind, paths in [("package", args.packages),
+                        ("project", args.projects)]:
+        paths = [os.path.abspath(p) for p in paths]
+        jobs.extend([(kind, paths[i % len(paths)])
+                     for i in range(args.requests if paths else 0)])
+    if len(jobs) < 1:
+        raise ValueError("No --packages or --projects given.")
+    state = None
+    workdir = None
+    try:
+        cat = None
+        catalogue_url = args.catalogue_url
+        if catalogue_url is None:
+            cat = FakeCatalogue(latency=args.cat_latency,
+                                latency_jitter=args.cat_latency_jitter,
+                                error_rate=args.cat_error_rate)
+            servers.append(BackgroundServer(cat.app).start())
+            catalogue_url = servers[-1].url + cat.prefix
+        receiver, callback_url = None, None
+        if not args.no_callbacks:
+            receiver = CallbackReceiver()
+            servers.append(BackgroundServer(receiver.app).start())
+            callback_url = servers[-1].url + receiver.path
+        service_url = args.service_url
+        if service_url is None:
+            state = _ProcessState()
+            os.environ["CATALOGUE_URL"] = catalogue_url
+            os.environ["STORE_BACKEND"] = "TangoCatalogBackend"
+            if cat is not None and cat.allow_duplicates:
+                # the same packages are stored over and over again:
+                # do not remember or resume them
+                from tngsdk.package.storage.tngcat import EXISTS_CACHE
+                EXISTS_CACHE.ttl = 0
+                os.environ["CATALOGUE_JOURNAL"] = "false"
+            if args.workdir is None:
+                workdir = tempfile.mkdtemp()
+            os.chdir(args.workdir or workdir)
+            servers.append(_start_service(args))
+            service_url = servers[-1].url
+        driver = LoadDriver(service_url,
+                            concurrency=args.concurrency,
+                            timeout=args.timeout,
+                            skip_store=args.skip_store,
+                            callback_url=callback_url,
+                            receiver=receiver)
+        report = driver.run(jobs)
+        if cat is not None:
+            report["catalogue"] = cat.get_stats()
+    finally:
+        for s in reversed(servers):
+            s.stop()
+        if state is not None:
+            state.restore()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main(input_args=None):
+    args = parse_args(input_args)
+    # keep the per-request logging of the service out of the results
+    TangoLogger.reconfigure_all_tango_loggers(
+        log_level=logging.WARNING, log_json=False)
+    report = run(args)
+    out = json.dumps(report, indent=2, sort_keys=True)
+    if args.output is None:
+        print(out)
+    else:
+        with open(args.output, "w") as f:
+            f.write(out + "\n")
+        LOG.warning("Wrote load test report to %s", args.output)
+    sys.exit(1 if report.get("errors", 0) > 0 else 0)
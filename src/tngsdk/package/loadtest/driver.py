@@ -0,0 +1,199 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import os
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+
+FINAL_STATUS = ["success", "failed"]
+
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile (q in 0...100) of the given values.
+    """
+    if len(values) < 1:
+        return None
+    s = sorted(values)
+    return s[max(0, int(math.ceil(q / 100.0 * len(s))) - 1)]
+
+
+def summarize(values):
+    """
+    Summary statistics (seconds) of a list of latencies.
+    """
+    if len(values) < 1:
+        return {"count": 0}
+    return {"count": len(values),
+            "min": round(min(values), 4),
+            "avg": round(sum(values) / len(values), 4),
+            "p50": round(percentile(values, 50), 4),
+            "p95": round(percentile(values, 95), 4),
+            "p99": round(percentile(values, 99), 4),
+            "max": round(max(values), 4)}
+
+
+class LoadDriver(object):
+    """
+    Fires concurrent (un)packaging requests (/api/v1/packages
+    and /api/v1/projects) against a tng-sdk-package service
+    and measures request latency, end-to-end processing time
+    (using the long-polling status endpoint), and optionally
+    callback delivery times (using a CallbackReceiver).
+    """
+
+    def __init__(self, service_url, concurrency=4, timeout=300,
+                 skip_store=False, callback_url=None, receiver=None):
+        self.service_url = service_url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.skip_store = skip_store
+        self.callback_url = callback_url
+        self.receiver = receiver
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=max(1, concurrency))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _wait_until_done(self, process_uuid, t_deadline):
+        """
+        Long-polls the status endpoint until the process is done.
+        Returns the final status response (or None on timeout).
+        """
+        status = None
+        url = "{}/api/v1/packages/status/{}".format(
+            self.service_url, process_uuid)
+        while time.time() < t_deadline:
+            params = {"wait": max(0.1, min(60, t_deadline - time.time()))}
+            if status is not None:
+                params["status"] = status
+            r = self.session.get(url, params=params)
+            if r.status_code != 200:
+                return None
+            status = r.json().get("status")
+            if status in FINAL_STATUS:
+                return r.json()
+        return None
+
+    def _submit(self, kind, path):
+        endpoint, field = {"package": ("/api/v1/packages", "package"),
+                           "project": ("/api/v1/projects", "project")}[kind]
+        data = {"skip_store": str(self.skip_store)}
+        if self.callback_url is not None:
+            data["callback_url"] = self.callback_url
+        result = {"kind": kind, "input": path}
+        t_start = time.time()
+        result["t_submitted"] = t_start
+        try:
+            with open(path, "rb") as f:
+                r = self.session.post(
+                    self.service_url + endpoint, data=data,
+                    files={field: (os.path.basename(path), f)},
+                    timeout=self.timeout)
+            result["request_latency"] = time.time() - t_start
+            result["status_code"] = r.status_code
+            if r.status_code != 200:
+                result["error"] = "HTTP {}".format(r.status_code)
+                return result
+            result["package_process_uuid"] = r.json().get(
+                "package_process_uuid")
+            s = self._wait_until_done(
+                result["package_process_uuid"], t_start + self.timeout)
+            if s is None:
+                result["error"] = "timeout"
+                return result
+            result["t_done"] = time.time()
+            result["duration"] = result["t_done"] - t_start
+            result["process_status"] = s.get("status")
+            if result["process_status"] != "success":
+                result["error"] = "process {}: {}".format(
+                    result["process_status"], s.get("error_msg"))
+        except BaseException as e:
+            result["error"] = str(e)
+        return result
+
+    def _callback_stats(self, results):
+        """
+        Matches received callbacks with the submitted requests.
+        """
+        expected = [r for r in results
+                    if r.get("package_process_uuid") is not None]
+        self.receiver.wait_for(len(expected), timeout=self.timeout)
+        delivery, after_done = list(), list()
+        for r in expected:
+            d = self.receiver.get(r.get("package_process_uuid"))
+            if d is None:
+                continue
+            delivery.append(d["t_received"] - r["t_submitted"])
+            if r.get("t_done") is not None:
+                after_done.append(d["t_received"] - r["t_done"])
+        return {"expected": len(expected),
+                "received": len(delivery),
+                "since_submit": summarize(delivery),
+                "since_done": summarize(after_done)}
+
+    def run(self, jobs):
+        """
+        Runs the given jobs [(kind, path), ...] with the
+        configured concurrency. Returns a report (dict).
+        """
+        t_start = time.time()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as ex:
+            results = list(ex.map(lambda j: self._submit(*j), jobs))
+        t_total = time.time() - t_start
+        report = {"requests": len(results),
+                  "concurrency": self.concurrency,
+                  "duration": round(t_total, 4),
+                  "throughput": round(len(
+                      [r for r in results if "error" not in r])
+                      / t_total, 4) if t_total > 0 else None,
+                  "errors": len([r for r in results if "error" in r]),
+                  "error_samples": [r.get("error") for r in results
+                                    if "error" in r][:10],
+                  "by_kind": dict()}
+        for kind in sorted(set([r.get("kind") for r in results])):
+            rs = [r for r in results if r.get("kind") == kind]
+            report["by_kind"][kind] = {
+                "requests": len(rs),
+                "errors": len([r for r in rs if "error" in r]),
+                "request_latency": summarize(
+                    [r["request_latency"] for r in rs
+                     if "request_latency" in r]),
+                "end_to_end": summarize(
+                    [r["duration"] for r in rs if "duration" in r])}
+        if self.receiver is not None and self.callback_url is not None:
+            report["callbacks"] = self._callback_stats(results)
+        return report
@@ -0,0 +1,196 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import time
+import uuid
+import json
+import random
+import threading
+import collections
+import yaml
+from flask import Flask, Response, request
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class FakeCatalogue(object):
+    """
+    In-memory stand-in for tng-cat that implements the endpoints
+    used by the TangoCatalogBackend. Used for local load tests.
+    - latency: fixed delay added to every request (seconds)
+    - latency_jitter: additional random delay (0...jitter seconds)
+    - error_rate: fraction of requests answered with error_status
+    - allow_duplicates: never report existing packages, so that the
+      same package can be uploaded over and over again
+    """
+
+    def __init__(self, latency=0.0, latency_jitter=0.0, error_rate=0.0,
+                 error_status=503, allow_duplicates=True, seed=None,
+                 prefix="/catalogues/api/v2"):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.allow_duplicates = allow_duplicates
+        self.prefix = prefix
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.packages = dict()
+        self.descriptors = dict()
+        self.files = dict()
+        self.requests = collections.Counter()
+        self.errors = collections.Counter()
+        self.bytes_received = 0
+        self.app = Flask(__name__)
+        self._add_routes()
+
+    def get_stats(self):
+        with self._lock:
+            return {"requests": dict(self.requests),
+                    "injected_errors": dict(self.errors),
+                    "bytes_received": self.bytes_received,
+                    "packages": len(self.packages),
+                    "descriptors": len(self.descriptors),
+                    "files": len(self.files)}
+
+    def _inject(self):
+        """
+        Called before every request: counts it, delays it
+        and may replace it with an error response.
+        """
+        key = "{} /{}".format(
+            request.method,
+            request.path[len(self.prefix):].strip("/").split("/")[0])
+        with self._lock:
+            self.requests[key] += 1
+            delay = self.latency
+            if self.latency_jitter > 0:
+                delay += self._random.uniform(0, self.latency_jitter)
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors[key] += 1
+        if delay > 0:
+            time.sleep(delay)
+        if fail and not request.path.endswith("/fake/stats"):
+            return Response("injected error", status=self.error_status)
+        return None
+
+    def _consume_stream(self):
+        """
+        Reads the request body chunk by chunk (like a real
+        catalogue would write it to its storage).
+        """
+        n = 0
+        for b in iter(lambda: request.stream.read(CHUNK_SIZE), b''):
+            n += len(b)
+        with self._lock:
+            self.bytes_received += n
+        return n
+
+    def _yaml_response(self, data, status=200):
+        return Response(yaml.dump(data), status=status,
+                        mimetype="application/x-yaml")
+
+    def _json_response(self, data, status=200):
+        return Response(json.dumps(data), status=status,
+                        mimetype="application/json")
+
+    def _add_routes(self):
+        app = self.app
+        p = self.prefix
+        app.before_request(self._inject)
+
+        @app.route(p + "/packages", methods=["GET"])
+        def get_packages():
+            if self.allow_duplicates:
+                return self._yaml_response(list())
+            with self._lock:
+                r = [{"uuid": k, "pd": v}
+                     for k, v in self.packages.items()
+                     if all([str(v.get(f)) == request.args.get(f)
+                             for f in ["vendor", "name", "version"]
+                             if f in request.args])]
+            return self._yaml_response(r)
+
+        @app.route(p + "/packages", methods=["POST"])
+        def post_package():
+            data = request.get_data()
+            napd = yaml.safe_load(data) or dict()
+            with self._lock:
+                self.bytes_received += len(data)
+                if not self.allow_duplicates:
+                    for k, v in self.packages.items():
+                        if all([v.get(f) == napd.get(f)
+                                for f in ["vendor", "name", "version"]]):
+                            return self._yaml_response(
+                                {"error": "duplicate", "uuid": k}, 409)
+                u = str(uuid.uuid4())
+                self.packages[u] = napd
+            return self._yaml_response({"uuid": u}, 201)
+
+        def post_descriptor():
+            data = request.get_data()
+            u = str(uuid.uuid4())
+            with self._lock:
+                self.bytes_received += len(data)
+                self.descriptors[u] = len(data)
+            return self._yaml_response({"uuid": u}, 201)
+
+        for ep in ["/vnfs", "/network-services", "/tests"]:
+            app.add_url_rule(
+                p + ep, "post_{}".format(ep.strip("/")),
+                post_descriptor, methods=["POST"])
+
+        def post_file():
+            size = self._consume_stream()
+            u = str(uuid.uuid4())
+            with self._lock:
+                self.files[u] = size
+            return self._json_response({"uuid": u}, 201)
+
+        for ep in ["/files", "/tgo-packages"]:
+            app.add_url_rule(
+                p + ep, "post_{}".format(ep.strip("/")),
+                post_file, methods=["POST"])
+
+        @app.route(p + "/files/<string:file_uuid>", methods=["GET"])
+        def get_file(file_uuid):
+            with self._lock:
+                size = self.files.get(file_uuid)
+            if size is None:
+                return Response("not found", status=404)
+            return Response(b"\0" * size, status=200,
+                            mimetype="application/octet-stream")
+
+        @app.route(p + "/fake/stats", methods=["GET"])
+        def get_stats():
+            return self._json_response(self.get_stats())
@@ -0,0 +1,76 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import time
+import threading
+from flask import Flask, request
+
+
+class CallbackReceiver(object):
+    """
+    Callback endpoint for local load tests. Records every
+    delivered callback together with the time it was received.
+    """
+
+    def __init__(self, path="/api/v1/packages/on-change"):
+        self.path = path
+        self.deliveries = list()
+        self._cond = threading.Condition()
+        self.app = Flask(__name__)
+        self.app.add_url_rule(
+            path, "on_change", self._on_change, methods=["POST"])
+
+    def _on_change(self):
+        body = request.get_json(force=True, silent=True) or dict()
+        d = {"t_received": time.time(),
+             "package_process_uuid": body.get("package_process_uuid"),
+             "package_process_status": body.get("package_process_status")}
+        with self._cond:
+            self.deliveries.append(d)
+            self._cond.notify_all()
+        return "", 200
+
+    def get(self, package_process_uuid):
+        with self._cond:
+            for d in self.deliveries:
+                if d.get("package_process_uuid") == package_process_uuid:
+                    return d
+        return None
+
+    def wait_for(self, num_deliveries, timeout=None):
+        """
+        Blocks until at least num_deliveries callbacks were received.
+        Returns False on timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: len(self.deliveries) >= num_deliveries,
+                timeout=timeout)
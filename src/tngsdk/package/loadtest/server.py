@@ -0,0 +1,77 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import logging
+import threading
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """
+    Does not log every single request (would dominate load tests).
+    """
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class BackgroundServer(object):
+    """
+    Runs a WSGI app (e.g. a Flask app) in a background thread
+    on the local machine. Port 0 selects a free port.
+    """
+
+    def __init__(self, app, host="127.0.0.1", port=0):
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        self.server = make_server(host, port, app, threaded=True,
+                                  request_handler=QuietRequestHandler)
+        self.host = host
+        self.port = self.server.server_port
+        self.url = "http://{}:{}".format(host, self.port)
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.server.serve_forever,
+            name="BackgroundServer-{}".format(self.port))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -30,11 +30,19 @@
 # acknowledge the contributions of their colleagues of the SONATA
 # partner consortium (www.5gtango.eu).
 import logging
-import coloredlogs
+import collections
 import datetime
 import json
+import os
 import sys
+import threading
+import time
 import traceback
+from tngsdk.package.metrics import METRICS
+
+
+LOG_FORMAT = ("%(asctime)s %(hostname)s %(name)s:l%(lineno)d"
+              + " %(levelname)s %(message)s")
 
 
 class TangoLogger(object):
@@ -69,15 +77,21 @@ class TangoLogger(object):
     }
     """
 
+    # last global configuration (log_level, log_json), applied to
+    # loggers created later on (e.g., in lazily imported modules)
+    _global_config = None
+
     @staticmethod
     def reconfigure_all_tango_loggers(
             log_level=logging.INFO, log_json=False):
         """
         Configure all active TangoLoggers (identified by 'tango.' prfix).
+        Loggers created later on get the same configuration.
         Two modes:
         - log_json = False: Normal colored logging in text format
         - log_json = True: 5GTANGO logging (flat JSON objects and metadata)
         """
+        TangoLogger._global_config = (log_level, log_json)
         # reconfigure all our TangoLoggers
         for n, l in logging.Logger.manager.loggerDict.items():
             # use prefix to only get TangoLoggers
@@ -105,17 +119,22 @@ class TangoLogger(object):
                     h.setLevel(999)  # disable (hide all)
 
     @staticmethod
-    def getLogger(name, log_level=logging.INFO, log_json=False):
+    def getLogger(name, log_level=None, log_json=None):
         """
         Create a TangoLogger logger.
+        Unless given, log_level and log_json are taken from the
+        last global configuration (default: INFO, text format).
         """
+        default_level, default_json = (
+            TangoLogger._global_config or (logging.INFO, False))
+        if log_level is None:
+            log_level = default_level
+        if log_json is None:
+            log_json = default_json
         # all TangoLoggers are prefixed for global setup
         logger = logging.getLogger("tango.{}".format(name))
         logger.propagate = False  # important to not emit logs twice
-        coloredlogs.install(
-            logger=logger,
-            fmt="%(asctime)s %(hostname)s %(name)s:l%(lineno)d"
-            + " %(levelname)s %(message)s")
+        logger.addHandler(TangoColoredLogHandler())
         th = TangoJsonLogHandler()
         logger.addHandler(th)
         # configure logger
@@ -123,7 +142,250 @@ class TangoLogger(object):
         return logger
 
 
-class TangoJsonLogHandler(logging.StreamHandler):
+class _LazyArg(object):
+    __slots__ = ("func", "args", "kwargs")
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.func(*self.args, **self.kwargs))
+
+    def __repr__(self):
+        return repr(self.func(*self.args, **self.kwargs))
+
+
+def lazy(func, *args, **kwargs):
+    """
+    Log message argument for expensive payloads: func(*args, **kwargs)
+    is only called if the record is emitted, i.e., if the log level
+    is enabled. Example:
+    LOG.debug("Generated NAPDR: %s", lazy(napdr.pformat))
+    """
+    return _LazyArg(func, args, kwargs)
+
+
+class TangoColoredLogHandler(logging.StreamHandler):
+    """
+    Normal colored logging in text format (using coloredlogs).
+
+    Every module creates its logger at import time, so coloredlogs
+    is only imported and set up when the first record is emitted.
+    Like coloredlogs' own handler, it always writes to the current
+    sys.stderr.
+    """
+
+    def __init__(self, fmt=LOG_FORMAT):
+        super().__init__()
+        self.fmt = fmt
+
+    def _setup(self):
+        import coloredlogs
+        coloredlogs.HostNameFilter.install(handler=self, fmt=self.fmt)
+        if ("NO_COLOR" not in os.environ
+                and coloredlogs.terminal_supports_colors(sys.stderr)):
+            self.setFormatter(coloredlogs.ColoredFormatter(fmt=self.fmt))
+        else:
+            self.setFormatter(coloredlogs.BasicFormatter(fmt=self.fmt))
+
+    def handle(self, record):
+        # filters (hostname) are applied before emit
+        if self.formatter is None:
+            with self.lock:
+                if self.formatter is None:
+                    self._setup()
+        return super().handle(record)
+
+    def emit(self, record):
+        self.stream = sys.stderr
+        super().emit(record)
+
+
+def _json_encoder():
+    """
+    Fastest available JSON encoder (orjson, ujson, json).
+    Returns a function: dict -> str
+    """
+    try:
+        import orjson
+        return lambda d: orjson.dumps(d).decode("utf-8")
+    except ImportError:
+        pass
+    try:
+        import ujson
+        return ujson.dumps
+    except ImportError:
+        pass
+    return json.dumps
+
+
+class JsonLogWriter(object):
+    """
+    Writes JSON log records in a single background thread.
+
+    Callers only append their records to a bounded queue. The writer
+    thread takes them out in batches, converts and encodes them and
+    writes each batch with a single write and flush. If the queue is
+    full, records are dropped (and counted) instead of blocking the
+    caller. With queue_size <= 0, records are written synchronously.
+    """
+
+    def __init__(self, stream=None, queue_size=None, batch_size=None):
+        self.stream = stream  # None: sys.stdout
+        if queue_size is None:
+            queue_size = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+        if batch_size is None:
+            batch_size = int(os.environ.get("LOG_BATCH_SIZE", 256))
+        self.queue_size = queue_size
+        self.batch_size = max(1, batch_size)
+        self.dropped = 0
+        self._reset()
+
+    def _reset(self):
+        """
+        (Re-)initializes the queue and the writer thread state. Also
+        called in forked children (e.g., ProcessPoolExecutor workers):
+        they inherit the queue but not the writer thread.
+        """
+        self._reported_dropped = self.dropped
+        # deque.append/popleft are thread-safe and much cheaper
+        # than queue.Queue (no lock on the caller side)
+        self._records = collections.deque()
+        self._pending = threading.Event()
+        self._writing = False
+        self._encode = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._encode is not None:
+                return
+            # the encoder is picked on first use (import time)
+            encode = _json_encoder()
+            if self.queue_size > 0:
+                self._thread = threading.Thread(
+                    target=self._run, name="TangoJsonLogWriter",
+                    daemon=True)
+                self._thread.start()
+            self._encode = encode
+
+    def write(self, convert, record):
+        """
+        Enqueues the given record. convert(record) is called
+        by the writer thread and has to return a dict.
+        """
+        if self._encode is None:
+            self._start()
+        if self._thread is None:
+            self._write_batch([(convert, record)])
+            return
+        if len(self._records) >= self.queue_size:
+            with self._lock:
+                self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+            return
+        self._records.append((convert, record))
+        if not self._pending.is_set():
+            self._pending.set()
+
+    def flush(self):
+        """
+        Blocks until all enqueued records are written.
+        """
+        if self._thread is None:
+            return
+        while ((self._records or self._writing)
+               and self._thread.is_alive()):
+            self._pending.set()
+            time.sleep(0.001)
+
+    def queue_depth(self):
+        return len(self._records)
+
+    def _run(self):
+        while True:
+            self._pending.wait()
+            self._writing = True
+            # clear before draining: records appended from now
+            # on set the event again
+            self._pending.clear()
+            while self._records:
+                batch = list()
+                while self._records and len(batch) < self.batch_size:
+                    batch.append(self._records.popleft())
+                self._write_batch(batch)
+            self._writing = False
+
+    def _dropped_record(self, count):
+        return {"type": "W",
+                "timestamp": "{} UTC".format(datetime.datetime.utcnow()),
+                "start_stop": "",
+                "component": "tango.{}".format(__name__),
+                "operation": "write",
+                "message": "Dropped {} log records (log queue full)"
+                .format(count),
+                "status": "",
+                "time_elapsed": "",
+                "threadName": threading.current_thread().name}
+
+    def _write_batch(self, batch):
+        with self._write_lock:
+            lines = list()
+            dropped = self.dropped
+            if dropped > self._reported_dropped:
+                lines.append(self._encode(self._dropped_record(
+                    dropped - self._reported_dropped)))
+                self._reported_dropped = dropped
+            for convert, record in batch:
+                try:
+                    d = convert(record)
+                    try:
+                        lines.append(self._encode(d))
+                    except (TypeError, ValueError, OverflowError):
+                        # not serializable: keep the message at least
+                        lines.append(self._encode(
+                            {k: str(v) for k, v in d.items()}))
+                except Exception:
+                    traceback.print_exc(file=sys.stderr)
+            stream = self.stream if self.stream is not None else sys.stdout
+            try:
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+            except (IOError, OSError, ValueError):
+                pass  # stream closed (e.g. at shutdown)
+
+
+# have one global instance of the writer (thread started on first use)
+JSON_LOG_WRITER = JsonLogWriter()
+if hasattr(os, "register_at_fork"):  # Python >= 3.7
+    os.register_at_fork(after_in_child=JSON_LOG_WRITER._reset)
+
+
+LOG_RECORDS_DROPPED = METRICS.counter(
+    "tng_package_log_records_dropped_total",
+    "JSON log records dropped because the log queue was full.")
+METRICS.gauge("tng_package_log_queue_depth",
+              "Number of JSON log records waiting to be written.",
+              func=JSON_LOG_WRITER.queue_depth)
+
+
+_TRACER = None
+
+
+def _current_span():
+    global _TRACER
+    if _TRACER is None:
+        # tracing uses TangoLoggers: import on first use
+        from tngsdk.package.tracing import TRACER
+        _TRACER = TRACER
+    return _TRACER.current_span()
+
+
+class TangoJsonLogHandler(logging.Handler):
     """
     Custom log handler to create JSON-based log messages
     as required by the 5GTANGO SP.
@@ -132,30 +394,53 @@ class TangoJsonLogHandler(logging.StreamHandler):
     It uses the normal Python logging interface and utilizes
     the "extra" parameter of the logging methods to add additional
     fields (optionally) for the JSON output.
+
+    Records are passed to a JsonLogWriter that converts, encodes
+    and writes them in the background.
     """
 
-    def _to_tango_dict(self, record):
+    def __init__(self, writer=None):
+        super().__init__()
+        self.writer = writer if writer is not None else JSON_LOG_WRITER
+
+    def _prepare(self, record):
         """
-        Creates a dict in 5GTANGO format from the given record.
-        Sets defaults of not given.
+        Captures everything that can not be looked up later
+        by the writer thread.
         """
+        # arguments may change once the caller continues
+        record.tango_message = record.getMessage()
+        # link log lines to the trace of the current job (if any)
+        span = _current_span()
+        record.trace_id = span.trace_id if span is not None else None
+        record.span_id = span.span_id if span is not None else None
         # fetch exception info and stack trace if available
-        exc_info_str = None
+        record.tango_exc_info = None
         if record.exc_info:
-            exc_info_str = str(
+            record.tango_exc_info = str(
                 traceback.format_exception(
                     record.exc_info[0],
                     record.exc_info[1],
                     record.exc_info[2]))
+        return record
 
+    def _to_tango_dict(self, record):
+        """
+        Creates a dict in 5GTANGO format from the given record.
+        Sets defaults of not given.
+        """
+        return self._prepared_to_tango_dict(self._prepare(record))
+
+    def _prepared_to_tango_dict(self, record):
         d = {
             # TANGO default fields
             "type": record.levelname[0],
-            "timestamp": "{} UTC".format(datetime.datetime.utcnow()),
+            "timestamp": "{} UTC".format(
+                datetime.datetime.utcfromtimestamp(record.created)),
             "start_stop": record.__dict__.get("start_stop", ""),
             "component": record.name,
             "operation": record.__dict__.get("operation", record.funcName),
-            "message": str(record.msg),
+            "message": record.tango_message,
             "status": record.__dict__.get("status", ""),
             "time_elapsed": record.__dict__.get("time_elapsed", ""),
             # some additional fields (because we can ;-))
@@ -163,13 +448,19 @@ class TangoJsonLogHandler(logging.StreamHandler):
             "threadName": record.threadName,
             "processName": record.processName,
             "stack_info": str(record.stack_info),
-            "exc_info": exc_info_str
+            "exc_info": record.tango_exc_info
         }
+        if record.trace_id is not None:
+            d["trace_id"] = record.trace_id
+            d["span_id"] = record.span_id
         return d
 
     def emit(self, record):
-        """
-        We go the simple way here: Just print the JSON :-)
-        """
-        print(json.dumps(self._to_tango_dict(record)))
-        sys.stdout.flush()
+        try:
+            self.writer.write(
+                self._prepared_to_tango_dict, self._prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.writer.flush()
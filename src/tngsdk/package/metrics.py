@@ -0,0 +1,307 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+"""
+Minimal, thread-safe metrics (counters, gauges, histograms)
+that are exported in the Prometheus text format by the
+/metrics endpoint of the REST API.
+"""
+import math
+import threading
+import time
+import contextlib
+
+
+# upper bounds of the duration histograms (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5,
+                   5, 10, 30, 60, 120, 300, math.inf)
+
+
+def _format_value(v):
+    if v == math.inf:
+        return "+Inf"
+    if v == -math.inf:
+        return "-Inf"
+    return repr(float(v))
+
+
+def _escape(v):
+    return (str(v).replace("\\", "\\\\")
+            .replace("\n", "\\n").replace('"', '\\"'))
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if len(pairs) < 1:
+        return ""
+    return "{" + ",".join(
+        ['{}="{}"'.format(k, _escape(v)) for k, v in pairs]) + "}"
+
+
+class Metric(object):
+    """
+    Base class of all metrics. Values are kept per
+    combination of label values.
+    """
+    type_name = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = dict()
+
+    def _key(self, labels):
+        if set(labels.keys()) != set(self.labelnames):
+            raise ValueError("{}: expected labels {} got {}".format(
+                self.name, self.labelnames, sorted(labels.keys())))
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values = dict()
+
+    def _samples(self):
+        """
+        Returns [(suffix, label values, extra label, value), ...]
+        """
+        with self._lock:
+            return [("", k, None, v) for k, v in sorted(self._values.items())]
+
+    def render(self):
+        lines = ["# HELP {} {}".format(self.name, self.help_text),
+                 "# TYPE {} {}".format(self.name, self.type_name)]
+        for suffix, key, extra, value in self._samples():
+            lines.append("{}{}{} {}".format(
+                self.name, suffix,
+                _format_labels(self.labelnames, key, extra),
+                _format_value(value)))
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only be increased.")
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + amount
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), func=None):
+        super().__init__(name, help_text, labelnames)
+        # optional function that returns the current value
+        # (only for gauges without labels)
+        self.func = func
+
+    def set(self, value, **labels):
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = value
+
+    def inc(self, amount=1, **labels):
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextlib.contextmanager
+    def track(self, **labels):
+        """
+        Increases the gauge while the block is executed.
+        """
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def get(self, **labels):
+        if self.func is not None:
+            return self.func()
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        if self.func is not None:
+            return [("", (), None, self.func())]
+        return super()._samples()
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        buckets = sorted(buckets)
+        if buckets[-1] != math.inf:
+            buckets.append(math.inf)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        k = self._key(labels)
+        with self._lock:
+            v = self._values.get(k)
+            if v is None:
+                v = self._values[k] = {
+                    "buckets": [0] * len(self.buckets),
+                    "sum": 0.0, "count": 0}
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    v["buckets"][i] += 1
+                    break
+            v["sum"] += value
+            v["count"] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """
+        Observes the duration of the block.
+        """
+        t_start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(time.time() - t_start, **labels)
+
+    def get(self, **labels):
+        """
+        Returns (count, sum) of the observations.
+        """
+        with self._lock:
+            v = self._values.get(self._key(labels))
+            return (0, 0.0) if v is None else (v["count"], v["sum"])
+
+    def _samples(self):
+        samples = list()
+        with self._lock:
+            for k, v in sorted(self._values.items()):
+                cumulative = 0
+                for b, c in zip(self.buckets, v["buckets"]):
+                    cumulative += c
+                    samples.append(
+                        ("_bucket", k, ("le", _format_value(b)),
+                         cumulative))
+                samples.append(("_sum", k, None, v["sum"]))
+                samples.append(("_count", k, None, v["count"]))
+        return samples
+
+
+class MetricsRegistry(object):
+    """
+    Collection of all metrics of this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = dict()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(
+                    "Metric already registered: {}".format(metric.name))
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def clear(self):
+        """
+        Resets the values of all metrics.
+        """
+        with self._lock:
+            for m in self._metrics.values():
+                m.clear()
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text format.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "\n".join([m.render() for m in metrics]) + "\n"
+
+
+# have one global registry
+METRICS = MetricsRegistry()
+
+
+STAGE_DURATION = METRICS.histogram(
+    "tng_package_stage_duration_seconds",
+    "Duration of the stages of (un)packaging processes.",
+    ["operation", "stage"])
+JOB_DURATION = METRICS.histogram(
+    "tng_package_job_duration_seconds",
+    "Duration of (un)packaging processes.",
+    ["operation", "status"])
+ACTIVE_JOBS = METRICS.gauge(
+    "tng_package_active_jobs",
+    "Number of running (un)packaging processes.",
+    ["operation"])
+BYTES_HASHED = METRICS.counter(
+    "tng_package_hashed_bytes_total",
+    "Bytes of files hashed (checksums).")
+BYTES_COMPRESSED = METRICS.counter(
+    "tng_package_compressed_bytes_total",
+    "Bytes of files added to ZIP/tar.gz archives (uncompressed).")
+BYTES_UPLOADED = METRICS.counter(
+    "tng_package_uploaded_bytes_total",
+    "Bytes of artifacts uploaded to storage backends.",
+    ["backend"])
+UPLOAD_QUEUE_DEPTH = METRICS.gauge(
+    "tng_package_upload_queue_depth",
+    "Number of artifact uploads waiting for a free upload slot.")
@@ -13,10 +13,26 @@ class PackagerManager(object):
 
     def __init__(self):
         self._packager_list = list()
+        # index: str(uuid) -> packager for fast status lookups
+        self._packager_index = dict()
 
     def new_packager(self, args,
                      storage_backend=None,
-                     pkg_format="eu.5gtango"):
+                     pkg_format="eu.5gtango",
+                     workspace=None):
+        packager_cls = self.packager_class(pkg_format)
+        p = packager_cls(args, storage_backend=storage_backend,
+                         workspace=workspace)
+        # TODO cleanup after packaging has completed (memory leak!!!)
+        self._packager_list.append(p)
+        self._packager_index[str(p.uuid)] = p
+        return p
+
+    def packager_class(self, pkg_format="eu.5gtango"):
+        """
+        The Packager class of the given format (not registered,
+        e.g., for inspections).
+        """
         # select the right Packager for the given format
         packager_cls = None
         if pkg_format == "eu.5gtango":
@@ -33,17 +49,10 @@ class PackagerManager(object):
         if packager_cls is None:
             raise UnsupportedPackageFormatException(
                 "Pkg. format: {} not supported.".format(pkg_format))
-        p = packager_cls(args, storage_backend=storage_backend)
-        # TODO cleanup after packaging has completed (memory leak!!!)
-        self._packager_list.append(p)
-        return p
+        return packager_cls
 
     def get_packager(self, uuid):
-        LOG.debug(self._packager_list)
-        for p in self._packager_list:
-            if str(p.uuid) == uuid:
-                return p
-        return None
+        return self._packager_index.get(str(uuid))
 
     @property
     def packager_list(self):
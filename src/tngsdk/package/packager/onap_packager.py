@@ -86,7 +86,9 @@ class OnapPackager(OsmPackager):
         for package in package_set.packages():
             package_path = (
                 os.path.join(wd, "{}.csar".format(package.package_name)))
-            creat_zip_file_from_directory(package.temp_dir, package_path)
+            creat_zip_file_from_directory(
+                package.temp_dir, package_path,
+                date_time=self.zip_date_time())
 
     def write_manifests(self, package_set, TOSCA_direc="TOSCA-Metadata",
                         tosca_filename="TOSCA.meta"):
@@ -107,12 +109,12 @@ class OnapPackager(OsmPackager):
                 package.descriptor_file["filename"])[0] + ".mf"
             path = os.path.join(package.temp_dir, etsi_mf_filename)
             mf_data = self.generate_etsi_mf(package, package_set)
-            LOG.debug("Writing ETSI manifest to: {}".format(path))
+            LOG.debug("Writing ETSI manifest to: %s", path)
             write_block_based_meta_file(mf_data, path)
 
             tosca_data = self.generate_tosca(package, package_set)
             path = os.path.join(package.temp_dir, TOSCA_direc, tosca_filename)
-            LOG.debug("Writing TOSCA.meta to: {}".format(path))
+            LOG.debug("Writing TOSCA.meta to: %s", path)
             write_block_based_meta_file(tosca_data, path)
 
     def generate_tosca(self, package, package_set, tosca_meta_version="1.0",
@@ -198,11 +200,14 @@ class OnapPackager(OsmPackager):
         onap_package_set._project_wd = wd
         onap_package_set._sort_files()
         # 5. creating temporary directories and copy descriptors
+        self.report_progress("create_directory_tree")
         self.create_temp_dirs(onap_package_set, project_path)
         # 6. copy files
+        self.report_progress("copy_files")
         self.attach_files(onap_package_set, project_path)
         self.write_manifests(onap_package_set)
         # 7. create packages from temporary directories
+        self.report_progress("zip")
         self.pack_packages(wd, onap_package_set)
         onap_package_set.metadata["_storage_location"] = wd
         return onap_package_set
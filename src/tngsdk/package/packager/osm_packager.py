@@ -1,12 +1,12 @@
 import hashlib
 import os
-import tempfile
 import shutil
 import tarfile
 from tngsdk.package.helper import file_hash, _makedirs
 from tngsdk.package.packager.packager import EtsiPackager, NapdRecord
 from tngsdk.package.packager.exeptions import NoOSMFilesFound
 from tngsdk.package.logger import TangoLogger
+from tngsdk.package.metrics import BYTES_COMPRESSED
 
 LOG = TangoLogger.getLogger(__name__)
 
@@ -82,7 +82,7 @@ class OsmPackager(EtsiPackager):
         Returns:
             path to the temp directory
         """
-        temp = tempfile.mkdtemp()
+        temp = self.mkdtemp()
         if subdir_name is not None:
             _makedirs(os.path.join(temp, subdir_name))
             temp = os.path.join(temp, subdir_name)
@@ -150,6 +150,8 @@ class OsmPackager(EtsiPackager):
                 os.path.join(wd, "{}.tar.gz".format(package.package_name)))
             with tarfile.open(package_path, "w:gz") as f:
                 f.add(package.temp_dir, arcname=package.package_name)
+                BYTES_COMPRESSED.inc(
+                    sum([m.size for m in f.getmembers() if m.isfile()]))
 
     def choose_folder(self, tags, _type, filename):
         """
@@ -247,10 +249,13 @@ class OsmPackager(EtsiPackager):
         osm_package_set._project_wd = wd
         osm_package_set._sort_files()
         # 5. creating temporary directories and copy descriptors
+        self.report_progress("create_directory_tree")
         self.create_temp_dirs(osm_package_set, project_path)
         # 6. copy files
+        self.report_progress("copy_files")
         self.attach_files(osm_package_set, project_path)
         # 7. create packages from temporary directories
+        self.report_progress("zip")
         self.pack_packages(wd, osm_package_set)
         osm_package_set.metadata["_storage_location"] = wd
         return osm_package_set
@@ -38,12 +38,17 @@ import yaml
 import re
 import datetime
 import pprint
-import pyrfc3339
 import hashlib
-import tempfile
 from tngsdk.package.helper import dictionary_deep_merge, file_hash,\
-    search_for_file, creat_zip_file_from_directory
-from tngsdk.package.logger import TangoLogger
+    search_for_file, creat_zip_file_from_directory, PackageArchive
+from tngsdk.package.logger import TangoLogger, lazy
+from tngsdk.package.metrics import STAGE_DURATION, JOB_DURATION, \
+    ACTIVE_JOBS
+from tngsdk.package.tracing import TRACER, Trace
+from tngsdk.package.accounting import ResourceAccount
+from tngsdk.package.buildcache import BUILD_CACHE
+from tngsdk.package.scratch import SCRATCH, estimate_scratch_bytes, \
+    ScratchQuotaExceededException
 from tngsdk.package.validator import validate_project_with_external_validator
 from tngsdk.package.packager.exeptions import MissingInputException,\
     MissingMetadataException, MissingFileException, ChecksumException,\
@@ -65,6 +70,10 @@ class PkgStatus(object):
     FAILED = "failed"
     SUCCESS = "success"
 
+    @staticmethod
+    def is_final(status):
+        return status in [PkgStatus.FAILED, PkgStatus.SUCCESS]
+
 
 class NapdRecord(object):
     """
@@ -95,6 +104,16 @@ class NapdRecord(object):
         self.__dict__.update(kwargs)
 
     def __repr__(self):
+        # summary only: the records of large packages have thousands
+        # of content entries (see pformat)
+        return "NapdRecord({}.{}.{}, {} content entries, error={})".format(
+            self.vendor, self.name, self.version,
+            len(self.package_content or []), self.error)
+
+    def pformat(self):
+        """
+        Full (pretty-printed) contents of the record.
+        """
         return "NapdRecord({})".format(pprint.pformat(self.to_dict()))
 
     def find_package_content_entry(self, source):
@@ -120,7 +139,8 @@ class NapdRecord(object):
             del d["metadata"]
         if "_project_wd" in d:
             del d["_project_wd"]
-        # package content
+        # package content (copies: the record keeps its annotations)
+        d["package_content"] = [dict(pc) for pc in d.get("package_content")]
         for pc in d.get("package_content"):
             if "_project_source" in pc:
                 del pc["_project_source"]
@@ -161,19 +181,48 @@ class Packager(object):
     by format-specific packager classes.
     """
 
-    def __init__(self, args, storage_backend=None):
+    def __init__(self, args, storage_backend=None, workspace=None):
         # unique identifier for this package request
         self.uuid = uuid.uuid4()
+        # status changes and progress events are published through
+        # this condition so that clients can wait for them (long-poll, SSE)
+        self._status_cond = threading.Condition()
+        self._events = list()
+        self._status = None
+        self.stage = None
+        # "package" or "unpackage" (metrics label)
+        self._operation = None
+        self._t_stage_start = None
+        # spans of this process (trace ID = packager UUID)
+        self.trace = Trace(self.uuid)
+        self._root_span = None
+        self._stage_span = None
+        # store a CPU profile of this process (see profiling.py)
+        self.profile = False
+        self.profile_paths = None
+        # resource consumption (see accounting.py)
+        self.resources = None
+        self._account = None
+        # scratch space of this process (see scratch.py),
+        # created on demand if not given
+        self.workspace = workspace
+        # contents of the package file if it is kept in memory
+        # (small uploads), args.unpackage is its name then
+        self.package_data = None
+        # results of earlier unpackaging processes (see unpackcache.py),
+        # only used if set (service)
+        self.unpack_cache = None
+        self.error_msg = None
+        # set if _do_(un)package raised an unexpected exception
+        self._failed_unexpectedly = False
         self.status = PkgStatus.WAITING
         self.storage_backend = storage_backend
-        self.error_msg = None
         self.args = args
         self.result = NapdRecord()
         self.version_incremented = False
         self.checksum_algorithm = "SHA-256"
-        LOG.info("Packager created: {}".format(self),
-                 extra={"start_stop": "START"})
-        LOG.debug("Packager args: {}".format(self.args))
+        LOG.info("Packager created: %s", self, extra={"start_stop": "START"})
+        LOG.debug("Packager args: %s", self.args)
         if (self.storage_backend is None
                 and self.args.unpackage is not None):
             LOG.warning("Disabled storage backend: store_skip=True?")
@@ -181,6 +230,87 @@ class Packager(object):
     def __repr__(self):
         return "{}({})".format(self.__class__.__name__, self.uuid)
 
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        with self._status_cond:
+            if value == self._status:
+                return
+            self._status = value
+            self._add_event("status")
+
+    def report_progress(self, stage):
+        """
+        Called by the format-specific implementations whenever
+        a new stage of the (un)packaging process is entered.
+        """
+        if self.workspace is not None:
+            self.workspace.check_quota()
+        with self._status_cond:
+            self._end_stage()
+            self.stage = stage
+            self._t_stage_start = time.time()
+            if self._root_span is not None:
+                self._stage_span = self.trace.start_span(
+                    stage, parent=self._root_span)
+                TRACER.set_current_span(self._stage_span)
+            self._add_event("progress")
+
+    def _end_stage(self):
+        """
+        Records the duration of the current stage.
+        """
+        if self._t_stage_start is None:
+            return
+        STAGE_DURATION.observe(time.time() - self._t_stage_start,
+                               operation=self._operation or "unknown",
+                               stage=self.stage)
+        self._t_stage_start = None
+        if self._account is not None:
+            self._account.end_stage(self.stage)
+        if self._stage_span is not None:
+            self._stage_span.end()
+            self._stage_span = None
+            TRACER.set_current_span(self._root_span)
+
+    def _add_event(self, event_type):
+        """
+        Records an event and wakes up all waiting clients.
+        Must be called while holding self._status_cond.
+        """
+        self._events.append({"id": len(self._events) + 1,
+                             "event": event_type,
+                             "status": self._status,
+                             "stage": self.stage,
+                             "error_msg": self.error_msg,
+                             "timestamp": time.time()})
+        self._status_cond.notify_all()
+
+    def wait_for_status_change(self, status, timeout=None):
+        """
+        Blocks until the status of this packager differs from
+        the given status or the timeout (in seconds) is reached.
+        Returns the current status.
+        """
+        with self._status_cond:
+            self._status_cond.wait_for(
+                lambda: self._status != status, timeout=timeout)
+            return self._status
+
+    def wait_for_events(self, last_event_id=0, timeout=None):
+        """
+        Blocks until events newer than last_event_id are available
+        or the timeout (in seconds) is reached.
+        Returns a (possibly empty) list of event dicts.
+        """
+        with self._status_cond:
+            self._status_cond.wait_for(
+                lambda: len(self._events) > last_event_id, timeout=timeout)
+            return [e.copy() for e in self._events[last_event_id:]]
+
     def _wait_for_thread(self, t):
         while t.is_alive():
             LOG.debug("Waiting for package/unpackage process ...")
@@ -188,6 +318,7 @@ class Packager(object):
             t.join(timeout=0.5)
 
     def package(self, callback_func=None):
+        self._operation = "package"
         t = threading.Thread(
             target=self._thread_package,
             args=(callback_func,))
@@ -199,6 +330,7 @@ class Packager(object):
             self._wait_for_thread(t)
 
     def unpackage(self, callback_func=None):
+        self._operation = "unpackage"
         t = threading.Thread(
             target=self._thread_unpackage,
             args=(callback_func,))
@@ -209,34 +341,215 @@ class Packager(object):
             # behave synchronous if callback is None
             self._wait_for_thread(t)
 
+    def _start_root_span(self, operation, path):
+        """
+        Root span of this process. All stages are its children.
+        """
+        attributes = {"operation": operation,
+                      "packager_uuid": str(self.uuid),
+                      "file": path}
+        if self.package_data is not None:
+            attributes["size"] = len(self.package_data)
+        elif path is not None and os.path.isfile(path):
+            attributes["size"] = os.path.getsize(path)
+        return TRACER.span("packager", trace=self.trace, **attributes)
+
+    def add_scratch_path(self, path):
+        """
+        Registers temporary files/directories of this process
+        (scratch-disk accounting).
+        """
+        if self._account is not None:
+            self._account.add_scratch_path(path)
+
+    def mkdtemp(self):
+        """
+        Creates a temporary folder in the workspace of this
+        process. It is removed when the process is done.
+        """
+        if self.workspace is None:
+            src = (getattr(self.args, "unpackage", None)
+                   or getattr(self.args, "package", None))
+            self.workspace = SCRATCH.workspace(
+                self.uuid, estimate_scratch_bytes(src))
+            self.add_scratch_path(self.workspace.path)
+        return self.workspace.mkdtemp()
+
+    @property
+    def reproducible(self):
+        """
+        Create reproducible packages (same project, same bytes):
+        --reproducible or SOURCE_DATE_EPOCH set.
+        """
+        return (bool(getattr(self.args, "reproducible", False))
+                or "SOURCE_DATE_EPOCH" in os.environ)
+
+    def zip_date_time(self):
+        """
+        Timestamp of the members of created archives:
+        None (file system values) or the fixed timestamp
+        of reproducible packages.
+        """
+        if not self.reproducible:
+            return None
+        return source_date_time().timetuple()[:6]
+
+    def build_cache_key(self, napdr, project_descriptor):
+        """
+        Key of the package built from the given NAPDR
+        (metadata, artifact checksums, release date) and
+        project descriptor in the build cache.
+        """
+        def _clean(d):
+            # drop temp. annotations, like '_project_source'
+            if isinstance(d, dict):
+                return {k: _clean(v) for k, v in d.items()
+                        if not str(k).startswith("_")}
+            if isinstance(d, list):
+                return [_clean(v) for v in d]
+            return d
+
+        return BUILD_CACHE.key({
+            "packager": self.__class__.__name__,
+            "checksum_algorithm": self.checksum_algorithm,
+            "no_subfolder_compression": bool(
+                getattr(self.args, "no_subfolder_compression", False)),
+            "project_descriptor": _clean(project_descriptor),
+            "napd": _clean(napdr.to_clean_dict())})
+
+    def unpack_cache_key(self):
+        """
+        Key of the result of this unpackaging process in the
+        unpack result cache: checksum of the package and the
+        options that influence its validation.
+        """
+        if self.package_data is not None:
+            package_hash = hashlib.sha256(self.package_data).hexdigest()
+        else:
+            package_hash = self.file_hash(self.args.unpackage)
+        validation_level = self.args.validation_level
+        if (self.args.skip_validation
+                or os.environ.get("SKIP_VALIDATION", "False") == "True"):
+            validation_level = "skip"
+        return self.unpack_cache.key(
+            package_hash,
+            packager=self.__class__.__name__,
+            validation_level=validation_level,
+            offline=bool(self.args.offline),
+            no_checksums=bool(self.args.no_checksums))
+
+    def release_workspace(self):
+        """
+        Removes all temporary files and folders of this process.
+        """
+        if self.workspace is not None:
+            self.workspace.release()
+
+    def _start_accounting(self):
+        self._account = ResourceAccount().start()
+        if self.workspace is not None:
+            self.add_scratch_path(self.workspace.path)
+
+    def _finish_accounting(self):
+        self.resources = self._account.finish()
+        self.result.metadata["_resources"] = self.resources
+        LOG.debug("Resources used by %s: %s", self, self.resources)
+
+    def _call_profiled(self, func):
+        """
+        Calls func, profiled if requested for this process.
+        """
+        if not self.profile:
+            return func()
+        # only needed if profiling is requested
+        from tngsdk.package.profiling import JobProfiler
+        with JobProfiler(self.uuid) as prof:
+            r = func()
+        self.profile_paths = prof.paths
+        return r
+
+    def _call_job(self, func):
+        """
+        Calls the format specific implementation (func).
+        """
+        try:
+            return self._call_profiled(func)
+        except ScratchQuotaExceededException as e:
+            LOG.error(str(e))
+            self.error_msg = str(e)
+            return NapdRecord(error=str(e))
+        except Exception as e:
+            # unexpected: the process has to fail (not stay running),
+            # otherwise status waiters and event streams never end
+            LOG.exception("Unexpected error in %s: %s", self, e)
+            self.error_msg = "Unexpected error: {}".format(e)
+            self._failed_unexpectedly = True
+            return NapdRecord(error=self.error_msg)
+
     def _thread_unpackage(self, callback_func):
         t_start = time.time()
-        # call format specific implementation
-        self.result = self._do_unpackage()
-        LOG.info("Packager done ({:.4f}s): {} error: {}".format(
-            time.time()-t_start, self, self.result.error),
-            extra={"start_stop": "STOP",
-                   "time_elapsed": str(time.time()-t_start)})
-        if self.result.error is None:
-            self.status = PkgStatus.SUCCESS
-        else:
-            self.status = PkgStatus.FAILED
-        # callback
-        if callback_func:
-            callback_func(self)
+        with self._start_root_span(
+                "unpackage", getattr(self.args, "unpackage", None)) as span:
+            self._root_span = span
+            self._start_accounting()
+            try:
+                # call format specific implementation
+                with ACTIVE_JOBS.track(operation="unpackage"):
+                    self.result = self._call_job(self._do_unpackage)
+                with self._status_cond:
+                    self._end_stage()
+                self._finish_accounting()
+            finally:
+                # success, failure or unexpected exception
+                self.release_workspace()
+            LOG.info("Packager done (%.4fs): %s error: %s",
+                     time.time()-t_start, self, self.result.error,
+                     extra={"start_stop": "STOP",
+                            "time_elapsed": str(time.time()-t_start)})
+            if self.result.error is None:
+                self.status = PkgStatus.SUCCESS
+            else:
+                self.status = PkgStatus.FAILED
+                span.status = "error"
+            span.set_attribute("status", self.status)
+            JOB_DURATION.observe(time.time() - t_start,
+                                 operation="unpackage", status=self.status)
+            # callback
+            if callback_func:
+                callback_func(self)
 
     def _thread_package(self, callback_func):
         t_start = time.time()
-        # call format specific implementation
-        self.result = self._do_package()
-        LOG.info("Packager done ({:.4f}s): {}".format(
-            time.time()-t_start, self),
-            extra={"start_stop": "STOP",
-                   "time_elapsed": str(time.time()-t_start)})
-        self.status = PkgStatus.SUCCESS
-        # callback
-        if callback_func:
-            callback_func(self)
+        with self._start_root_span(
+                "package", getattr(self.args, "package", None)) as span:
+            self._root_span = span
+            self._start_accounting()
+            try:
+                # call format specific implementation
+                with ACTIVE_JOBS.track(operation="package"):
+                    self.result = self._call_job(self._do_package)
+                with self._status_cond:
+                    self._end_stage()
+                self._finish_accounting()
+            finally:
+                # success, failure or unexpected exception
+                self.release_workspace()
+            LOG.info("Packager done (%.4fs): %s",
+                     time.time()-t_start, self,
+                     extra={"start_stop": "STOP",
+                            "time_elapsed": str(time.time()-t_start)})
+            if self._failed_unexpectedly:
+                self.status = PkgStatus.FAILED
+            else:
+                self.status = PkgStatus.SUCCESS
+            if self.result.error is not None:
+                span.status = "error"
+            span.set_attribute("status", self.status)
+            JOB_DURATION.observe(time.time() - t_start,
+                                 operation="package", status=self.status)
+            # callback
+            if callback_func:
+                callback_func(self)
 
     def _do_unpackage(self, *args, **kwargs):
         LOG.error("_do_unpackage has to be overwritten")
@@ -256,10 +569,11 @@ class Packager(object):
             else:
                 LOG.error("No project path. Abort.")
                 return NapdRecord()
-            LOG.info("Creating 5GTANGO package using project: '{}'"
-                     .format(project_path))
+            LOG.info("Creating 5GTANGO package using project: '%s'",
+                     project_path)
             try:
                 # 0. validate project with external validator
+                self.report_progress("validate")
                 if (self.args.skip_validation or
                         self.args.validation_level == "skip" or
                         os.environ.get("SKIP_VALIDATION", "False") == "True"):
@@ -269,6 +583,7 @@ class Packager(object):
                     validate_project_with_external_validator(
                         self.args, project_path)
                 # 1. find and load project descriptor
+                self.report_progress("read_project_descriptor")
                 if project_path is None or project_path == "None":
                     raise MissingInputException("No project path. Abort.")
                 project_descriptor = self._pack_read_project_descriptor(
@@ -292,22 +607,22 @@ class Packager(object):
                     project_descriptor["files"] = \
                         list(filter(_filter, project_descriptor["files"]))
                 # 2. create a NAPDR for the new package
+                self.report_progress("create_napdr")
                 napdr = self._pack_create_napdr(project_path,
                                                 project_descriptor)
                 napdr.package_type = self._pack_get_package_type(napdr)
-                LOG.debug("Generated NAPDR: {}".format(napdr))
+                LOG.debug("Generated NAPDR: %s", lazy(napdr.pformat))
                 # 3. create a temporary working directory
-                napdr._project_wd = tempfile.mkdtemp()
-                LOG.debug("Created temp. working directory: {}"
-                          .format(napdr._project_wd))
+                napdr._project_wd = self.mkdtemp()
+                LOG.debug("Created temp. working directory: %s",
+                          napdr._project_wd)
 
                 napdr = function(**locals())
 
                 self.store_autoversion(project_descriptor, project_path)
                 return napdr
             except BaseException as e:
-                LOG.error("{}; Exception of type: {}".format(
-                    str(e), str(type(e))))
+                LOG.error("%s; Exception of type: %s", str(e), str(type(e)))
                 self.error_msg = str(e)
                 return NapdRecord(error=str(e))
 
@@ -340,11 +655,12 @@ class Packager(object):
         Returns:
             path to the zip file
         """
-        tmp = tempfile.mkdtemp()
+        tmp = self.mkdtemp()
         filename = "{}.zip".format(os.path.basename(path))
         src = os.path.join(pp, path)
         dest = os.path.join(tmp, filename)
-        creat_zip_file_from_directory(src, dest)
+        creat_zip_file_from_directory(
+            src, dest, date_time=self.zip_date_time())
         return dest
 
     def _pack_get_package_type(self, napdr):
@@ -419,8 +735,10 @@ class Packager(object):
         # create initial NAPDR with package contents of project (name etc.)
         napdr = NapdRecord(**pd.get("package"))
         # add release date and time
-        napdr.release_date_time = pyrfc3339.generate(
-            datetime.datetime.now(), accept_naive=True)
+        if self.reproducible:
+            napdr.release_date_time = _rfc3339(source_date_time())
+        else:
+            napdr.release_date_time = _rfc3339_now()
         # add package content
         for f in pd.get("files"):
             r = {"source": self._pack_package_source_path(f),
@@ -482,7 +800,7 @@ class Packager(object):
             project_descriptor["package"]["version"] = str(version)
             self.version_incremented = True
         except Exception as e:
-            LOG.warning("Autoversion failed: {}, {}".format(type(e), e))
+            LOG.warning("Autoversion failed: %s, %s", type(e), e)
             self.version_incremented = False
         return project_descriptor
 
@@ -499,9 +817,8 @@ class Packager(object):
                                    project_descriptor_filename), "w") as f:
                 yaml.dump(project_descriptor, f, default_flow_style=False)
         except Exception as e:
-            LOG.warning("""Store autoversion failed,
-                but package of new version created: {}, {}""".format(
-                                                type(e), e))
+            LOG.warning("Store autoversion failed, but package of new "
+                        "version created: %s, %s", type(e), e)
             return False
         return True
 
@@ -522,6 +839,43 @@ class CsarBasePackager(Packager):
         return self._update_nr_with_tosca(
             self._read_tosca_meta(wd))
 
+    def collect_metadata_from_archive(self, archive):
+        """
+        Like collect_metadata but reads the metadata files directly
+        from the given PackageArchive (without extracting it).
+        """
+        LOG.debug("Collecting TOSCA CSAR meta data from archive ...")
+        return self._update_nr_with_tosca(
+            self._read_tosca_meta_from_archive(archive))
+
+    def inspect(self, pkg_file):
+        """
+        Reads the metadata of the given package (path or file-like
+        object) without extracting, validating or storing it: only
+        the ZIP central directory and the metadata files
+        (TOSCA.meta, manifest, NAPD) are read.
+        Returns a NapdRecord. Its package_content entries get the
+        (compressed) size of their files ('size', 'compressed_size',
+        None if the file is missing).
+        """
+        try:
+            with PackageArchive(pkg_file) as archive:
+                nr = self.collect_metadata_from_archive(archive)
+                names = set(archive.namelist())
+                for pc in nr.package_content:
+                    name = pc.get("source")
+                    if name not in names:
+                        name = archive.find(name or "")
+                    info = None if name is None else archive.getinfo(name)
+                    pc["size"] = None if info is None else info.file_size
+                    pc["compressed_size"] = (
+                        None if info is None else info.compress_size)
+                return nr
+        except BaseException as e:
+            LOG.error("Cannot inspect package: %s", e)
+            self.error_msg = str(e)
+            return NapdRecord(error=str(e))
+
     def _update_nr_with_tosca(self, tosca_meta, nr=None):
         """
         Creates a NapdRecord and fills it with TOSCA
@@ -541,8 +895,7 @@ class CsarBasePackager(Packager):
         # Maintainer = Created By
         nr.maintainer = tosca_meta[0].get("Created-By")
         # TOSCA has no create date/time: Use current time
-        nr.release_date_time = pyrfc3339.generate(
-            datetime.datetime.now(), accept_naive=True)
+        nr.release_date_time = _rfc3339_now()
         # add raw TOSCA metadata
         nr.metadata["tosca"] = tosca_meta
         # LOG.debug("Added TOSCA meta data to {}".format(nr))
@@ -561,7 +914,20 @@ class CsarBasePackager(Packager):
             with open(path, "r") as f:
                 return parse_block_based_meta_file(f)
         except BaseException as e:
-            LOG.error("Cannot read TOSCA metadata: {}".format(e))
+            LOG.error("Cannot read TOSCA metadata: %s", e)
+        return [{}]
+
+    def _read_tosca_meta_from_archive(self, archive):
+        """
+        Like _read_tosca_meta but for PackageArchive inputs.
+        """
+        try:
+            name = archive.find("**/TOSCA.meta")
+            if name is None:
+                raise MissingMetadataException("Cannot find TOSCA.meta")
+            return parse_block_based_meta_file(archive.read_text(name))
+        except BaseException as e:
+            LOG.error("Cannot read TOSCA metadata: %s", e)
         return [{}]
 
 
@@ -575,6 +941,13 @@ class EtsiPackager(CsarBasePackager):
         # update nr with ETSI info
         return self._update_nr_with_etsi(etsi_mf, nr)
 
+    def collect_metadata_from_archive(self, archive):
+        nr = super().collect_metadata_from_archive(archive)
+        LOG.debug("Collecting ETSI manifest meta data from archive ...")
+        etsi_mf = self._read_etsi_manifest_from_archive(
+            archive, nr.metadata.get("tosca"))
+        return self._update_nr_with_etsi(etsi_mf, nr)
+
     def _update_nr_with_etsi(self, etsi_mf, nr=None):
         """
         Updates NR with data from ETSI manifest input.
@@ -620,7 +993,7 @@ class EtsiPackager(CsarBasePackager):
             # translate block1 to blockN
             block = etsi_mf[i]
             if "Source" not in block or block.get("Source") is None:
-                LOG.warning("Skipping block in ETSI MF: {}".format(block))
+                LOG.warning("Skipping block in ETSI MF: %s", block)
                 continue
             pc = {"source": block.get("Source"),
                   "algorithm": block.get("Algorithm"),
@@ -656,8 +1029,8 @@ class EtsiPackager(CsarBasePackager):
                 path = search_for_file(
                     os.path.join(wd, tosca_meta[0].get("Entry-Manifest")))
                 if path is None:
-                    LOG.warning("Entry-Manifest '{}' not found.".format(
-                        tosca_meta[0].get("Entry-Manifest")))
+                    LOG.warning("Entry-Manifest '%s' not found.",
+                                tosca_meta[0].get("Entry-Manifest"))
                     # try 2:
                     path = search_for_file(
                         os.path.join(wd, "*.mf"), recursive=False)
@@ -667,7 +1040,26 @@ class EtsiPackager(CsarBasePackager):
             with open(path, "r") as f:
                 return parse_block_based_meta_file(f)
         except BaseException as e:
-            LOG.error("Cannot read ETSI manifest file: {}".format(e))
+            LOG.error("Cannot read ETSI manifest file: %s", e)
+        return [{}]
+
+    def _read_etsi_manifest_from_archive(self, archive, tosca_meta):
+        """
+        Like _read_etsi_manifest but for PackageArchive inputs.
+        """
+        try:
+            name = None
+            if (tosca_meta is not None
+                    and tosca_meta[0].get("Entry-Manifest") is not None):
+                name = archive.find(tosca_meta[0].get("Entry-Manifest"))
+            if name is None:
+                name = archive.find("*.mf")
+            if name is None:
+                raise MissingMetadataException(
+                    "Cannot find ETSI manifest file.")
+            return parse_block_based_meta_file(archive.read_text(name))
+        except BaseException as e:
+            LOG.error("Cannot read ETSI manifest file: %s", e)
         return [{}]
 
     def _validate_package_content_checksums(self, wd, napdr):
@@ -688,17 +1080,22 @@ class EtsiPackager(CsarBasePackager):
                     .format(ce))
             if ce.get("algorithm") is None:
                 # warn and skip entry (a risk but makes things easier for now)
-                LOG.warning("Package content without checksum: {}".format(ce))
+                LOG.warning("Package content without checksum: %s", ce)
                 continue
             if ce.get("algorithm") is not None and ce.get("hash") is None:
                 raise ChecksumException("Checksum missing: {}"
                                         .format(ce))
             # find file
-            path = search_for_file(os.path.join(wd, ce.get("source")))
+            if isinstance(wd, PackageArchive):
+                name = wd.find(ce.get("source"))
+                path = None if name is None else wd.member(name)
+                location = "{}:{}".format(wd.path, ce.get("source"))
+            else:
+                path = search_for_file(os.path.join(wd, ce.get("source")))
+                location = os.path.join(wd, ce.get("source"))
             if path is None:
                 raise MissingFileException(
-                    "Checksum: File not found: {}".format(
-                        os.path.join(wd, ce.get("source"))))
+                    "Checksum: File not found: {}".format(location))
             # validate checksum
             try:
                 validate_file_checksum(
@@ -728,8 +1125,7 @@ def parse_block_based_meta_file(inputs):
     def _parse_line(l):
         prts = l.split(":")  # colon followed by space (TOSCA)
         if len(prts) < 2:
-            LOG.warning("Malformed line in block: '{}' len: {}"
-                        .format(l, len(l)))
+            LOG.warning("Malformed line in block: '%s' len: %s", l, len(l))
             return None, None
         key = str(prts.pop(0)).strip()  # first part is keys
         value = (":".join(prts)).strip()  # rest is value
@@ -757,7 +1153,7 @@ def parse_block_based_meta_file(inputs):
                 curr_block[k] = v
     if len(blocks) < 1:
         # ensure that block_0 is always there
-        LOG.warning("No blocks found in: {}".format(inputs))
+        LOG.warning("No blocks found in: %s", inputs)
         blocks.append(dict())
     return blocks
 
@@ -773,9 +1169,41 @@ def save_name(s):
     return s.replace(" ", "-")
 
 
+def _rfc3339_now():
+    """
+    Current (local) time as RFC3339 string.
+    """
+    return _rfc3339(datetime.datetime.now())
+
+
+def _rfc3339(dt):
+    # imported here: pyrfc3339 is not needed to start the tool
+    import pyrfc3339
+    return pyrfc3339.generate(dt, accept_naive=True)
+
+
+def source_date_time():
+    """
+    Timestamp of reproducible packages (UTC): SOURCE_DATE_EPOCH
+    (https://reproducible-builds.org/specs/source-date-epoch/)
+    or 1980-01-01, the earliest timestamp ZIP files can store.
+    """
+    earliest = datetime.datetime(1980, 1, 1, tzinfo=datetime.timezone.utc)
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch is None:
+        return earliest
+    try:
+        dt = datetime.datetime.fromtimestamp(
+            int(epoch), tz=datetime.timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        LOG.warning("Invalid value of SOURCE_DATE_EPOCH: %s", epoch)
+        return earliest
+    return max(dt, earliest)
+
+
 def validate_file_checksum(path, algorithm, hash_str):
     """
-    Validate checksum of given file.
+    Validate checksum of given file (path or ZipMember).
     Raises ChecksumException
     """
     supported_algorithms = ["SHA-256", "SHA-1", "MD5"]
@@ -792,7 +1220,7 @@ def validate_file_checksum(path, algorithm, hash_str):
     if algorithm == "SHA-1":
         h_func = hashlib.sha1
     # check if file exists
-    if path is None or not os.path.isfile(path):
+    if path is None or (isinstance(path, str) and not os.path.isfile(path)):
         raise ChecksumException("Checksum: File not found: {}"
                                 .format(path))
     # try to compute the files checksum
@@ -800,7 +1228,7 @@ def validate_file_checksum(path, algorithm, hash_str):
         h_file = file_hash(path, h_func)
     except BaseException as e:
         msg = "Coudn't compute file hash {}".format(path)
-        LOG.exeception(msg)
+        LOG.exception(msg)
         del e
         raise ChecksumException(msg)
     # compare checksums
@@ -1,22 +1,28 @@
+import io
 import os
-import tempfile
 import shutil
 import yaml
-import pyrfc3339
 from tngsdk.package.validator import \
-    validate_project_with_external_validator, validate_yaml_online
+    validate_project_with_external_validator, validate_yaml_online, \
+    TangoValidationException
 from tngsdk.package.packager.packager import EtsiPackager, NapdRecord
 from tngsdk.package.packager.exeptions import MetadataValidationException,\
     NapdNotValidException,\
     ChecksumException,\
     MissingFileException
 from tngsdk.package.helper import search_for_file, extract_zip_file_to_temp,\
-    creat_zip_file_from_directory, write_block_based_meta_file
+    creat_zip_file_from_directory, write_block_based_meta_file, \
+    PackageArchive, MemoryFile
+from tngsdk.package.buildcache import BUILD_CACHE
+from tngsdk.package.storage import StorageBackendDuplicatedException
 from tngsdk.package.storage.tngprj import TangoProjectFilesystemBackend
 from tngsdk.package.logger import TangoLogger
 
 LOG = TangoLogger.getLogger(__name__)
 
+# NAPDs are plain data: use the (C) safe loader, if available
+NAPD_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 class TangoPackager(EtsiPackager):
 
@@ -28,6 +34,13 @@ class TangoPackager(EtsiPackager):
         # update NR with NAPD data
         return self._update_nr_with_napd(napd, napd_path, nr)
 
+    def collect_metadata_from_archive(self, archive, validate=False):
+        nr = super().collect_metadata_from_archive(archive)
+        LOG.debug("Collecting 5GTANGO (NAPD) meta data from archive ...")
+        napd, napd_path = self._read_napd_from_archive(
+            archive, nr.metadata.get("tosca"), validate=validate)
+        return self._update_nr_with_napd(napd, napd_path, nr)
+
     def _update_nr_with_napd(self, napd, napd_path, nr=None):
         """
         Updates NR with data from NAPD file input.
@@ -54,16 +67,16 @@ class TangoPackager(EtsiPackager):
                 path = search_for_file(
                     os.path.join(wd, tosca_meta[1].get("Name")))
                 if path is None:
-                    LOG.warning("TOSCA block_1 file '{}' not found.".format(
-                        tosca_meta[1].get("Name")))
+                    LOG.warning("TOSCA block_1 file '%s' not found.",
+                                tosca_meta[1].get("Name"))
                     # try 2:
                     path = search_for_file(
                         os.path.join(wd, "**/NAPD.yaml"), recursive=False)
             if path is None:
-                LOG.warning("Couldn't find NAPD file: {}".format(wd))
+                LOG.warning("Couldn't find NAPD file: %s", wd)
                 return dict(), None  # TODO return an empty NAPD skeleton here
             with open(path, "r") as f:
-                data = yaml.load(f)
+                data = yaml.load(f, Loader=NAPD_YAML_LOADER)
                 if self.args.offline:
                     LOG.warning("Skipping NAPD validation (--offline)")
                 else:
@@ -72,13 +85,68 @@ class TangoPackager(EtsiPackager):
                             "Validation of {} failed.".format(path))
                 return data, path
         except NapdNotValidException as e:
-            LOG.error("Validation error: {}".format(e))
+            LOG.error("Validation error: %s", e)
             raise e
         except BaseException as e:
-            LOG.error("Cannot read NAPD.yaml file: {}".format(e))
+            LOG.error("Cannot read NAPD.yaml file: %s", e)
             # raise e
         return dict(), None  # TODO return an empty NAPD skeleton here
 
+    def _read_napd_from_archive(self, archive, tosca_meta, validate=False):
+        """
+        Like _read_napd but for PackageArchive inputs.
+        The NAPD is only validated if validate is True.
+        Returns NAPD dict. and NAPD member name
+        """
+        try:
+            name = None
+            if (tosca_meta is not None
+                    and len(tosca_meta) > 1):
+                name = archive.find(tosca_meta[1].get("Name"))
+            if name is None:
+                name = archive.find("**/NAPD.yaml")
+            if name is None:
+                LOG.warning("Couldn't find NAPD file: %s", archive.path)
+                return dict(), None
+            data = yaml.load(archive.read(name), Loader=NAPD_YAML_LOADER)
+            if validate:
+                if self.args.offline:
+                    LOG.warning("Skipping NAPD validation (--offline)")
+                elif not validate_yaml_online(data):
+                    raise NapdNotValidException(
+                        "Validation of {} failed.".format(name))
+            return data, name
+        except NapdNotValidException as e:
+            LOG.error("Validation error: %s", e)
+            raise e
+        except BaseException as e:
+            LOG.error("Cannot read NAPD.yaml file: %s", e)
+        return dict(), None
+
+    def _check_duplicate(self, pkg_path):
+        """
+        Asks the storage backend if the package already exists,
+        before anything else is done with it. Vendor, name and
+        version are read directly from the package archive.
+        raises StorageBackendDuplicatedException
+        """
+        try:
+            with PackageArchive(pkg_path) as archive:
+                nr = self.collect_metadata_from_archive(archive)
+        except BaseException as e:
+            # the regular unpackaging steps report broken packages
+            LOG.warning("Could not read metadata from %s: %s", pkg_path, e)
+            return
+        if nr.vendor is None or nr.name is None or nr.version is None:
+            return
+        try:
+            self.storage_backend.check_duplicate(
+                nr.vendor, nr.name, nr.version)
+        except StorageBackendDuplicatedException as e:
+            raise e
+        except BaseException as e:
+            LOG.warning("Early duplicate check failed: %s", e)
+
     def _assert_usable_tango_package(self, napdr):
         """
         Assert that we have read enough information to have
@@ -99,6 +167,7 @@ class TangoPackager(EtsiPackager):
             assert(napdr.release_date_time is not None)
             assert(len(napdr.metadata) > 0)
             # check if date strings can be parsed
+            import pyrfc3339
             pyrfc3339.parse(napdr.release_date_time)
             # TODO extend as needed
             return True
@@ -116,7 +185,7 @@ class TangoPackager(EtsiPackager):
         """
         def makedirs(p):
             if not os.path.exists(p):
-                LOG.debug("Creating: {}".format(p))
+                LOG.debug("Creating: %s", p)
                 os.makedirs(p)
 
         wd = napdr._project_wd
@@ -138,7 +207,7 @@ class TangoPackager(EtsiPackager):
         for pc in napdr.package_content:
             s = os.path.join(pp, pc.get("_project_source"))
             d = os.path.join(wd, pc.get("source"))
-            LOG.debug("Copying {}\n\t to {}".format(s, d))
+            LOG.debug("Copying %s\n\t to %s", s, d)
             shutil.copyfile(s, d)
 
     def _pack_write_napd(self, napdr, name="TOSCA-Metadata/NAPD.yaml"):
@@ -152,7 +221,7 @@ class TangoPackager(EtsiPackager):
             if not validate_yaml_online(data):
                 raise NapdNotValidException(
                     "NAPD validation failed. See logs for details.")
-        LOG.debug("Writing NAPD to: {}".format(path))
+        LOG.debug("Writing NAPD to: %s", path)
         with open(path, "w") as f:
             yaml.dump(data, f, default_flow_style=False)
         return name
@@ -186,7 +255,7 @@ class TangoPackager(EtsiPackager):
             data.append(bN)
         # write file
         path = os.path.join(wd, name)
-        LOG.debug("Writing ETSI manifest to: {}".format(path))
+        LOG.debug("Writing ETSI manifest to: %s", path)
         write_block_based_meta_file(data, path)
         return name
 
@@ -208,7 +277,7 @@ class TangoPackager(EtsiPackager):
         data.append(b1)
         # write file
         path = os.path.join(wd, name)
-        LOG.debug("Writing TOSCA.meta to: {}".format(path))
+        LOG.debug("Writing TOSCA.meta to: %s", path)
         write_block_based_meta_file(data, path)
         return path
 
@@ -217,42 +286,133 @@ class TangoPackager(EtsiPackager):
         Unpack a 5GTANGO package.
         """
         # TODO re-factor: single try block with multiple excepts.
+        # reject duplicates before the package is extracted/validated
+        if wd is None and self.storage_backend is not None:
+            self.report_progress("check_duplicate")
+            try:
+                self._check_duplicate(self._package_file_input())
+            except StorageBackendDuplicatedException as e:
+                LOG.error(str(e))
+                self.error_msg = str(e)
+                return NapdRecord(error=str(e))
+        # unchanged package: reuse the result of an earlier process
+        self._unpack_cache_key = None
+        if wd is None and self.unpack_cache is not None \
+                and self.unpack_cache.enabled:
+            self.report_progress("unpack_cache")
+            self._unpack_cache_key = self.unpack_cache_key()
+            napdr = self.unpack_cache.get(self._unpack_cache_key)
+            if napdr is not None:
+                return self._unpackage_cached(napdr)
         # extract package contents
+        self.report_progress("extract")
+        if wd is None and self.package_data is not None:
+            # small package kept in memory: read it without extracting it
+            with PackageArchive(self._package_file_input()) as archive:
+                return self._unpackage_contents(
+                    archive, MemoryFile(os.path.basename(
+                        self.args.unpackage), self.package_data))
         if wd is None:
-            wd = extract_zip_file_to_temp(self.args.unpackage)
+            wd = extract_zip_file_to_temp(
+                self.args.unpackage, self.mkdtemp())
         # fuzzy find right wd path
         wd = fuzzy_find_wd(wd)
+        return self._unpackage_contents(wd, self.args.unpackage)
+
+    def _package_file_input(self):
+        """
+        The package file to unpack: path or in-memory file object.
+        """
+        if self.package_data is not None:
+            return io.BytesIO(self.package_data)
+        return self.args.unpackage
+
+    def _extract_package(self, archive):
+        """
+        Extracts a package that is read as archive to the workspace,
+        e.g., for storage backends that need its files on disk.
+        Returns the package root and the path of the package file.
+        """
+        if self.package_data is None:
+            return archive.extractall(self.mkdtemp()), self.args.unpackage
+        pkg_file = os.path.join(
+            self.mkdtemp(), os.path.basename(self.args.unpackage))
+        with open(pkg_file, "wb") as f:
+            f.write(self.package_data)
+        return archive.extractall(self.mkdtemp()), pkg_file
+
+    def _unpackage_cached(self, napdr):
+        """
+        Finishes the process with the cached result of an earlier
+        process: errors are returned, valid packages are stored.
+        """
+        napdr.metadata["_unpack_cache"] = "hit"
+        if napdr.error is not None:
+            LOG.error(napdr.error)
+            self.error_msg = napdr.error
+            return napdr
+        if self.storage_backend is None:
+            return napdr
+        pkg_file = self.args.unpackage
+        if self.package_data is not None:
+            pkg_file = MemoryFile(
+                os.path.basename(self.args.unpackage), self.package_data)
+        with PackageArchive(self._package_file_input()) as archive:
+            return self._store_package(napdr, archive, pkg_file)
+
+    def _cache_unpack_result(self, napdr):
+        """
+        Adds the result of the validation steps to the unpack
+        result cache (if used). Returns napdr.
+        """
+        if getattr(self, "_unpack_cache_key", None) is not None:
+            self.unpack_cache.put(self._unpack_cache_key, napdr)
+        return napdr
+
+    def _unpackage_contents(self, wd, pkg_file):
+        """
+        Unpacks the contents of the package.
+        wd: root of the extracted package or PackageArchive
+        pkg_file: the package file (path or MemoryFile)
+        """
         # collect metadata
+        self.report_progress("collect_metadata")
         napdr = None
         try:
-            napdr = self.collect_metadata(wd)
+            if isinstance(wd, PackageArchive):
+                napdr = self.collect_metadata_from_archive(wd, validate=True)
+            else:
+                napdr = self.collect_metadata(wd)
         except BaseException as e:
             LOG.error(str(e))
             self.error_msg = str(e)
             return NapdRecord(error=str(e))
         # LOG.debug("Collected metadata: {}".format(napdr))
         # validate metadata
+        self.report_progress("validate_metadata")
         try:
             self._assert_usable_tango_package(napdr)
         except MetadataValidationException as e:
             LOG.error(str(e))
             self.error_msg = str(e)
             napdr.error = str(e)
-            return napdr
+            return self._cache_unpack_result(napdr)
         # validate checksums
+        self.report_progress("validate_checksums")
         try:
             self._validate_package_content_checksums(wd, napdr)
         except ChecksumException as e:
             LOG.error(str(e))
             self.error_msg = str(e)
             napdr.error = str(e)
-            return napdr
+            return self._cache_unpack_result(napdr)
         except MissingFileException as e:
             LOG.error(str(e))
             self.error_msg = str(e)
             napdr.error = str(e)
-            return napdr
+            return self._cache_unpack_result(napdr)
         # validate network service using tng-validate
+        self.report_progress("validate")
         try:
             # we do a trick here, since tng-validate needs a
             # 5GTANGO project strcuture to work on, and we not
@@ -265,33 +425,47 @@ class TangoPackager(EtsiPackager):
                 LOG.warning(
                     "Skipping validation (--skip-validation).")
             else:  # ok, do the validation
-                tmp_project_path = tempfile.mkdtemp()
+                tmp_project_path = self.mkdtemp()
                 tmp_tpfbe = TangoProjectFilesystemBackend(self.args)
                 tmp_napdr = tmp_tpfbe.store(
-                    napdr, wd, self.args.unpackage, output=tmp_project_path)
+                    napdr, wd, pkg_file, output=tmp_project_path)
                 tmp_project_path = tmp_napdr.metadata["_storage_location"]
                 validate_project_with_external_validator(
                     self.args, tmp_project_path)
                 shutil.rmtree(tmp_project_path)
+        except TangoValidationException as e:
+            LOG.exception(str(e))
+            self.error_msg = str(e)
+            napdr.error = str(e)
+            return self._cache_unpack_result(napdr)
         except BaseException as e:
             LOG.exception(str(e))
             self.error_msg = str(e)
             napdr.error = str(e)
             return napdr
+        self._cache_unpack_result(napdr)
         # call storage backend
+        return self._store_package(napdr, wd, pkg_file)
+
+    def _store_package(self, napdr, wd, pkg_file):
+        """
+        Stores the (validated) package using the storage backend.
+        """
         if self.storage_backend is not None:
+            self.report_progress("store")
             try:
+                if (isinstance(wd, PackageArchive)
+                        and not self.storage_backend.supports_archive):
+                    wd, pkg_file = self._extract_package(wd)
                 # store/upload contents of package and get updated napdr
-                napdr = self.storage_backend.store(
-                    napdr, wd, self.args.unpackage)
+                napdr = self.storage_backend.store(napdr, wd, pkg_file)
             except BaseException as e:
                 LOG.error(str(e))
-                LOG.debug("Args: {}".format(self.args))
+                LOG.debug("Args: %s", self.args)
                 self.error_msg = str(e)
                 napdr.error = str(e)
                 return napdr
 
-        # TODO clean up temporary files and folders
         return napdr
 
     @EtsiPackager._do_package_closure
@@ -299,29 +473,48 @@ class TangoPackager(EtsiPackager):
         """
         Pack a 5GTANGO project to a 5GTANGO package.
         """
+        auto_file_name = "{}.{}.{}.tgo".format(napdr.vendor,
+                                               napdr.name,
+                                               napdr.version)
+        path_dest = self.args.output
+        if path_dest is None:
+            path_dest = auto_file_name
+        if os.path.isdir(path_dest):
+            path_dest = os.path.join(path_dest, auto_file_name)
+        # reproducible: unchanged projects are taken from the build cache
+        cache_key = None
+        if self.reproducible and not BUILD_CACHE.disabled:
+            self.report_progress("build_cache")
+            cache_key = self.build_cache_key(
+                napdr, kwargs.get("project_descriptor"))
+            if BUILD_CACHE.get(cache_key, path_dest):
+                LOG.info("Package created (build cache): '%s'", path_dest)
+                napdr.metadata["_storage_location"] = path_dest
+                napdr.metadata["_build_cache"] = "hit"
+                return napdr
         # 4. generate package's directory tree
+        self.report_progress("create_directory_tree")
         self._pack_create_package_directory_tree(napdr)
         # 5. copy project files to package tree
+        self.report_progress("copy_files")
         self._pack_copy_files_to_package_directory_tree(
             project_path, napdr)
         # 6. generate/write NAPD
+        self.report_progress("write_napd")
         napd_path = self._pack_write_napd(napdr)
         # 7. generate/write ETSI MF
+        self.report_progress("write_manifests")
         etsi_mf_path = self._pack_gen_write_etsi_manifest(napdr)
         # 8. generate/write TOSCA
         self._pack_gen_write_tosca_manifest(napdr, napd_path, etsi_mf_path)
         # 9. zip package
-        auto_file_name = "{}.{}.{}.tgo".format(napdr.vendor,
-                                               napdr.name,
-                                               napdr.version)
-        path_dest = self.args.output
-        if path_dest is None:
-            path_dest = auto_file_name
-        if os.path.isdir(path_dest):
-            path_dest = os.path.join(path_dest, auto_file_name)
-        creat_zip_file_from_directory(napdr._project_wd, path_dest)
-        LOG.info("Package created: '{}'"
-                 .format(path_dest))
+        self.report_progress("zip")
+        creat_zip_file_from_directory(
+            napdr._project_wd, path_dest, date_time=self.zip_date_time())
+        LOG.info("Package created: '%s'", path_dest)
+        if cache_key is not None:
+            BUILD_CACHE.put(cache_key, path_dest)
+            napdr.metadata["_build_cache"] = "miss"
         # annotate napdr
         napdr.metadata["_storage_location"] = path_dest
         return napdr
@@ -345,5 +538,5 @@ def fuzzy_find_wd(wd):
         return wd
     wd_root = found_path.replace("TOSCA-Metadata", "").strip()
     if wd_root != wd:
-        LOG.warning("Fuzzy found WD root: {}".format(wd_root))
+        LOG.warning("Fuzzy found WD root: %s", wd_root)
     return wd_root
@@ -0,0 +1,213 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+"""
+Opt-in CPU profiling of single (un)packaging processes.
+Profiles are stored as pstats and collapsed stacks (flame graph
+input) named after the UUID of the process:
+- PROFILE_SAMPLE_RATE: fraction of processes profiled without
+  being requested (default: 0)
+- PROFILE_MODE: 'sampling' (default) or 'deterministic' (cProfile)
+- PROFILE_INTERVAL: sampling interval in seconds (default: 0.005)
+- PROFILE_DIR: where profiles are stored
+"""
+import cProfile
+import collections
+import marshal
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from tngsdk.package.logger import TangoLogger
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+FORMATS = {"pstats": ".pstats", "collapsed": ".collapsed"}
+
+
+def get_profile_dir():
+    return os.environ.get("PROFILE_DIR", os.path.join(
+        tempfile.gettempdir(), "tng-sdk-package-profiles"))
+
+
+def sampled():
+    """
+    True if a process should be profiled because of
+    PROFILE_SAMPLE_RATE.
+    """
+    rate = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+    return rate > 0 and random.random() < rate
+
+
+def profile_path(uuid, fmt="collapsed"):
+    """
+    Path of the stored profile of the given process or None.
+    """
+    if fmt not in FORMATS:
+        return None
+    p = os.path.join(get_profile_dir(), "{}{}".format(uuid, FORMATS[fmt]))
+    return p if os.path.isfile(p) else None
+
+
+def _frame_key(frame):
+    c = frame.f_code
+    return (c.co_filename, c.co_firstlineno, c.co_name)
+
+
+class StackSampler(object):
+    """
+    Samples the stack of a single thread in a background thread.
+    """
+
+    def __init__(self, thread_ident, interval=0.005):
+        self.thread_ident = thread_ident
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_ident)
+        stack = list()
+        while frame is not None:
+            stack.append(_frame_key(frame))
+            frame = frame.f_back
+        if len(stack) > 0:
+            self.samples[tuple(reversed(stack))] += 1
+
+    def collapsed(self):
+        """
+        Samples in collapsed stack format:
+        'root (file:line);...;leaf (file:line) <count>'
+        """
+        lines = list()
+        for stack, count in sorted(self.samples.items()):
+            lines.append("{} {}".format(";".join(
+                ["{} ({}:{})".format(fn, f, l) for f, l, fn in stack]),
+                count))
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def pstats(self):
+        """
+        Samples as pstats dict (sample counts as call counts,
+        sample time as duration).
+        """
+        stats = dict()
+
+        def _entry(k):
+            if k not in stats:
+                stats[k] = [0, 0, 0.0, 0.0, dict()]
+            return stats[k]
+
+        for stack, count in self.samples.items():
+            t = count * self.interval
+            for k in set(stack):
+                e = _entry(k)
+                e[0] += count
+                e[1] += count
+                e[3] += t
+            _entry(stack[-1])[2] += t
+            for caller, callee in set(zip(stack[:-1], stack[1:])):
+                callers = _entry(callee)[4]
+                nc, cc, tt, ct = callers.get(caller, (0, 0, 0.0, 0.0))
+                callers[caller] = (
+                    nc + count, cc + count,
+                    tt + (t if callee == stack[-1] else 0.0), ct + t)
+        return {k: tuple(v) for k, v in stats.items()}
+
+
+class JobProfiler(object):
+    """
+    Profiles the calling thread while the block is executed
+    and stores the profile under the given UUID.
+    """
+
+    def __init__(self, uuid, mode=None, interval=None, directory=None):
+        self.uuid = str(uuid)
+        self.mode = mode or os.environ.get("PROFILE_MODE", "sampling")
+        self.interval = interval or float(
+            os.environ.get("PROFILE_INTERVAL", 0.005))
+        self.directory = directory or get_profile_dir()
+        self.paths = dict()
+        self._sampler = None
+        self._profile = None
+
+    def __enter__(self):
+        self._t_start = time.time()
+        self._sampler = StackSampler(
+            threading.get_ident(), self.interval).start()
+        if self.mode == "deterministic":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __exit__(self, *args):
+        if self._profile is not None:
+            self._profile.disable()
+        self._sampler.stop()
+        try:
+            self._write()
+        except BaseException as e:
+            LOG.warning("Could not store profile of %s: %s", self.uuid, e)
+
+    def _write(self):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, self.uuid)
+        self.paths["pstats"] = base + FORMATS["pstats"]
+        if self._profile is not None:
+            self._profile.dump_stats(self.paths["pstats"])
+        else:
+            with open(self.paths["pstats"], "wb") as f:
+                marshal.dump(self._sampler.pstats(), f)
+        self.paths["collapsed"] = base + FORMATS["collapsed"]
+        with open(self.paths["collapsed"], "w") as f:
+            f.write(self._sampler.collapsed())
+        LOG.info("Stored %s profile of %s (%.4fs): %s", self.mode, self.uuid,
+                 time.time() - self._t_start, sorted(self.paths.values()))
@@ -32,24 +32,39 @@
 import os
 import time
 import json
-import tempfile
 import subprocess
 from flask import Flask, Blueprint, send_from_directory, url_for
+from flask import Response, request, stream_with_context
 from flask_restplus import Resource, Api, Namespace
 from flask_restplus import fields, inputs
 from werkzeug.contrib.fixers import ProxyFix
 from werkzeug.datastructures import FileStorage
-import requests
-from requests.exceptions import RequestException
+from tngsdk.package.callback import CD
+from tngsdk.package.httpclient import HTTP
+from tngsdk.package.metrics import METRICS
+from tngsdk.package import profiling
 from tngsdk.package.packager import PM
-from tngsdk.package.helper import extract_zip_file_to_temp
+from tngsdk.package.packager.packager import PkgStatus, NapdRecord
+from tngsdk.package.packager.exeptions import \
+    UnsupportedPackageFormatException
+from tngsdk.package.helper import extract_zip_file_to_temp, SeekableStream
 from tngsdk.package.storage.tngcat import TangoCatalogBackend
 from tngsdk.package.storage.tngprj import TangoProjectFilesystemBackend
 from tngsdk.package.storage.osmnbi import OsmNbiBackend
 from tngsdk.package.logger import TangoLogger
+from tngsdk.package.scratch import SCRATCH, ScratchQuotaExceededException
+from tngsdk.package.unpackcache import UNPACK_CACHE
 
 
 PACKAGES_SUBDIR = "packages"
+# upper bound for long-poll requests to the status endpoint (seconds)
+STATUS_MAX_WAIT = float(os.environ.get("STATUS_MAX_WAIT", 60))
+# interval of SSE keep-alive comments (seconds)
+STATUS_EVENTS_KEEPALIVE = float(
+    os.environ.get("STATUS_EVENTS_KEEPALIVE", 15))
+# uploaded packages up to this size are unpacked in memory (bytes)
+UNPACK_IN_MEMORY_MAX_BYTES = int(
+    os.environ.get("UNPACK_IN_MEMORY_MAX_BYTES", 1024 * 1024))
 
 
 LOG = TangoLogger.getLogger(__name__)
@@ -118,6 +133,14 @@ packages_parser.add_argument("format",
                              default=None,
                              store_missing=True,
                              help="Package format (optional)")
+packages_parser.add_argument("profile",
+                             location="form",
+                             type=inputs.boolean,
+                             required=False,
+                             default=None,
+                             store_missing=True,
+                             help="""Store a CPU profile of the
+                                    process (optional)""")
 packages_parser.add_argument("skip_store",
                              location="form",
                              type=inputs.boolean,
@@ -181,9 +204,81 @@ packages_status_item_get_return_model = api_v1.model(
         required=True),
      "error_msg": fields.String(
         description="More detailed error message.",
-         required=False), }
+         required=False),
+     "stage": fields.String(
+        description="Current stage of the process.",
+        required=False),
+     "resources": fields.Raw(
+        description="Resource consumption of the finished process"
+        + " (CPU time, traced memory, I/O incl. storage uploads,"
+        + " scratch-disk usage).",
+        required=False), }
+)
+
+packages_inspect_parser = api_v1.parser()
+packages_inspect_parser.add_argument("package",
+                                     location="files",
+                                     type=FileStorage,
+                                     required=True,
+                                     help="Uploaded package file")
+packages_inspect_parser.add_argument("format",
+                                     dest="pkg_format",
+                                     location="form",
+                                     required=False,
+                                     default="eu.5gtango",
+                                     help="Package format (optional)")
+
+package_content_model = api_v1.model(
+    "PackageContent",
+    {"source": fields.String(
+        description="Path of the artifact in the package.",
+        required=True),
+     "content-type": fields.String(
+        attribute="content-type",
+        description="Content type of the artifact."),
+     "algorithm": fields.String(
+        description="Checksum algorithm."),
+     "hash": fields.String(
+        description="Checksum of the artifact."),
+     "size": fields.Integer(
+        description="Size of the artifact (bytes, null if missing)."),
+     "compressed_size": fields.Integer(
+        description="Compressed size of the artifact (bytes)."), }
+)
+
+packages_inspect_return_model = api_v1.model(
+    "PackagesInspectReturn",
+    {"vendor": fields.String(),
+     "name": fields.String(),
+     "version": fields.String(),
+     "package_type": fields.String(),
+     "maintainer": fields.String(),
+     "release_date_time": fields.String(),
+     "package_content": fields.List(
+        fields.Nested(package_content_model)),
+     "error_msg": fields.String(
+        attribute="error",
+        description="Error message if the package could not be read.",
+        required=False), }
 )
 
+packages_status_item_parser = api_v1.parser()
+packages_status_item_parser.add_argument(
+    "wait",
+    location="args",
+    type=float,
+    required=False,
+    default=None,
+    store_missing=True,
+    help="Long-poll: Block up to <wait> seconds until the status changes.")
+packages_status_item_parser.add_argument(
+    "status",
+    location="args",
+    required=False,
+    default=None,
+    store_missing=True,
+    help="Long-poll: Status known by the client (default: current status).")
+
 packages_status_list_get_return_model = api_v1.model(
     "PackagesStatusListGetReturn",
     {"package_processes": fields.List(
@@ -279,47 +374,74 @@ projects_parser.add_argument("no_subfolder_compression",
                              type=inputs.boolean,
                              dest="no_subfolder_compression",
                              location="form")
+projects_parser.add_argument("reproducible",
+                             location="form",
+                             type=inputs.boolean,
+                             required=False,
+                             default=None,
+                             store_missing=True,
+                             help="""Create a reproducible package
+                                    (optional)""")
+projects_parser.add_argument("profile",
+                             location="form",
+                             type=inputs.boolean,
+                             required=False,
+                             default=None,
+                             store_missing=True,
+                             help="""Store a CPU profile of the
+                                    process (optional)""")
+
+profiles_parser = api_v1.parser()
+profiles_parser.add_argument("format",
+                             location="args",
+                             required=False,
+                             default="collapsed",
+                             choices=sorted(profiling.FORMATS.keys()),
+                             help="Profile format (default: collapsed)")
 
 
 ping_get_return_model = api_v1.model("PingGetReturn", {
     "alive_since": fields.String(
         description="system uptime",
         required=True),
+    "connection_pools": fields.Raw(
+        description=("HTTP connection (re-)use, circuit breaker state "
+                     "and latencies per remote endpoint"),
+        required=False),
 })
 
 
 def _do_callback_request(url, body):
-    try:
-        base_body = {
-            "event_name": "onPackageChangeEvent",
-            "package_id": None,
-            "package_location": None,
-            "package_metadata": None,
-            "package_process_status": None,
-            "package_process_uuid": None
-        }
-        # apply parameters
-        base_body.update(body)
-        r = requests.post(url, json=base_body)
-    except RequestException as e:
-        LOG.error("Callback error: {}".format(e))
-        return -1
-    return r.status_code
+    """
+    Hands the callback over to the callback dispatcher.
+    Does not block. Returns a CallbackRequest.
+    """
+    base_body = {
+        "event_name": "onPackageChangeEvent",
+        "package_id": None,
+        "package_location": None,
+        "package_metadata": None,
+        "package_process_status": None,
+        "package_process_uuid": None
+    }
+    # apply parameters
+    base_body.update(body)
+    return CD.submit(url, base_body)
 
 
 def on_unpackaging_done(packager):
     """
     Callback function for packaging procedure.
     """
-    LOG.info("{}: Unpackaging using {} error: {}".format(
-        packager.status.upper(), packager, packager.result.error))
+    LOG.info("%s: Unpackaging using %s error: %s", packager.status.upper(),
+             packager, packager.result.error)
     if packager.args is None or "callback_url" not in packager.args:
         return
     c_url = packager.args.get("callback_url")
     if c_url is None:
         LOG.warning("'callback_url' is None. Skipping callback.")
         return
-    LOG.info("Callback: POST to '{}'".format(c_url))
+    LOG.info("Callback: POST to '%s'", c_url)
     # build callback payload
     pl = {"package_id": packager.result.metadata.get("_storage_uuid"),
           "package_location": packager.result.metadata.get(
@@ -327,17 +449,15 @@ def on_unpackaging_done(packager):
           "package_metadata": packager.result.to_dict(),
           "package_process_status": str(packager.status),
           "package_process_uuid": str(packager.uuid)}
-    # perform callback request
-    r_code = _do_callback_request(c_url, pl)
-    LOG.info("DONE: Callback response status {}".format(r_code))
-    return r_code
+    # enqueue callback request (delivered in background)
+    return _do_callback_request(c_url, pl)
 
 
 def on_packaging_done(packager):
     """
     Callback function for packaging procedure.
     """
-    LOG.info("DONE: Packaging using {}".format(packager))
+    LOG.info("DONE: Packaging using %s", packager)
     if packager.args is None or "callback_url" not in packager.args:
         return
     c_url = packager.args.get("callback_url")
@@ -345,12 +465,10 @@ def on_packaging_done(packager):
     if c_url is None:
         LOG.warning("'callback_url' is None. Skipping callback.")
         return
-    LOG.info("Callback: POST to '{}'".format(c_url))
-    # perform callback request
+    LOG.info("Callback: POST to '%s'", c_url)
+    # enqueue callback request (delivered in background)
     pl = packaging_done_answer(packager)
-    r_code = _do_callback_request(c_url, pl)
-    LOG.info("DONE: Status {}".format(r_code))
-    return r_code
+    return _do_callback_request(c_url, pl)
 
 
 def packaging_done_answer(packager):
@@ -374,13 +492,47 @@ def packaging_done_answer(packager):
     return pl
 
 
-def _write_to_temp_file(package_data):
+def _profile_requested(args):
+    """
+    Profiling is requested by the 'profile' form field,
+    the X-Tng-Profile header or PROFILE_SAMPLE_RATE.
+    """
+    if args.get("profile"):
+        return True
+    header = request.headers.get("X-Tng-Profile")
+    if header is not None and header.lower() in ["1", "true", "yes"]:
+        return True
+    return profiling.sampled()
+
+
+def _new_workspace():
+    """
+    Scratch workspace for the uploaded file of a request.
+    Handed over to (and removed by) the packager.
+    """
+    expected = None
+    if request.content_length is not None:
+        # upload + extracted/validated contents
+        expected = 3 * request.content_length
+    return SCRATCH.workspace(expected_bytes=expected)
+
+
+def _keep_in_memory():
+    """
+    Small uploads are not written to disk.
+    """
+    return (request.content_length is not None
+            and request.content_length <= UNPACK_IN_MEMORY_MAX_BYTES)
+
+
+def _write_to_temp_file(package_data, workspace):
     # create a temp directory
-    path_dest = tempfile.mkdtemp()
+    path_dest = workspace.mkdtemp()
     path = os.path.join(path_dest, os.path.basename(package_data.filename))
     package_data.save(path)
-    LOG.debug("Written uploaded package file to {}".format(path))
-    LOG.debug("-- File size {} byte".format(os.path.getsize(path)))
+    LOG.debug("Written uploaded package file to %s", path)
+    LOG.debug("-- File size %s byte", os.path.getsize(path))
+    workspace.check_quota()
     return path
 
 
@@ -393,15 +545,34 @@ class Packages(Resource):
     @api_v1.marshal_with(packages_status_item_get_return_model)
     @api_v1.response(200, "Successfully started unpackaging.")
     @api_v1.response(400, "Bad package: Could not unpackage given package.")
+    @api_v1.response(507, "Not enough scratch space.")
     def post(self, **kwargs):
         t_start = time.time()
         args = packages_parser.parse_args()
-        LOG.info("POST to /packages w. args: {}".format(args),
+        LOG.info("POST to /packages w. args: %s", args,
                  extra={"start_stop": "START"})
         if args.package.filename is None:
             LOG.warning("Posted package filename was None.")
             args.package.filename = "temp_pkg.tgo"
-        temppkg_path = _write_to_temp_file(args.package)
+        ws = None
+        package_data = None
+        try:
+            if _keep_in_memory():
+                package_data = args.package.read()
+                temppkg_path = os.path.basename(args.package.filename)
+                LOG.debug("Keeping uploaded package in memory (%d byte)",
+                          len(package_data))
+            else:
+                ws = _new_workspace()
+                temppkg_path = _write_to_temp_file(args.package, ws)
+        except ScratchQuotaExceededException as e:
+            if ws is not None:
+                ws.release()
+            LOG.error("POST to /packages failed: %s", e,
+                      extra={"start_stop": "STOP", "status": 507})
+            return {"package_process_uuid": None,
+                    "status": PkgStatus.FAILED,
+                    "error_msg": str(e)}, 507
         args.package = None
         args.unpackage = temppkg_path
         # pass CLI args to REST args
@@ -424,14 +595,16 @@ class Packages(Resource):
             elif sb_env == "OsmNbiBackend":
                 sb = OsmNbiBackend(args)
             else:
-                LOG.warning("Unknown storage backend: {}."
-                            .format(sb_env))
+                LOG.warning("Unknown storage backend: %s.", sb_env)
         # instantiate packager
-        p = PM.new_packager(args, storage_backend=sb)
+        p = PM.new_packager(args, storage_backend=sb, workspace=ws)
+        p.package_data = package_data
+        p.unpack_cache = UNPACK_CACHE
+        p.profile = _profile_requested(args)
         try:
             p.unpackage(callback_func=on_unpackaging_done)
         except BaseException as e:
-            LOG.exception("Unpackaging error: {}".format(e))
+            LOG.exception("Unpackaging error: %s", e)
         LOG.info("POST to /packages done",
                  extra={"start_stop": "STOP", "status": p.status,
                         "time_elapsed": str(time.time()-t_start)})
@@ -440,27 +613,136 @@ class Packages(Resource):
                 "error_msg": p.error_msg}
 
 
+@api_v1.route("/packages/inspect")
+class PackagesInspect(Resource):
+    """
+    Endpoint to inspect packages.
+    """
+    @api_v1.expect(packages_inspect_parser)
+    @api_v1.marshal_with(packages_inspect_return_model)
+    @api_v1.response(200, "OK")
+    @api_v1.response(400, "Bad package: Could not read given package.")
+    def post(self):
+        """
+        Metadata and contents of the uploaded package. The package
+        is not extracted, validated or stored (synchronous).
+        """
+        args = packages_inspect_parser.parse_args()
+        LOG.info("POST to /packages/inspect w. args: %s", args,
+                 extra={"start_stop": "START"})
+        args.package, package = None, args.package
+        args.unpackage = None
+        # pass CLI args to REST args
+        if app.cliargs is not None:
+            cliargs = vars(app.cliargs)
+            for cliarg in cliargs:
+                if cliarg not in args or args[cliarg] is None:
+                    args[cliarg] = cliargs[cliarg]
+        try:
+            p = PM.packager_class(args.pkg_format)(args)
+            # read from the uploaded stream (spooled to disk if large)
+            r = p.inspect(SeekableStream(package.stream))
+        except UnsupportedPackageFormatException as e:
+            r = NapdRecord(error=str(e))
+        status = 200 if r.error is None else 400
+        LOG.info("POST to /packages/inspect done",
+                 extra={"start_stop": "STOP", "status": status})
+        return r, status
+
+
 @api_v1.route("/packages/status/<string:package_process_uuid>")
 class PackagesStatusItem(Resource):
 
+    @api_v1.expect(packages_status_item_parser)
     @api_v1.marshal_with(packages_status_item_get_return_model)
     @api_v1.response(200, "OK")
     @api_v1.response(404, "Package process not found.")
     def get(self, package_process_uuid):
-        LOG.info("GET to /packages/status/ w. args: {}".format(
-                    package_process_uuid),
-                 extra={"start_stop": "START"})
+        args = packages_status_item_parser.parse_args()
+        LOG.info("GET to /packages/status/ w. args: %s %s",
+                 package_process_uuid, args, extra={"start_stop": "START"})
         p = PM.get_packager(package_process_uuid)
         if p is None:
             LOG.warning("GET to /packages/status/ done",
                         extra={"start_stop": "STOP", "status": 404})
             return {"error_msg": "Package process not found: {}".format(
                 package_process_uuid)}, 404
+        if args.wait is not None and args.wait > 0:
+            # long-poll: block until status differs from the known one
+            known_status = args.status
+            if known_status is None:
+                known_status = p.status
+            if not PkgStatus.is_final(known_status):
+                p.wait_for_status_change(
+                    known_status, timeout=min(args.wait, STATUS_MAX_WAIT))
         LOG.info("GET to /packages/status/ done",
                  extra={"start_stop": "STOP", "status": p.status})
         return {"package_process_uuid": str(p.uuid),
                 "status": p.status,
-                "error_msg": p.error_msg}
+                "error_msg": p.error_msg,
+                "stage": p.stage,
+                "resources": p.resources}
+
+
+def _format_sse(event):
+    """
+    Turns a packager event dict into a server-sent event.
+    """
+    return "id: {}\nevent: {}\ndata: {}\n\n".format(
+        event.get("id"), event.get("event"), json.dumps(event))
+
+
+@api_v1.route("/packages/status/<string:package_process_uuid>/events")
+class PackagesStatusEvents(Resource):
+
+    @api_v1.response(200, "OK (text/event-stream)")
+    @api_v1.response(404, "Package process not found.")
+    def get(self, package_process_uuid):
+        """
+        Server-sent events stream with status and progress
+        events of the given process. Closed when the process is done.
+        """
+        LOG.info("GET to /packages/status/events w. args: %s",
+                 package_process_uuid, extra={"start_stop": "START"})
+        p = PM.get_packager(package_process_uuid)
+        if p is None:
+            LOG.warning("GET to /packages/status/events done",
+                        extra={"start_stop": "STOP", "status": 404})
+            return {"error_msg": "Package process not found: {}".format(
+                package_process_uuid)}, 404
+        # allow clients to resume a stream
+        try:
+            last_event_id = max(
+                0, int(request.headers.get("Last-Event-ID", 0)))
+        except ValueError:
+            last_event_id = 0
+
+        def generate(last_event_id):
+            while True:
+                # the final status event is the last one: a process
+                # that is done gets no newer events (e.g., resumed
+                # after the final event)
+                final = PkgStatus.is_final(p.status)
+                events = p.wait_for_events(
+                    last_event_id,
+                    timeout=0 if final else STATUS_EVENTS_KEEPALIVE)
+                if len(events) < 1:
+                    if final:
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                for e in events:
+                    yield _format_sse(e)
+                    last_event_id = e.get("id")
+                if PkgStatus.is_final(events[-1].get("status")):
+                    break
+            LOG.info("GET to /packages/status/events done",
+                     extra={"start_stop": "STOP", "status": p.status})
+
+        return Response(stream_with_context(generate(last_event_id)),
+                        mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache",
+                                 "X-Accel-Buffering": "no"})
 
 
 @api_v1.route("/packages/status")
@@ -503,12 +785,26 @@ class Projects(Resource):
     @api_v1.expect(projects_parser)
     @api_v1.response(200, "Successfully started packaging.")
     @api_v1.response(400, "Bad project: Could not package given project.")
+    @api_v1.response(507, "Not enough scratch space.")
     def post(self):
         args = projects_parser.parse_args()
-        LOG.info("POST to /projects w. args: {}".format(args),
+        LOG.info("POST to /projects w. args: %s", args,
                  extra={"start_stop": "START"})
-        tempproject_path = _write_to_temp_file(args.project)
-        tempproject_path = extract_zip_file_to_temp(tempproject_path)
+        ws = None
+        try:
+            ws = _new_workspace()
+            tempproject_path = _write_to_temp_file(args.project, ws)
+            tempproject_path = extract_zip_file_to_temp(
+                tempproject_path, ws.mkdtemp())
+            ws.check_quota()
+        except ScratchQuotaExceededException as e:
+            if ws is not None:
+                ws.release()
+            LOG.error("POST to /projects failed: %s", e,
+                      extra={"start_stop": "STOP", "status": 507})
+            return {"package_process_uuid": None,
+                    "status": PkgStatus.FAILED,
+                    "error_msg": str(e)}, 507
         args.package = (
             os.path.join(tempproject_path,
                          os.path.splitext(args.project.filename)[0]))
@@ -528,7 +824,9 @@ class Projects(Resource):
             args.output = PACKAGES_SUBDIR
         else:
             args.output = os.path.join(PACKAGES_SUBDIR, args.output)
-        p = PM.new_packager(args, pkg_format=args.pkg_format)
+        p = PM.new_packager(args, pkg_format=args.pkg_format,
+                            workspace=ws)
+        p.profile = _profile_requested(args)
         p.package(callback_func=on_packaging_done)
         LOG.info("POST to /projects done.",
                  extra={"start_stop": "START", "status": 501})
@@ -549,6 +847,28 @@ class Project_download(Resource):
             filename, as_attachment=True)
 
 
+@api_v1.route("/profiles/<string:package_process_uuid>")
+class Profile(Resource):
+    """
+    Endpoint to download CPU profiles of (un)packaging processes.
+    """
+    @api_v1.expect(profiles_parser)
+    @api_v1.response(200, "OK")
+    @api_v1.response(404, "Profile not found.")
+    def get(self, package_process_uuid):
+        args = profiles_parser.parse_args()
+        p = PM.get_packager(package_process_uuid)
+        path = None
+        if p is not None:
+            path = profiling.profile_path(str(p.uuid), args.format)
+        if path is None:
+            return {"error_msg": "Profile not found: {}".format(
+                package_process_uuid)}, 404
+        return send_from_directory(
+            os.path.dirname(path), os.path.basename(path),
+            as_attachment=True)
+
+
 @api_v1.route("/pings")
 class Ping(Resource):
 
@@ -560,4 +880,17 @@ class Ping(Resource):
             ut = str(subprocess.check_output("uptime")).strip()
         except BaseException as e:
             LOG.warning(str(e))
-        return {"alive_since": ut}
+        return {"alive_since": ut,
+                "connection_pools": HTTP.get_metrics()}
+
+
+@api_v1.route("/metrics")
+class Metrics(Resource):
+
+    @api_v1.response(200, "OK (Prometheus text format)")
+    def get(self):
+        """
+        Stage durations, byte counters and queue/job gauges.
+        """
+        return Response(METRICS.render(),
+                        mimetype="text/plain; version=0.0.4")
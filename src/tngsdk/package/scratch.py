@@ -0,0 +1,309 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+"""
+Scratch space of (un)packaging processes.
+Each process gets its own workspace (a folder below the scratch
+root) for all its temporary files and folders. Workspaces are
+removed when the process is done (success or failure) or when the
+tool exits; workspaces left behind by killed processes are swept
+when the tool starts.
+"""
+import atexit
+import json
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from tngsdk.package.accounting import disk_usage
+from tngsdk.package.logger import TangoLogger
+from tngsdk.package.metrics import METRICS
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+# names of all workspaces start with this prefix
+WORKSPACE_PREFIX = "tng-pkg-ws-"
+WORKSPACE_PATTERN = re.compile(r"^{}.+$".format(re.escape(WORKSPACE_PREFIX)))
+# marks a workspace with its owner (process, host)
+OWNER_FILE = ".owner"
+# identifies this process (PIDs are reused, e.g., PID 1 in containers)
+PROCESS_TOKEN = str(uuid.uuid4())
+
+
+class ScratchQuotaExceededException(BaseException):
+    pass
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        LOG.warning("Invalid value of %s: %s", name, os.environ.get(name))
+        return default
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # exists, but belongs to another user
+        return True
+    except (OSError, ValueError, TypeError):
+        return False
+    return True
+
+
+def estimate_scratch_bytes(path):
+    """
+    Scratch space needed to (un)package the given package file
+    or project folder: an unpackaging process extracts the package
+    (and copies it for the validation), a packaging process copies
+    the project and compresses it. None if unknown.
+    """
+    # imported here: only needed for package files
+    import zipfile
+    if path is None or not os.path.exists(path):
+        return None
+    if os.path.isdir(path):
+        return 2 * disk_usage(path)
+    try:
+        with zipfile.ZipFile(path, "r") as zf:
+            return 2 * sum([i.file_size for i in zf.infolist()])
+    except (zipfile.BadZipFile, OSError):
+        return None
+
+
+class Workspace(object):
+    """
+    Scratch folder of a single (un)packaging process.
+    """
+
+    def __init__(self, manager, path, quota=0):
+        self.manager = manager
+        self.path = path
+        # max. bytes used below path (0 = unlimited)
+        self.quota = quota
+
+    def __repr__(self):
+        return "Workspace({})".format(self.path)
+
+    def mkdtemp(self, prefix="tmp"):
+        """
+        Creates a new temporary folder inside the workspace.
+        """
+        self.check_quota()
+        return tempfile.mkdtemp(prefix="{}-".format(prefix), dir=self.path)
+
+    def usage(self):
+        return disk_usage(self.path)
+
+    def check_quota(self):
+        """
+        Raises ScratchQuotaExceededException if the workspace
+        uses more than its quota.
+        """
+        if self.quota <= 0:
+            return
+        used = self.usage()
+        if used > self.quota:
+            raise ScratchQuotaExceededException(
+                "Scratch space quota exceeded: {} of {} bytes used."
+                .format(used, self.quota))
+
+    def release(self):
+        self.manager.release(self)
+
+
+class ScratchSpaceManager(object):
+    """
+    Creates, tracks and removes the workspaces of this process.
+    Configured by (environment):
+    - SCRATCH_DIR: root of the workspaces
+    - SCRATCH_TMPFS_DIR: root for small processes, e.g.,
+      on a tmpfs (optional)
+    - SCRATCH_TMPFS_MAX_BYTES: max. expected scratch space of
+      processes placed in SCRATCH_TMPFS_DIR
+    - SCRATCH_QUOTA_BYTES: max. scratch space per process
+      (0 = unlimited)
+    - SCRATCH_KEEP: do not remove workspaces (debugging)
+    """
+
+    def __init__(self, root=None, tmpfs_root=None, tmpfs_max_bytes=None,
+                 quota=None, keep=None):
+        if root is None:
+            root = os.environ.get(
+                "SCRATCH_DIR",
+                os.path.join(tempfile.gettempdir(), "tng-sdk-package"))
+        if tmpfs_root is None:
+            tmpfs_root = os.environ.get("SCRATCH_TMPFS_DIR")
+        if tmpfs_max_bytes is None:
+            tmpfs_max_bytes = _env_int(
+                "SCRATCH_TMPFS_MAX_BYTES", 64 * 1024 * 1024)
+        if quota is None:
+            quota = _env_int("SCRATCH_QUOTA_BYTES", 0)
+        if keep is None:
+            keep = os.environ.get(
+                "SCRATCH_KEEP", "false").lower() == "true"
+        self.root = root
+        self.tmpfs_root = tmpfs_root
+        self.tmpfs_max_bytes = tmpfs_max_bytes
+        self.quota = quota
+        self.keep = keep
+        self._workspaces = dict()
+        self._lock = threading.Lock()
+
+    def _select_root(self, expected_bytes):
+        """
+        Small processes go to the tmpfs root, if there
+        is enough free space left.
+        """
+        if (self.tmpfs_root is None or expected_bytes is None
+                or expected_bytes > self.tmpfs_max_bytes):
+            return self.root
+        try:
+            os.makedirs(self.tmpfs_root, exist_ok=True)
+            if shutil.disk_usage(self.tmpfs_root).free > expected_bytes:
+                return self.tmpfs_root
+        except OSError as e:
+            LOG.warning("Scratch root %s not usable: %s", self.tmpfs_root, e)
+        return self.root
+
+    def workspace(self, job_id=None, expected_bytes=None):
+        """
+        Creates a workspace for the given process.
+        expected_bytes: scratch space the process is
+        expected to use (optional).
+        """
+        if (self.quota > 0 and expected_bytes is not None
+                and expected_bytes > self.quota):
+            raise ScratchQuotaExceededException(
+                "Scratch space quota exceeded: {} bytes expected, {} allowed."
+                .format(expected_bytes, self.quota))
+        if job_id is None:
+            job_id = uuid.uuid4()
+        root = self._select_root(expected_bytes)
+        os.makedirs(root, exist_ok=True)
+        path = tempfile.mkdtemp(
+            prefix="{}{}-".format(WORKSPACE_PREFIX, job_id), dir=root)
+        with open(os.path.join(path, OWNER_FILE), "w") as f:
+            json.dump({"pid": os.getpid(),
+                       "token": PROCESS_TOKEN,
+                       "host": socket.gethostname(),
+                       "created": time.time()}, f)
+        ws = Workspace(self, path, quota=self.quota)
+        with self._lock:
+            self._workspaces[path] = ws
+        LOG.debug("Created scratch workspace: %s", path)
+        return ws
+
+    def release(self, ws):
+        """
+        Removes the given workspace and everything in it.
+        """
+        with self._lock:
+            if self._workspaces.pop(ws.path, None) is None:
+                return  # already released
+        if self.keep:
+            LOG.info("Keeping scratch workspace: %s", ws.path)
+            return
+        shutil.rmtree(ws.path, ignore_errors=True)
+        LOG.debug("Removed scratch workspace: %s", ws.path)
+
+    def release_all(self):
+        for ws in self.active():
+            self.release(ws)
+
+    def active(self):
+        with self._lock:
+            return list(self._workspaces.values())
+
+    def _is_orphan(self, path):
+        """
+        Only workspaces (name and owner file) are considered:
+        the scratch root might be shared with other programs.
+        """
+        if WORKSPACE_PATTERN.match(os.path.basename(path)) is None:
+            return False
+        try:
+            with open(os.path.join(path, OWNER_FILE)) as f:
+                owner = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False  # not (yet) marked: never remove it
+        if not isinstance(owner, dict) or "pid" not in owner:
+            return False
+        if owner.get("host") != socket.gethostname():
+            return False  # shared scratch root: cannot tell
+        if owner.get("pid") == os.getpid():
+            return (owner.get("token") != PROCESS_TOKEN
+                    or path not in self._workspaces)
+        return not _pid_alive(owner.get("pid"))
+
+    def sweep(self):
+        """
+        Removes workspaces of processes that are no longer
+        running (e.g., killed ones). Called at startup.
+        Returns the removed paths.
+        """
+        removed = list()
+        for root in set([self.root, self.tmpfs_root]):
+            if root is None or not os.path.isdir(root):
+                continue
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                if not os.path.isdir(path) or not self._is_orphan(path):
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(path)
+        if len(removed) > 0:
+            WORKSPACES_SWEPT.inc(len(removed))
+            LOG.info("Removed %d orphaned scratch workspace(s)", len(removed))
+        return removed
+
+
+# have one global instance of the manager
+SCRATCH = ScratchSpaceManager()
+# remove workspaces of running processes on exit
+atexit.register(SCRATCH.release_all)
+
+
+METRICS.gauge("tng_package_scratch_workspaces",
+              "Number of scratch workspaces in use.",
+              func=lambda: len(SCRATCH.active()))
+WORKSPACES_SWEPT = METRICS.counter(
+    "tng_package_scratch_workspaces_swept_total",
+    "Orphaned scratch workspaces removed at startup.")
@@ -30,10 +30,10 @@
 # acknowledge the contributions of their colleagues of the SONATA
 # partner consortium (www.5gtango.eu).
 
-import os
 import yaml
 import re
 from tngsdk.package.logger import TangoLogger
+from tngsdk.package.helper import package_file, open_binary
 
 
 LOG = TangoLogger.getLogger(__name__)
@@ -56,6 +56,9 @@ class StorageBackendResponseException(BaseException):
 
 
 class BaseStorageBackend(object):
+    # True if store() can read the package contents
+    # from a PackageArchive instead of an extracted package
+    supports_archive = False
 
     def __init__(self, args):
         self.args = args
@@ -71,7 +74,7 @@ class BaseStorageBackend(object):
         for pc in napdr.package_content:
             if pattern.search(pc.get("content-type")) is not None:
                 r.append((pc.get("content-type"),
-                          os.path.join(wd, pc.get("source"))))
+                          package_file(wd, pc.get("source"))))
         return r
 
     def _get_package_content_not_of_type(self, napdr, wd, mime_type):
@@ -85,7 +88,7 @@ class BaseStorageBackend(object):
         for pc in napdr.package_content:
             if pattern.search(pc.get("content-type")) is None:
                 r.append((pc.get("content-type"),
-                          os.path.join(wd, pc.get("source"))))
+                          package_file(wd, pc.get("source"))))
         return r
 
     def _get_id_triple_from_descriptor_file(self, path,
@@ -98,20 +101,19 @@ class BaseStorageBackend(object):
         if "5gtango" in content_type:
             try:
                 res = dict()
-                with open(path, 'r') as f:
+                with open_binary(path) as f:
                     data = yaml.load(f)
                     res["vendor"] = data["vendor"]
                     res["name"] = data["name"]
                     res["version"] = data["version"]
                 return res
             except BaseException:
-                LOG.warning("Coul not find vendor.name.version in {}"
-                            .format(path))
+                LOG.warning("Coul not find vendor.name.version in %s", path)
         elif "osm" in content_type:
             # OSM
             try:
                 res = dict()
-                with open(path, 'r') as f:
+                with open_binary(path) as f:
                     data = yaml.load(f)
                     # remove two first levels of OSM descriptor
                     data = data[list(data.keys())[0]]
@@ -122,12 +124,19 @@ class BaseStorageBackend(object):
                     res["version"] = data["version"]
                 return res
             except BaseException:
-                LOG.warning("Coul not find vendor.name.version in {}"
-                            .format(path))
+                LOG.warning("Coul not find vendor.name.version in %s", path)
         # TODO ONAP
         LOG.warning("Fallback: Using filename as ID.")
         return None
 
+    def check_duplicate(self, vendor, name, version):
+        """
+        Raises StorageBackendDuplicatedException if a package with
+        the given vendor, name, version is already stored.
+        Can be overwritten (default: no check).
+        """
+        pass
+
     def store(self, napdr, wd, pkg_file):
         """
         Must be overwritten.
@@ -0,0 +1,165 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import os
+import json
+import hashlib
+import threading
+import time
+from tngsdk.package.helper import file_hash
+from tngsdk.package.logger import TangoLogger
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+class UploadJournal(object):
+    """
+    Persistent, append-only record of the completed steps of
+    a store operation (one JSON line per step: step name and
+    the UUID returned by the storage backend).
+    A retried store of the same package can use it to skip all
+    steps that were already done before the failure.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.steps = self._load()
+
+    def __len__(self):
+        return len(self.steps)
+
+    @staticmethod
+    def journal_id(storage_url, pkg_file):
+        """
+        Journals are identified by storage location and
+        package contents, so that re-uploads of the same
+        package (also by another job) find them.
+        """
+        h = hashlib.sha256()
+        h.update(str(storage_url).encode("utf-8"))
+        h.update(file_hash(pkg_file).encode("utf-8"))
+        return h.hexdigest()
+
+    @staticmethod
+    def open(journal_dir, storage_url, pkg_file, max_age=None):
+        """
+        Opens the journal of the given package. Journals older
+        than max_age (s) are removed first (None: keep them).
+        """
+        os.makedirs(journal_dir, exist_ok=True)
+        if max_age is not None:
+            UploadJournal.sweep(journal_dir, max_age)
+        return UploadJournal(os.path.join(
+            journal_dir, "{}.journal".format(
+                UploadJournal.journal_id(storage_url, pkg_file))))
+
+    @staticmethod
+    def sweep(journal_dir, max_age):
+        """
+        Removes journals that were not written for max_age (s),
+        e.g., of failed stores that were never retried.
+        Returns the removed paths.
+        """
+        removed = list()
+        now = time.time()
+        try:
+            names = os.listdir(journal_dir)
+        except OSError:
+            return removed
+        for name in names:
+            if not name.endswith(".journal"):
+                continue
+            path = os.path.join(journal_dir, name)
+            try:
+                if now - os.path.getmtime(path) > max_age:
+                    os.remove(path)
+                    removed.append(path)
+            except OSError:
+                pass  # removed by another process
+        if len(removed) > 0:
+            LOG.info("Removed %s expired upload journal(s) from %s",
+                     len(removed), journal_dir)
+        return removed
+
+    def _load(self):
+        steps = dict()
+        if not os.path.exists(self.path):
+            return steps
+        with open(self.path, "r") as f:
+            for l in f:
+                try:
+                    e = json.loads(l)
+                    steps[e["step"]] = e["uuid"]
+                except BaseException:
+                    # e.g. last line of an interrupted write
+                    LOG.warning("Skipping malformed journal entry in %s",
+                                self.path)
+        if len(steps) > 0:
+            LOG.info("Found upload journal %s with %s completed steps",
+                     self.path, len(steps))
+        return steps
+
+    def get(self, step):
+        """
+        Returns the UUID recorded for step or None.
+        """
+        with self._lock:
+            return self.steps.get(step)
+
+    def discard(self, step):
+        """
+        Forgets a recorded step, e.g., if its UUID is no longer
+        valid. A later record() of the step overrides it.
+        """
+        with self._lock:
+            self.steps.pop(step, None)
+
+    def record(self, step, uuid):
+        """
+        Persists a completed step.
+        """
+        with self._lock:
+            self.steps[step] = uuid
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"step": step, "uuid": uuid}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def complete(self):
+        """
+        Removes the journal once the store operation is done.
+        """
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.steps = dict()
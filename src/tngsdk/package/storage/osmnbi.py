@@ -37,6 +37,8 @@ import tarfile
 # import json
 from tngsdk.package.storage import BaseStorageBackend  # , \
 #    StorageBackendResponseException, StorageBackendUploadException
+from tngsdk.package.httpclient import HTTP
+from tngsdk.package.metrics import BYTES_UPLOADED
 from tngsdk.package.logger import TangoLogger
 
 
@@ -69,12 +71,13 @@ class OsmNbiBackend(BaseStorageBackend):
         # args overwrite other configurations (e.g. for unit tests)
         if "cat_url" in self.args:
             self.cat_url = self.args.cat_url
+        # max. time for a single upload to OSM
+        self.timeout = float(os.environ.get("OSM_TIMEOUT", 300))
         self.osmclient = None
         if self._test_osmclient_present():
             from osmclient.sol005 import client as sol005client
             self.osmclient = sol005client.Client(host=self.cat_url)
-        LOG.info("osm-nbi-be: initialized OsmNbiBackend({})"
-                 .format(self.cat_url))
+        LOG.info("osm-nbi-be: initialized OsmNbiBackend(%s)", self.cat_url)
 
     def _test_osmclient_present(self):
         """
@@ -84,7 +87,7 @@ class OsmNbiBackend(BaseStorageBackend):
         """
         try:
             import osmclient
-            LOG.debug("Found OSM client: {}".format(osmclient))
+            LOG.debug("Found OSM client: %s", osmclient)
             return True
         except BaseException as e:
             LOG.error(str(e))
@@ -101,7 +104,7 @@ class OsmNbiBackend(BaseStorageBackend):
         vnfds = self._get_package_content_of_type(
             napdr, wd, "application/vnd.etsi.osm.vnfd")
         for vnfd in vnfds:
-            LOG.debug("Found OSM VNFD: {}".format(vnfd))
+            LOG.debug("Found OSM VNFD: %s", vnfd)
             # create a tar.gz file (minimal OSM package) for each descriptor
             tar_path = "{}.tar.gz".format(
                 vnfd.replace(DESCRIPTOR_EXTENSION, ""))
@@ -112,17 +115,20 @@ class OsmNbiBackend(BaseStorageBackend):
                                 DESCRIPTOR_EXTENSION, ""),
                             os.path.basename(vnfd)),
                         recursive=False)
-            LOG.debug("Wrote: {}".format(tar_path))
+            LOG.debug("Wrote: %s", tar_path)
             # osm vnfd-create <file>
-            LOG.info("Uploading VNF package '{}' to OSM at '{}' ..."
-                     .format(os.path.basename(tar_path), self.cat_url))
+            LOG.info("Uploading VNF package '%s' to OSM at '%s' ...",
+                     os.path.basename(tar_path), self.cat_url)
             # TODO overwrite does not seem to work
-            self.osmclient.vnfd.create(filename=tar_path, overwrite=True)
+            HTTP.call(self.cat_url, self.osmclient.vnfd.create,
+                      timeout=self.timeout,
+                      filename=tar_path, overwrite=True)
+            BYTES_UPLOADED.inc(os.path.getsize(tar_path), backend="osmnbi")
         # 2. collect and upload NSDs
         nsds = self._get_package_content_of_type(
             napdr, wd, "application/vnd.etsi.osm.nsd")
         for nsd in nsds:
-            LOG.debug("Found OSM NSD: {}".format(nsd))
+            LOG.debug("Found OSM NSD: %s", nsd)
             # create a tar.gz file (minimal OSM package) for each descriptor
             tar_path = "{}.tar.gz".format(
                 nsd.replace(DESCRIPTOR_EXTENSION, ""))
@@ -133,11 +139,14 @@ class OsmNbiBackend(BaseStorageBackend):
                                 DESCRIPTOR_EXTENSION, ""),
                             os.path.basename(nsd)),
                         recursive=False)
-            LOG.debug("Wrote: {}".format(tar_path))
+            LOG.debug("Wrote: %s", tar_path)
             # osm nsd-create <file>
-            LOG.info("Uploading NSD package '{}' to OSM at '{}' ..."
-                     .format(os.path.basename(tar_path), self.cat_url))
+            LOG.info("Uploading NSD package '%s' to OSM at '%s' ...",
+                     os.path.basename(tar_path), self.cat_url)
             # TODO overwrite does not seem to work
-            self.osmclient.nsd.create(filename=tar_path, overwrite=True)
+            HTTP.call(self.cat_url, self.osmclient.nsd.create,
+                      timeout=self.timeout,
+                      filename=tar_path, overwrite=True)
+            BYTES_UPLOADED.inc(os.path.getsize(tar_path), backend="osmnbi")
         # TODO update storage locations etc.
         return napdr
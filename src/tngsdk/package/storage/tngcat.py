@@ -31,19 +31,38 @@
 # partner consortium (www.5gtango.eu).
 
 import os
-import requests
+import time
+import tempfile
+import threading
 import yaml
 import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 from tngsdk.package.storage import BaseStorageBackend, \
     StorageBackendResponseException, StorageBackendUploadException, \
     StorageBackendDuplicatedException
+from tngsdk.package.storage.journal import UploadJournal
+from tngsdk.package.httpclient import HTTP
+from tngsdk.package.helper import open_upload_body, file_hash, \
+    PackageArchive, package_file, package_file_source
+from tngsdk.package.metrics import BYTES_UPLOADED, UPLOAD_QUEUE_DEPTH
+from tngsdk.package.tracing import TRACER
+from tngsdk.package.accounting import current_account, set_current_account
 from tngsdk.package.logger import TangoLogger
 
 
 LOG = TangoLogger.getLogger(__name__)
 
 
+# catalog endpoints of the artifacts of a package (by kind)
+UPLOAD_ENDPOINTS = {"vnfd": "/vnfs",
+                    "nsd": "/network-services",
+                    "tstd": "/tests",
+                    "generic": "/files",
+                    "pkg": "/tgo-packages"}
+
+
 class TangoCatalogBackend(BaseStorageBackend):
+    supports_archive = True
 
     def __init__(self, args):
         self.args = args
@@ -57,16 +76,41 @@ class TangoCatalogBackend(BaseStorageBackend):
         # args overwrite other configurations (e.g. for unit tests)
         if "cat_url" in self.args:
             self.cat_url = self.args.cat_url
-        LOG.info("tng-cat-be: initialized TangoCatalogBackend({})"
-                 .format(self.cat_url))
+        # max. number of parallel uploads to this catalog
+        self.max_concurrent_uploads = int(os.environ.get(
+            "CATALOGUE_MAX_CONCURRENT_UPLOADS", 8))
+        # shared keep-alive session, reused across jobs
+        self.session = HTTP.get_session(
+            self.cat_url,
+            pool_size=int(os.environ.get("CATALOGUE_POOL_SIZE", 10)),
+            timeout=(
+                float(os.environ.get("CATALOGUE_CONNECT_TIMEOUT", 3.05)),
+                float(os.environ.get("CATALOGUE_READ_TIMEOUT", 120))))
+        # reuse already uploaded generic files (content-addressed)
+        self.dedupe = os.environ.get(
+            "CATALOGUE_DEDUPE", "true").lower() == "true"
+        self.dedupe_verify = os.environ.get(
+            "CATALOGUE_DEDUPE_VERIFY", "true").lower() == "true"
+        # journal completed uploads to resume failed stores
+        self.journal_dir = os.environ.get(
+            "CATALOGUE_JOURNAL_DIR",
+            os.path.join(tempfile.gettempdir(), "tng-sdk-package-journals"))
+        self.use_journal = os.environ.get(
+            "CATALOGUE_JOURNAL", "true").lower() == "true"
+        # journals of stores not retried within this time are removed
+        self.journal_max_age = float(os.environ.get(
+            "CATALOGUE_JOURNAL_MAX_AGE", 24 * 60 * 60))
+        self.journal_verify = os.environ.get(
+            "CATALOGUE_JOURNAL_VERIFY", "true").lower() == "true"
+        LOG.info("tng-cat-be: initialized TangoCatalogBackend(%s)",
+                 self.cat_url)
 
     def _get_yaml_data_from_catalog(self, endpoint):
         url = "{}{}".format(self.cat_url, endpoint)
-        LOG.info("tng-cat-be: GET from {}"
-                 .format(url))
-        return requests.get(url,
-                            headers={"Content-Type":
-                                     "application/x-yaml"})
+        LOG.info("tng-cat-be: GET from %s", url)
+        return self.session.get(url,
+                                headers={"Content-Type":
+                                         "application/x-yaml"})
 
     def _get_artifact(self, vendor, name, version, endpoint="/packages"):
         """
@@ -83,6 +127,56 @@ class TangoCatalogBackend(BaseStorageBackend):
         """
         return (len(self._get_artifact(vendor, name, version, endpoint)) > 0)
 
+    def _get_artifact_cached(self, vendor, name, version,
+                             endpoint="/packages"):
+        """
+        Like _get_artifact but answered from the (short-lived)
+        existence cache if possible. Only found artifacts are
+        cached: a cached 'not found' would let concurrent uploads
+        of the same package pass the check in store().
+        """
+        key = (self.cat_url, endpoint, vendor, name, version)
+        found, result = EXISTS_CACHE.get(key)
+        if not found:
+            result = self._get_artifact(vendor, name, version, endpoint)
+            if len(result) > 0:
+                EXISTS_CACHE.put(key, result)
+        return result
+
+    def check_duplicate(self, vendor, name, version):
+        """
+        Raises StorageBackendDuplicatedException if the package
+        (w. given version) is already in the catalog.
+        """
+        existing_napd = self._get_artifact_cached(vendor, name, version)
+        if len(existing_napd) < 1:
+            return
+        pkg_uuid = existing_napd[0].get("uuid")
+        msg = "tng-cat-be: Could not upload package {}.{}.{}. \
+Package already exists (409) \
+in the catalog with UUID {}. Skipped uploads \
+of additional artifacts belonging to \
+this package.".format(vendor, name, version, pkg_uuid)
+        raise StorageBackendDuplicatedException(msg)
+
+    def _file_exists(self, uuid):
+        """
+        Checks if the generic file with the given UUID exists
+        in the catalog (without downloading it).
+        """
+        return self._uuid_exists("/files", uuid)
+
+    def _uuid_exists(self, endpoint, uuid):
+        """
+        Checks if the artifact with the given UUID exists
+        at the given endpoint (without downloading it).
+        """
+        url = "{}{}/{}".format(self.cat_url, endpoint, uuid)
+        LOG.debug("tng-cat-be: GET (check) %s", url)
+        r = self.session.get(url, stream=True)
+        r.close()
+        return r.status_code == 200
+
     def _build_request_params(self, arg_params):
         """
         Build URL parameters for requests to catalog.
@@ -92,77 +186,82 @@ class TangoCatalogBackend(BaseStorageBackend):
             params["username"] = self.args.username
         if arg_params is not None:
             params.update(arg_params)
-        LOG.debug("Build request params: {}".format(params))
+        LOG.debug("Build request params: %s", params)
         return params
 
     def _post_yaml_data_to_catalog(self, endpoint, data, arg_params=None):
         url = "{}{}".format(self.cat_url, endpoint)
-        LOG.info("tng-cat-be: POST YAML data to {}"
-                 .format(url))
-        return requests.post(url,
-                             params=self._build_request_params(arg_params),
-                             data=yaml.dump(data),
-                             headers={"Content-Type":
-                                      "application/x-yaml"})
+        LOG.info("tng-cat-be: POST YAML data to %s", url)
+        return self.session.post(
+            url,
+            params=self._build_request_params(arg_params),
+            data=yaml.dump(data),
+            headers={"Content-Type": "application/x-yaml"})
 
     def _post_yaml_file_to_catalog(self, endpoint, path, arg_params=None):
         url = "{}{}".format(self.cat_url, endpoint)
-        LOG.info("tng-cat-be: POST YAML to {} content {}".format(url, path))
-        with open(path, "rb") as f:
-            data = f.read()
-            return requests.post(url,
-                                 params=self._build_request_params(arg_params),
-                                 data=data,
-                                 headers={"Content-Type":
-                                          "application/x-yaml"})
+        LOG.info("tng-cat-be: POST YAML to %s content %s", url, path)
+        with open_upload_body(path) as data:
+            resp = self.session.post(
+                url,
+                params=self._build_request_params(arg_params),
+                data=data,
+                headers={"Content-Type": "application/x-yaml"})
+        _count_uploaded(path, resp)
+        return resp
 
     def _post_json_data_to_catalog(self, endpoint, data, arg_params=None):
         url = "{}{}".format(self.cat_url, endpoint)
-        LOG.info("tng-cat-be: POST JSON data to {}"
-                 .format(url))
-        return requests.post(url,
-                             params=self._build_request_params(arg_params),
-                             data=json.dumps(data),
-                             headers={"Content-Type":
-                                      "application/json"})
+        LOG.info("tng-cat-be: POST JSON data to %s", url)
+        return self.session.post(
+            url,
+            params=self._build_request_params(arg_params),
+            data=json.dumps(data),
+            headers={"Content-Type": "application/json"})
 
     def _post_json_file_to_catalog(self, endpoint, path, arg_params=None):
         url = "{}{}".format(self.cat_url, endpoint)
-        LOG.info("tng-cat-be: POST JSON to {} content {}".format(url, path))
-        with open(path, "rb") as f:
-            data = f.read()
-            return requests.post(url,
-                                 params=self._build_request_params(arg_params),
-                                 data=data,
-                                 headers={"Content-Type":
-                                          "application/json"})
+        LOG.info("tng-cat-be: POST JSON to %s content %s", url, path)
+        with open_upload_body(path) as data:
+            resp = self.session.post(
+                url,
+                params=self._build_request_params(arg_params),
+                data=data,
+                headers={"Content-Type": "application/json"})
+        _count_uploaded(path, resp)
+        return resp
 
     def _post_pkg_file_to_catalog(self, endpoint, path, arg_params=None):
         url = "{}{}".format(self.cat_url, endpoint)
-        cd_str = "attachment; filename={}".format(os.path.basename(path))
-        LOG.info("tng-cat-be: POST PKG to {} content {} using {}"
-                 .format(url, path, cd_str))
-        with open(path, "rb") as f:
-            data = f.read()
-            return requests.post(url,
-                                 params=self._build_request_params(arg_params),
-                                 data=data,
-                                 headers={"Content-Type": "application/zip",
-                                          "Content-Disposition": cd_str})
+        cd_str = "attachment; filename={}".format(
+            os.path.basename(str(path)))
+        LOG.info("tng-cat-be: POST PKG to %s content %s using %s", url, path,
+                 cd_str)
+        with open_upload_body(path) as data:
+            resp = self.session.post(
+                url,
+                params=self._build_request_params(arg_params),
+                data=data,
+                headers={"Content-Type": "application/zip",
+                         "Content-Disposition": cd_str})
+        _count_uploaded(path, resp)
+        return resp
 
     def _post_generic_file_to_catalog(self, endpoint, path, arg_params=None):
         url = "{}{}".format(self.cat_url, endpoint)
-        cd_str = "attachment; filename={}".format(os.path.basename(path))
-        LOG.info("tng-cat-be: POST generic file to {} content {} using {}"
-                 .format(url, path, cd_str))
-        with open(path, "rb") as f:
-            data = f.read()
-            return requests.post(
+        cd_str = "attachment; filename={}".format(
+            os.path.basename(str(path)))
+        LOG.info("tng-cat-be: POST generic file to %s content %s using %s",
+                 url, path, cd_str)
+        with open_upload_body(path) as data:
+            resp = self.session.post(
                 url,
                 params=self._build_request_params(arg_params),
                 data=data,
                 headers={"Content-Type": "application/octet-stream",
                          "Content-Disposition": cd_str})
+        _count_uploaded(path, resp)
+        return resp
 
     def _post_package_descriptor(self, napdr):
         """
@@ -215,7 +314,7 @@ class TangoCatalogBackend(BaseStorageBackend):
         """
         for pc in napdr.package_content:
             triple = self._get_id_triple_from_descriptor_file(
-                os.path.join(wd, pc.get("source")), pc.get("content-type"))
+                package_file(wd, pc.get("source")), pc.get("content-type"))
             if triple is not None:
                 # annotate
                 pc["id"] = triple
@@ -228,7 +327,7 @@ class TangoCatalogBackend(BaseStorageBackend):
         Add UUID of uploaded package file to NAPDR.
         """
         napdr.package_file_uuid = pkg_file_uuid
-        napdr.package_file_name = os.path.basename(pkg_file)
+        napdr.package_file_name = os.path.basename(str(pkg_file))
 
     def _annotate_napdr_with_cat_storage_locations(
             self, napdr, pkg_uuid):
@@ -239,101 +338,242 @@ class TangoCatalogBackend(BaseStorageBackend):
         napdr.metadata["_storage_uuid"] = str(pkg_uuid)
         napdr.metadata["_storage_location"] = pkg_url
 
+    def _get_upload_index_key(self, mime, path, checksum=None):
+        """
+        Key of a generic file in the known-uploads index:
+        catalog URL + platform + MIME type + hash of the file.
+        checksum: (algorithm, hash) tuple taken from the package_content
+        section. Only given if the checksums of the package were
+        validated, otherwise the file itself is hashed.
+        """
+        algorithm, hash_str = checksum if checksum else (None, None)
+        if algorithm is None or hash_str is None:
+            algorithm, hash_str = "SHA-256", file_hash(path)
+        return "{}#{}:{}#{}:{}".format(
+            self.cat_url.rstrip("/"), mime_to_pltfrm(mime), mime,
+            algorithm, str(hash_str).lower())
+
+    def _upload_generic_file(self, mime, path, checksum=None):
+        """
+        Uploads a generic file to the catalog. If a file with the same
+        content was uploaded before, its UUID is reused instead.
+        """
+        key = None
+        if self.dedupe:
+            key = self._get_upload_index_key(mime, path, checksum)
+            uuid = UPLOAD_INDEX.get(key)
+            if uuid is not None:
+                if not self.dedupe_verify or self._file_exists(uuid):
+                    LOG.info("tng-cat-be: generic file '%s' already in "
+                             "catalog. Reusing UUID: %s",
+                             os.path.basename(str(path)), uuid)
+                    return uuid
+                # stale entry, e.g., file was deleted from the catalog
+                UPLOAD_INDEX.remove(key)
+        resp = self._post_generic_file_to_catalog(
+            "/files", path,
+            arg_params={"platform": mime_to_pltfrm(mime)})
+        if resp.status_code != 201 and resp.status_code != 200:
+            raise StorageBackendUploadException(
+                "tng-cat-be: could not upload generic file ({}): ({}) {}"
+                .format(path, resp.status_code, resp.text))
+        uuid = resp.json().get("uuid")
+        LOG.debug("Generic file '%s' stored under UUID: %s",
+                  os.path.basename(str(path)), uuid)
+        if key is not None and uuid is not None:
+            UPLOAD_INDEX.put(key, uuid)
+        return uuid
+
+    def _upload_artifact(self, kind, mime, path, checksum=None):
+        """
+        Uploads a single artifact of the given kind
+        (vnfd, nsd, tstd, generic, pkg) to the catalog.
+        checksum: optional (algorithm, hash) tuple of the artifact
+        Returns the catalog UUID of the artifact.
+        """
+        arg_params = {"platform": mime_to_pltfrm(mime)}
+        if kind == "pkg":
+            resp = self._post_pkg_file_to_catalog("/tgo-packages", path)
+            if resp.status_code != 201:
+                raise StorageBackendUploadException(
+                    "tng-cat-be: could not upload package. Response: {}"
+                    .format(resp.status_code))
+            return resp.json().get("uuid")
+        if kind == "generic":
+            return self._upload_generic_file(mime, path, checksum)
+        post_func, name = {
+            "vnfd": (self._post_vnf_descriptors, "VNF descriptor"),
+            "nsd": (self._post_ns_descriptors, "NS descriptor"),
+            "tstd": (self._post_test_descriptors, "test descriptor")}[kind]
+        resp = post_func(path, arg_params=arg_params)
+        if resp.status_code != 201 and resp.status_code != 200:
+            raise StorageBackendUploadException(
+                "tng-cat-be: could not upload {}: ({}) {}"
+                .format(name, resp.status_code, resp.text))
+        uuid = self._parse_cat_yaml_response(resp).get("uuid")
+        if uuid is None:
+            raise StorageBackendUploadException(
+                "tng-cat-be: could not retrieve UUID from tng-cat.")
+        return uuid
+
+    def _open_journal(self, pkg_file):
+        """
+        Returns the upload journal of the given package
+        or None if journaling is disabled or not possible.
+        """
+        if not self.use_journal:
+            return None
+        try:
+            return UploadJournal.open(
+                self.journal_dir, self.cat_url, pkg_file,
+                max_age=self.journal_max_age)
+        except BaseException as e:
+            LOG.warning("tng-cat-be: cannot open upload journal: %s", e)
+        return None
+
+    def _journaled_uuid_valid(self, kind, uuid):
+        """
+        Checks if an artifact recorded in an upload journal
+        still exists in the catalog.
+        """
+        if not self.journal_verify:
+            return True
+        return self._uuid_exists(UPLOAD_ENDPOINTS[kind], uuid)
+
+    def _run_uploads(self, uploads, journal=None, steps=None):
+        """
+        Runs the given uploads [(kind, mime, path[, checksum]), ...]
+        concurrently,
+        limited by the per-catalog upload limit.
+        Fails fast: The first failing upload cancels all uploads
+        that have not yet started and its exception is raised.
+        If a journal is given, uploads whose step (same order as
+        uploads) is in the journal are skipped and completed
+        uploads are recorded.
+        Returns the list of UUIDs (same order as uploads).
+        """
+        cancelled = threading.Event()
+        semaphore = _get_upload_semaphore(
+            self.cat_url, self.max_concurrent_uploads)
+
+        # uploads run in worker threads: pass the span and the
+        # resource account of the process explicitly
+        parent_span = TRACER.current_span()
+        account = current_account()
+
+        def _upload(step, kind, mime, path, *args):
+            prev_account = set_current_account(account)
+            try:
+                with TRACER.span("upload", parent=parent_span, kind=kind,
+                                 file=str(path), size=_artifact_size(path)
+                                 ) as span:
+                    uuid = _upload_traced(step, kind, mime, path, *args)
+                    span.set_attribute("uuid", uuid)
+            finally:
+                set_current_account(prev_account)
+            return uuid
+
+        def _upload_traced(step, kind, mime, path, *args):
+            if journal is not None:
+                uuid = journal.get(step)
+                if uuid is not None and self._journaled_uuid_valid(
+                        kind, uuid):
+                    LOG.debug("tng-cat-be: skipping completed upload: %s",
+                              step)
+                    return uuid
+                if uuid is not None:
+                    # e.g. deleted from the catalog since: upload again
+                    LOG.info("tng-cat-be: journaled UUID %s of %s no "
+                             "longer in catalog", uuid, step)
+                    journal.discard(step)
+            with UPLOAD_QUEUE_DEPTH.track():
+                semaphore.acquire()
+            try:
+                if cancelled.is_set():
+                    raise StorageBackendUploadException(
+                        "tng-cat-be: upload cancelled: {}".format(path))
+                uuid = self._upload_artifact(kind, mime, path, *args)
+            except BaseException:
+                # stop queued uploads right away
+                cancelled.set()
+                raise
+            finally:
+                semaphore.release()
+            if journal is not None and uuid is not None:
+                journal.record(step, uuid)
+            return uuid
+
+        if steps is None:
+            steps = [None] * len(uploads)
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrent_uploads)
+        futures = [executor.submit(_upload, step, *u)
+                   for step, u in zip(steps, uploads)]
+        _, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        for f in futures:
+            if f.done() and f.exception() is not None:
+                # do not wait for uploads that are already in-flight
+                cancelled.set()
+                for nd in not_done:
+                    nd.cancel()
+                executor.shutdown(wait=False)
+                raise f.exception()
+        executor.shutdown(wait=True)
+        return [f.result() for f in futures]
+
     def store(self, napdr, wd, pkg_file):
         """
         Stores the pushes given package and its files to the
         5GTANGO catalog.
         :param napdr: package descriptor record from unpacking
         :param wd: working directory with package contents
+                   or PackageArchive
         :param pkg_file: path to the original package file
+                         or MemoryFile
         :return napdr: updated/annotated napdr
         """
         # 0. check if package (w. given version) is already in catalog
         # skip the rest of the uploading process if package is found
-        if self._artifact_exists(napdr.vendor, napdr.name, napdr.version):
-            existing_napd = self._get_artifact(
-                napdr.vendor, napdr.name, napdr.version)
-            pkg_uuid = existing_napd[0].get("uuid")
-            msg = "tng-cat-be: Could not upload package {}.{}.{}. \
-Package already exists (409) \
-in the catalog with UUID {}. Skipped uploads \
-of additional artifacts belonging to \
-this package.".format(napdr.vendor, napdr.name, napdr.version, pkg_uuid)
-            raise StorageBackendDuplicatedException(msg)
-        # 1. collect and upload VNFDs
-        vnfds = self._get_package_content_of_type(
-            napdr, wd, "application/vnd.*.vnfd")  # 5gtango, osm, onap
-        LOG.debug("Found VNFDs for uplaod: {}".format(vnfds))
-        file_catalog_uuids = dict()
-        for (mime, vnfd) in vnfds:
-            vnfd_resp = self._post_vnf_descriptors(
-                vnfd, arg_params={"platform": mime_to_pltfrm(mime)})
-            if vnfd_resp.status_code != 201 and vnfd_resp.status_code != 200:
-                raise StorageBackendUploadException(
-                    "tng-cat-be: could not upload VNF descriptor: ({}) {}"
-                    .format(vnfd_resp.status_code, vnfd_resp.text))
-            vnfd_uuid = self._parse_cat_yaml_response(vnfd_resp).get("uuid")
-            if vnfd_uuid is None:
-                raise StorageBackendUploadException(
-                    "tng-cat-be: could not retrieve UUID from tng-cat.")
-            file_catalog_uuids[vnfd.replace(wd, "")] = vnfd_uuid
-        # 2. collect and upload NSDs
-        nsds = self._get_package_content_of_type(
-            napdr, wd, "application/vnd.*.nsd")  # 5gtango, osm, onap
-        LOG.debug("Found NSDds for uplaod: {}".format(nsds))
-        for (mime, nsd) in nsds:
-            nsd_resp = self._post_ns_descriptors(
-                nsd, arg_params={"platform": mime_to_pltfrm(mime)})
-            if nsd_resp.status_code != 201 and nsd_resp.status_code != 200:
-                raise StorageBackendUploadException(
-                    "tng-cat-be: could not upload NS descriptor: ({}) {}"
-                    .format(nsd_resp.status_code, nsd_resp.text))
-            nsd_uuid = self._parse_cat_yaml_response(nsd_resp).get("uuid")
-            if nsd_uuid is None:
-                raise StorageBackendUploadException(
-                    "tng-cat-be: could not retrieve UUID from tng-cat.")
-            file_catalog_uuids[nsd.replace(wd, "")] = nsd_uuid
-        # 3. collect and upload TESTDs
-        tstds = self._get_package_content_of_type(
-            napdr, wd, "application/vnd.*.tstd")  # 5gtango, osm, onap
-        LOG.debug("Found TSTDs for uplaod: {}".format(tstds))
-        for (mime, tstd) in tstds:
-            tstd_resp = self._post_test_descriptors(
-                tstd, arg_params={"platform": mime_to_pltfrm(mime)})
-            if tstd_resp.status_code != 201 and tstd_resp.status_code != 200:
-                raise StorageBackendUploadException(
-                    "tng-cat-be: could not upload test descriptor: ({}) {}"
-                    .format(tstd_resp.status_code, tstd_resp.text))
-            tstd_uuid = self._parse_cat_yaml_response(tstd_resp).get("uuid")
-            if tstd_uuid is None:
-                raise StorageBackendUploadException(
-                    "tng-cat-be: could not retrieve UUID from tng-cat.")
-            file_catalog_uuids[tstd.replace(wd, "")] = tstd_uuid
-        # 4. collect and upload all arbitrary other files
+        self.check_duplicate(napdr.vendor, napdr.name, napdr.version)
+        # 1.-5. upload VNFDs, NSDs, TSTDs, generic files and
+        # the package file *.tgo concurrently
+        uploads = list()
+        for kind, pattern in [("vnfd", "application/vnd.*.vnfd"),
+                              ("nsd", "application/vnd.*.nsd"),
+                              ("tstd", "application/vnd.*.tstd")]:
+            # 5gtango, osm, onap
+            files = self._get_package_content_of_type(napdr, wd, pattern)
+            LOG.debug("Found %ss for upload: %s", kind.upper(), files)
+            uploads.extend([(kind, mime, path) for (mime, path) in files])
         generic_files = self._get_package_content_not_of_type(
             napdr, wd, "application/vnd.*")
-        LOG.debug("Found generic files for uplaod: {}".format(generic_files))
-        gf_filenames_uuids = dict()
-        for (mime, gf) in generic_files:
-            gf_clean = os.path.basename(gf)
-            gf_resp = self._post_generic_file_to_catalog(
-                "/files", gf, arg_params={"platform": mime_to_pltfrm(mime)})
-            if gf_resp.status_code != 201 and gf_resp.status_code != 200:
-                raise StorageBackendUploadException(
-                    "tng-cat-be: could not upload generic file ({}): ({}) {}"
-                    .format(gf, gf_resp.status_code, gf_resp.text))
-            gf_filenames_uuids[gf_clean] = gf_resp.json().get("uuid")
-            file_catalog_uuids[gf.replace(wd, "")] = gf_resp.json().get("uuid")
-            LOG.debug("Generic file '{}' stored under UUID: {}".format(
-                gf_clean, gf_filenames_uuids[gf_clean]))
-        # 5. upload Package file *.tgo and get catalog UUID
-        pkg_resp = self._post_pkg_file_to_catalog(
-            "/tgo-packages", pkg_file)
-        if pkg_resp.status_code != 201:
-            raise StorageBackendUploadException(
-                "tng-cat-be: could not upload package. Response: {}"
-                .format(pkg_resp.status_code))
-        pkg_file_uuid = pkg_resp.json().get("uuid")
+        LOG.debug("Found generic files for uplaod: %s", generic_files)
+        # hashes in the package_content section are only trusted if
+        # they were validated, i.e., checksum mismatches are errors
+        checksums = dict()
+        if not getattr(self.args, "no_checksums", False):
+            checksums = {str(package_file(wd, pc.get("source"))):
+                         (pc.get("algorithm"), pc.get("hash"))
+                         for pc in napdr.package_content}
+        uploads.extend([("generic", mime, path, checksums.get(str(path)))
+                        for (mime, path) in generic_files])
+        uploads.append(("pkg", None, pkg_file))
+        # resume from the last (failed) attempt to store this package
+        journal = self._open_journal(pkg_file)
+        if journal is not None and len(journal) > 0:
+            LOG.info("tng-cat-be: resuming store of %s: skipping %s "
+                     "completed uploads", pkg_file, len(journal))
+        steps = [u[0] if u[0] == "pkg" else "{}:{}".format(
+                 u[0], _relative_source(wd, u[2])) for u in uploads]
+        results = self._run_uploads(uploads, journal, steps)
+        file_catalog_uuids = dict()
+        pkg_file_uuid = None
+        for u, uuid in zip(uploads, results):
+            kind, path = u[0], u[2]
+            if kind == "pkg":
+                pkg_file_uuid = uuid
+            else:
+                file_catalog_uuids[package_file_source(wd, path)] = uuid
         # 6. upload package descriptor
         # annotate package descriptor with catalog locations
         self._annotate_napdr_with_cat_uuids(napdr, file_catalog_uuids)
@@ -348,15 +588,168 @@ this package.".format(napdr.vendor, napdr.name, napdr.version, pkg_uuid)
         if pkg_uuid is None:
             raise StorageBackendUploadException(
                 "tng-cat-be: could not retrieve package UUID from tng-cat.")
-        LOG.info("tng-cat-ne: received PKG UUID from catalog: {}"
-                 .format(pkg_uuid))
+        LOG.info("tng-cat-ne: received PKG UUID from catalog: %s", pkg_uuid)
+        if journal is not None:
+            journal.complete()
         pkg_url = "{}/packages/{}".format(self.cat_url, pkg_uuid)
         # updated/annotated napdr
         self._annotate_napdr_with_cat_storage_locations(napdr, pkg_uuid)
-        LOG.info("tng-cat-be: tangoCatalogBackend stored: {}".format(pkg_url))
+        EXISTS_CACHE.put(
+            (self.cat_url, "/packages",
+             napdr.vendor, napdr.name, napdr.version),
+            [{"uuid": pkg_uuid}])
+        LOG.info("tng-cat-be: tangoCatalogBackend stored: %s", pkg_url)
         return napdr
 
 
+class UploadIndex(object):
+    """
+    Thread-safe index of known uploads: content hash -> catalog UUID.
+    Used to not upload the same generic file (VM images, scripts, ...)
+    again and again. Optionally persisted to a JSON file, so that
+    it survives restarts.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._index = dict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                self._index = json.load(f)
+            LOG.debug("Loaded upload index with %s entries from %s",
+                      len(self._index), self.path)
+        except BaseException as e:
+            LOG.warning("Could not load upload index %s: %s", self.path, e)
+
+    def _save(self):
+        # called with self._lock held
+        if self.path is None:
+            return
+        try:
+            tmp_path = "{}.tmp".format(self.path)
+            with open(tmp_path, "w") as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.path)
+        except BaseException as e:
+            LOG.warning("Could not write upload index %s: %s", self.path, e)
+
+    def get(self, key):
+        with self._lock:
+            uuid = self._index.get(key)
+            if uuid is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return uuid
+
+    def put(self, key, uuid):
+        with self._lock:
+            self._index[key] = uuid
+            self._save()
+
+    def remove(self, key):
+        with self._lock:
+            self._index.pop(key, None)
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._index = dict()
+            self._save()
+
+
+class ExistenceCache(object):
+    """
+    Thread-safe cache for catalog lookups, e.g., 'does package
+    vendor.name.version exist?'. Entries expire after a short TTL,
+    so that changes in the catalog are picked up quickly.
+    """
+
+    def __init__(self, ttl=10.0):
+        self.ttl = ttl
+        self._entries = dict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns (found, value).
+        """
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None:
+                return False, None
+            if time.time() - e[0] > self.ttl:
+                del self._entries[key]
+                return False, None
+            return True, e[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+
+    def clear(self):
+        with self._lock:
+            self._entries = dict()
+
+
+# have one global existence cache (shared by all jobs)
+EXISTS_CACHE = ExistenceCache(
+    float(os.environ.get("CATALOGUE_EXISTS_CACHE_TTL", 10)))
+
+
+# have one global index of known uploads (shared by all jobs)
+UPLOAD_INDEX = UploadIndex(os.environ.get("CATALOGUE_UPLOAD_INDEX_FILE"))
+
+
+# per-catalog upload limits (shared by all jobs)
+_UPLOAD_SEMAPHORES = dict()
+_UPLOAD_SEMAPHORES_LOCK = threading.Lock()
+
+
+def _get_upload_semaphore(cat_url, limit):
+    with _UPLOAD_SEMAPHORES_LOCK:
+        if cat_url not in _UPLOAD_SEMAPHORES:
+            _UPLOAD_SEMAPHORES[cat_url] = threading.BoundedSemaphore(limit)
+        return _UPLOAD_SEMAPHORES[cat_url]
+
+
+def _relative_source(wd, path):
+    if isinstance(wd, PackageArchive):
+        return package_file_source(wd, path)
+    return os.path.relpath(path, wd)
+
+
+def _artifact_size(path):
+    try:
+        if not isinstance(path, str):  # ZipMember, MemoryFile
+            return path.size
+        return os.path.getsize(path)
+    except BaseException:
+        return None
+
+
+def _count_uploaded(path, resp):
+    """
+    Counts the bytes of successfully uploaded artifacts.
+    """
+    if resp.status_code not in [200, 201]:
+        return
+    size = _artifact_size(path) or 0
+    BYTES_UPLOADED.inc(size, backend="tngcat")
+    account = current_account()
+    if account is not None:
+        # read from the package, written to the catalog
+        account.add_io(read=size, written=size, uploaded=size)
+
+
 def mime_to_pltfrm(mime_string):
     """
     Translates MIME types to platform names used
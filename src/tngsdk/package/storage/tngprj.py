@@ -35,7 +35,8 @@ import shutil
 import yaml
 from tngsdk.package.storage import BaseStorageBackend
 from tngsdk.package.logger import TangoLogger
-from tngsdk.package.helper import extract_zip_file_to_temp
+from tngsdk.package.helper import extract_zip_file_to_temp, \
+    PackageArchive, package_file
 
 LOG = TangoLogger.getLogger(__name__)
 
@@ -46,15 +47,15 @@ PROJECT_MANIFEST_NAME = "project.yml"
 
 
 class TangoProjectFilesystemBackend(BaseStorageBackend):
+    supports_archive = True
 
     def __init__(self, args):
         self.args = args
         # if no output folder is given use CWD
         if self.args.output is None:
             self.args.output = os.getcwd()
-        LOG.info(
-            "tng-prj-be: Initialized TangoProjectFilesystemBackend({})"
-            .format(self.args.output))
+        LOG.info("tng-prj-be: Initialized TangoProjectFilesystemBackend(%s)",
+                 self.args.output)
 
     def remove_Definitions(self, s):
         s = s.strip().strip(os.sep)
@@ -66,7 +67,7 @@ class TangoProjectFilesystemBackend(BaseStorageBackend):
     def _makedirs(self, d):
         if not os.path.exists(d):
             os.makedirs(d)
-            LOG.debug("tng-prj-be: Created directories: {}".format(d))
+            LOG.debug("tng-prj-be: Created directories: %s", d)
 
     def _create_project_tree(self, pd):
         """
@@ -130,11 +131,15 @@ class TangoProjectFilesystemBackend(BaseStorageBackend):
         Copies all unpackaged artifacts to project directory.
         """
         for src, dst in zip(self.sources, self.destinations):
-            s = os.path.join(wd, src)
+            s = package_file(wd, src)
             d = os.path.join(pd, dst)
             self._makedirs(os.path.dirname(d))
-            LOG.debug("Copying {}\n\t to {}".format(s, d))
-            shutil.copyfile(s, d)
+            LOG.debug("Copying %s\n\t to %s", s, d)
+            if isinstance(wd, PackageArchive):
+                with s.open() as fs, open(d, "wb") as fd:
+                    shutil.copyfileobj(fs, fd)
+            else:
+                shutil.copyfile(s, d)
 
     def store(self, napdr, wd, pkg_file, output=None):
         """
@@ -143,8 +148,7 @@ class TangoProjectFilesystemBackend(BaseStorageBackend):
         """
         # 1. create project manifest from NAPDR
         pm = self._create_project_manifest(napdr)
-        LOG.debug("tng-prj-be: Generated project manifest: {}"
-                  .format(pm))
+        LOG.debug("tng-prj-be: Generated project manifest: %s", pm)
         # 2. create project directory
         if output is None:
             output = self.args.output
@@ -152,7 +156,7 @@ class TangoProjectFilesystemBackend(BaseStorageBackend):
             pkg_file = "tng-pkg.tgo"
         pd = os.path.join(
             output,
-            os.path.splitext(os.path.basename(pkg_file))[0])
+            os.path.splitext(os.path.basename(str(pkg_file)))[0])
         self._makedirs(pd)
         # 3. create empty project tree
         self._create_project_tree(pd)
@@ -163,7 +167,7 @@ class TangoProjectFilesystemBackend(BaseStorageBackend):
         # 6. write project.yml
         with open(os.path.join(pd, PROJECT_MANIFEST_NAME), "w") as f:
             yaml.dump(pm, f, default_flow_style=False)
-        LOG.info("tng-prj-be: Created 5GTANGO SDK project: {}".format(pd))
+        LOG.info("tng-prj-be: Created 5GTANGO SDK project: %s", pd)
         # annotate napdr
         napdr.metadata["_storage_location"] = pd
         return napdr
@@ -0,0 +1,136 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import unittest
+import os
+import tempfile
+import threading
+import tracemalloc
+from unittest.mock import patch
+from tngsdk.package.accounting import ResourceAccount, disk_usage, \
+    current_account, set_current_account
+from tngsdk.package.storage.tngcat import TangoCatalogBackend
+from tngsdk.package.loadtest.server import BackgroundServer
+from tngsdk.package.loadtest.fakecat import FakeCatalogue
+from tngsdk.package.packager import PM
+from tngsdk.package.cli import parse_args
+from tngsdk.package.tests.fixtures import misc_file
+
+
+class TngSdkPackageAccountingTest(unittest.TestCase):
+
+    def test_resource_account(self):
+        tmp = tempfile.mkdtemp()
+        with open(os.path.join(tmp, "f.bin"), "wb") as f:
+            f.write(b"x" * 1000)
+        was_tracing = tracemalloc.is_tracing()
+        with patch.dict(os.environ, {"TRACEMALLOC": "true"}):
+            a = ResourceAccount().start()
+        try:
+            a.add_scratch_path(tmp)
+            a.add_scratch_path(tmp)  # counted once
+            data = [bytearray(1024 * 1024) for _ in range(4)]
+            a.end_stage("allocate")
+            del data
+            sum([i * i for i in range(100000)])
+            a.end_stage("compute")
+            r = a.finish()
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+        self.assertEqual([s["stage"] for s in r["stages"]],
+                         ["allocate", "compute"])
+        self.assertGreaterEqual(r["cpu_time"], 0)
+        self.assertGreaterEqual(r["traced_memory_peak"], 4 * 1024 * 1024)
+        self.assertEqual(r["scratch_bytes"], 1000)
+        self.assertEqual(disk_usage(None), 0)
+
+    def test_unpackage_resources(self):
+        args = parse_args(["-u", misc_file("5gtango-ns-package-example.tgo"),
+                           "--offline", "--skip-validation", "--store-skip"])
+        p = PM.new_packager(args)
+        p.unpackage()
+        r = p.result.metadata.get("_resources")
+        self.assertIs(r, p.resources)
+        self.assertGreater(r["wall_time"], 0)
+        self.assertGreater(r["scratch_bytes"], 0)
+        self.assertIn("extract", [s["stage"] for s in r["stages"]])
+        if r["bytes_read"] is not None:  # Linux only
+            self.assertGreater(r["bytes_read"], 0)
+
+    def test_helper_thread_io(self):
+        a = ResourceAccount().start()
+        self.assertIs(current_account(), a)
+        # process thread: already in the thread's I/O counters
+        a.add_io(read=10, written=10, uploaded=10)
+
+        def helper():
+            set_current_account(a)
+            current_account().add_io(read=100, written=100, uploaded=100)
+
+        t = threading.Thread(target=helper)
+        t.start()
+        t.join()
+        r = a.finish()
+        self.assertIsNone(current_account())
+        self.assertEqual(r["bytes_uploaded"], 110)
+        self.assertGreaterEqual(r["bytes_read"], 100)
+        self.assertGreaterEqual(r["bytes_written"], 100)
+
+    def test_unpackage_upload_resources(self):
+        cat = FakeCatalogue()
+        with BackgroundServer(cat.app) as s:
+            args = parse_args(
+                ["-u", misc_file("5gtango-ns-package-example.tgo"),
+                 "--offline", "--skip-validation"])
+            args.cat_url = s.url + cat.prefix
+            with patch.dict(os.environ, {"CATALOGUE_JOURNAL": "false"}):
+                sb = TangoCatalogBackend(args)
+            p = PM.new_packager(args, storage_backend=sb)
+            p.unpackage()
+        self.assertIsNone(p.result.error)
+        r = p.resources
+        # uploads run in worker threads, but are counted
+        self.assertGreater(r["bytes_uploaded"],
+                           os.path.getsize(args.unpackage))
+        self.assertGreaterEqual(r["bytes_written"], r["bytes_uploaded"])
+
+    def test_package_resources(self):
+        args = parse_args(["-p", misc_file("5gtango_ns_project_example1"),
+                           "-o", tempfile.mkdtemp(),
+                           "--offline", "--skip-validation"])
+        p = PM.new_packager(args)
+        p.package()
+        r = p.result.metadata.get("_resources")
+        self.assertIn("zip", [s["stage"] for s in r["stages"]])
+        self.assertGreater(r["scratch_bytes"], 0)
@@ -0,0 +1,142 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import unittest
+import os
+import shutil
+import tempfile
+import yaml
+from tngsdk.package.benchmark.generator import generate_project, file_sizes
+from tngsdk.package.benchmark.suite import run_suite, BENCHMARKS
+from tngsdk.package.benchmark.scenarios import compare, load_results, \
+    write_results
+from tngsdk.package.cli import parse_args, bench
+
+
+class TngSdkPackageBenchmarkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_generate_project(self):
+        p = generate_project(os.path.join(self.tmp, "p"), num_files=5,
+                             size_distribution="small", num_vnfds=2,
+                             subfolders=3, seed=1)
+        with open(os.path.join(p, "project.yml")) as f:
+            pd = yaml.safe_load(f)
+        types = [e["type"] for e in pd["files"]]
+        self.assertEqual(types.count("application/octet-stream"), 5)
+        self.assertEqual(types.count("application/vnd.5gtango.vnfd"), 2)
+        self.assertEqual(types.count("application/vnd.osm.nsd"), 1)
+        self.assertEqual(types.count("application/vnd.onap.vnfd"), 2)
+        for e in pd["files"]:
+            self.assertTrue(os.path.isfile(os.path.join(p, e["path"])))
+        self.assertEqual(len(os.listdir(os.path.join(p, "Files2"))), 1)
+        # contents are reproducible
+        self.assertEqual(file_sizes(5, "small", seed=1),
+                         [os.path.getsize(os.path.join(p, e["path"]))
+                          for e in pd["files"]
+                          if e["type"] == "application/octet-stream"])
+
+    def test_run_suite(self):
+        r = run_suite(repeat=1, workdir=self.tmp, num_files=3,
+                      size_distribution="small", meta_blocks=10)
+        self.assertEqual(r["format_version"], 1)
+        self.assertEqual(set(r["results"].keys()), set(BENCHMARKS.keys()))
+        for name, res in r["results"].items():
+            self.assertEqual(res["repeat"], 1)
+            self.assertGreater(res["wall_time"]["avg"], 0)
+        self.assertGreater(r["results"]["file_hash"]["mb_per_s"], 0)
+        self.assertGreater(r["inputs"]["package_bytes"], 0)
+        # generated files are removed
+        self.assertEqual(os.listdir(self.tmp), [])
+
+
+def _result(p50, rss):
+    return {"scenarios": {"small": {
+        "peak_rss": rss,
+        "results": {"tango_pack": {"wall_time": {"p50": p50}}}}}}
+
+
+class TngSdkPackageBenchmarkCliTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_compare(self):
+        base = _result(1.0, 100)
+        checks = compare(_result(1.05, 110), base)
+        self.assertEqual(len(checks), 2)
+        self.assertFalse(any([c["regression"] for c in checks]))
+        checks = compare(_result(1.2, 130), base)
+        self.assertTrue(all([c["regression"] for c in checks]))
+        # configurable thresholds
+        checks = compare(_result(1.2, 130), base,
+                         latency_threshold=0.5, rss_threshold=0.5)
+        self.assertFalse(any([c["regression"] for c in checks]))
+        # tiny absolute changes are noise
+        checks = compare(_result(0.0002, 100), _result(0.0001, 100))
+        self.assertFalse(any([c["regression"] for c in checks]))
+        # unknown scenarios are skipped
+        self.assertEqual(compare(_result(1.0, 100), {"scenarios": {}}), [])
+
+    def test_cli_bench(self):
+        out = os.path.join(self.tmp, "results.json")
+        args = parse_args(["--bench", "--bench-scenarios", "small",
+                           "--bench-repeat", "1", "--bench-output", out,
+                           "-q"])
+        self.assertEqual(bench(args), 0)
+        r = load_results(out)
+        s = r["scenarios"]["small"]
+        self.assertIn("tango_unpack", s["results"])
+        self.assertGreater(s["peak_rss"], 0)
+        self.assertIn("bytes_written", s)
+        # compare against a much faster (fake) baseline
+        s["results"]["tango_pack"]["wall_time"]["p50"] /= 100.0
+        base = os.path.join(self.tmp, "baseline.json")
+        write_results(r, base)
+        args = parse_args(["--bench", "--bench-scenarios", "small",
+                           "--bench-repeat", "1", "--bench-output", out,
+                           "--bench-baseline", base, "-q"])
+        self.assertEqual(bench(args), 1)
+        # incompatible baselines are rejected
+        r["format_version"] = 0
+        write_results(r, base)
+        with self.assertRaises(ValueError):
+            bench(args)
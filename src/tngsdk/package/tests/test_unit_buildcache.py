@@ -0,0 +1,97 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import unittest
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+from tngsdk.package.buildcache import BuildCache
+
+
+class TngSdkPackageBuildCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.bc = BuildCache(root=os.path.join(self.tmp, "cache"),
+                             max_bytes=0, disabled=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _file(self, name, size):
+        path = os.path.join(self.tmp, name)
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        return path
+
+    def test_key(self):
+        k = self.bc.key({"a": 1, "b": [1, 2]})
+        self.assertEqual(len(k), 64)
+        self.assertEqual(k, self.bc.key({"b": [1, 2], "a": 1}))
+        self.assertNotEqual(k, self.bc.key({"a": 1, "b": [2, 1]}))
+
+    def test_get_put(self):
+        dest = os.path.join(self.tmp, "out.tgo")
+        self.assertFalse(self.bc.get("k1", dest))
+        self.assertFalse(os.path.exists(dest))
+        src = self._file("pkg.tgo", 100)
+        self.bc.put("k1", src)
+        self.assertTrue(self.bc.get("k1", dest))
+        with open(src, "rb") as f1, open(dest, "rb") as f2:
+            self.assertEqual(f1.read(), f2.read())
+        # disabled cache
+        self.bc.disabled = True
+        self.assertFalse(self.bc.get("k1", dest))
+
+    def test_evict_least_recently_used(self):
+        self.bc.max_bytes = 250
+        for i, k in enumerate(["k1", "k2"]):
+            self.bc.put(k, self._file(k, 100))
+            p = self.bc._path(k)
+            os.utime(p, (1000 + i, 1000 + i))
+        # use k1: k2 is the least recently used one
+        self.assertTrue(self.bc.get("k1", os.path.join(self.tmp, "o")))
+        self.bc.put("k3", self._file("k3", 100))
+        self.assertEqual(self.bc.size(), 200)
+        self.assertFalse(os.path.exists(self.bc._path("k2")))
+        self.assertTrue(os.path.exists(self.bc._path("k1")))
+        self.assertTrue(os.path.exists(self.bc._path("k3")))
+
+    def test_put_failure_removes_temp_file(self):
+        src = self._file("pkg.tgo", 100)
+        with patch("os.replace", side_effect=OSError("disk full")):
+            self.bc.put("k1", src)
+        # missing source: copy fails
+        self.bc.put("k2", os.path.join(self.tmp, "does-not-exist.tgo"))
+        left = [n for _, _, names in os.walk(self.bc.root) for n in names]
+        self.assertEqual(left, [])
+        self.assertFalse(self.bc.get("k1", os.path.join(self.tmp, "o")))
@@ -0,0 +1,157 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import unittest
+import os
+import json
+import queue
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+from requests.exceptions import RequestException
+from tngsdk.package.callback import CallbackDispatcher
+
+
+class MockResponse(object):
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class TngSdkPackageCallbackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = list()
+        self.responses = list()
+
+        def mock_post(session, url, json=None, timeout=None, **kwargs):
+            return self._mock_post(session, url, json, timeout)
+
+        self.patcher = patch("requests.Session.post", mock_post)
+        self.patcher.start()
+        self.cd = CallbackDispatcher()
+        self.cd.backoff = 0.01
+        self.cd.max_retries = 2
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def _mock_post(self, session, url, json, timeout):
+        self.calls.append((session, url, json, timeout))
+        r = self.responses.pop(0) if len(self.responses) > 0 else 200
+        if isinstance(r, BaseException):
+            raise r
+        return MockResponse(r)
+
+    def test_deliver(self):
+        cb = self.cd.submit("http://test.local:8000/cb", {"a": 1})
+        self.assertEqual(cb.wait(timeout=5.0), 200)
+        self.assertEqual(cb.attempts, 1)
+        self.assertEqual(self.calls[0][2], {"a": 1})
+        # timeouts are always set
+        self.assertIsNotNone(self.calls[0][3])
+        m = self.cd.get_metrics()
+        self.assertEqual(m.get("submitted"), 1)
+        self.assertEqual(m.get("delivered"), 1)
+        self.assertEqual(m.get("pending"), 0)
+
+    def test_session_per_host(self):
+        cb1 = self.cd.submit("http://host1.local/cb1", {})
+        cb2 = self.cd.submit("http://host1.local/cb2", {})
+        cb3 = self.cd.submit("http://host2.local/cb", {})
+        self.assertTrue(self.cd.wait_idle(timeout=5.0))
+        self.assertEqual(cb3.status_code, 200)
+        sessions = {c[1]: c[0] for c in self.calls}
+        self.assertIs(sessions[cb1.url], sessions[cb2.url])
+        self.assertIsNot(sessions[cb1.url], sessions[cb3.url])
+
+    def test_retry(self):
+        self.responses = [503, RequestException("connection refused"), 201]
+        cb = self.cd.submit("http://test.local:8000/cb", {})
+        self.assertEqual(cb.wait(timeout=5.0), 201)
+        self.assertEqual(cb.attempts, 3)
+        m = self.cd.get_metrics()
+        self.assertEqual(m.get("retried"), 2)
+        self.assertEqual(m.get("delivered"), 1)
+
+    def test_dead_letter(self):
+        _, path = tempfile.mkstemp()
+        self.cd.dead_letter_path = path
+        self.responses = [500, 500, 500]
+        cb = self.cd.submit("http://test.local:8000/cb", {"a": 1})
+        self.assertEqual(cb.wait(timeout=5.0), 500)
+        self.assertEqual(cb.attempts, 3)
+        self.assertEqual(len(self.cd.dead_letters), 1)
+        with open(path, "r") as f:
+            entry = json.loads(f.readline())
+        self.assertEqual(entry.get("body"), {"a": 1})
+        self.assertEqual(self.cd.get_metrics().get("dead_lettered"), 1)
+        os.remove(path)
+
+    def test_no_retry_on_client_error(self):
+        self.responses = [404]
+        cb = self.cd.submit("http://test.local:8000/cb", {})
+        self.assertEqual(cb.wait(timeout=5.0), 404)
+        self.assertEqual(cb.attempts, 1)
+        self.assertEqual(self.cd.get_metrics().get("dead_lettered"), 1)
+
+    def test_full_queue_does_not_block(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_post(session, url, json, timeout):
+            started.set()
+            release.wait(5.0)
+            return MockResponse(200)
+
+        self._mock_post = blocking_post
+        self.cd.num_workers = 1
+        self.cd._queue = queue.Queue(maxsize=1)
+        try:
+            cb1 = self.cd.submit("http://test.local:8000/cb1", {})
+            self.assertTrue(started.wait(5.0))  # worker is busy
+            cb2 = self.cd.submit("http://test.local:8000/cb2", {})
+            t_start = time.time()
+            cb3 = self.cd.submit("http://test.local:8000/cb3", {})
+            self.assertLess(time.time() - t_start, 1.0)
+            # queue full: dead-lettered right away
+            self.assertTrue(cb3.done)
+            self.assertEqual(cb3.wait(), -1)
+            self.assertIn("queue full", cb3.error)
+            self.assertEqual(self.cd.get_metrics().get("dropped"), 1)
+        finally:
+            release.set()
+        self.assertEqual(cb1.wait(timeout=5.0), 200)
+        self.assertEqual(cb2.wait(timeout=5.0), 200)
+        self.assertTrue(self.cd.wait_idle(timeout=5.0))
@@ -36,6 +36,7 @@ import tempfile
 import shutil
 import os
 import tngsdk.package.cli as cli
+from unittest.mock import patch
 
 
 class TngSdkPackageCliTest(unittest.TestCase):
@@ -90,3 +91,24 @@ class TngSdkPackageCliTest(unittest.TestCase):
         self.assertTrue(
             os.path.exists(pkg_path))
         shutil.rmtree(pkg_path)
+
+    def test_cli_inspect(self):
+        args = cli.parse_args(
+            ["--inspect", "misc/5gtango-ns-package-example.tgo", "-q"])
+        with patch("tngsdk.package.helper.zipfile.ZipFile.extractall") as m:
+            r = cli.dispatch(args)
+            m.assert_not_called()
+        self.assertIsNone(r.error)
+        self.assertEqual(r.name, "5gtango-project-sample")
+        self.assertEqual(r.package_type,
+                         "application/vnd.5gtango.package.nsp")
+        self.assertEqual(len(r.package_content), 2)
+        for pc in r.package_content:
+            self.assertGreater(pc.get("size"), 0)
+            self.assertGreater(pc.get("compressed_size"), 0)
+            self.assertIsNotNone(pc.get("hash"))
+
+    def test_cli_inspect_invalid(self):
+        args = cli.parse_args(["--inspect", "misc/callback_mock.py", "-q"])
+        r = cli.dispatch(args)
+        self.assertIsNotNone(r.error)
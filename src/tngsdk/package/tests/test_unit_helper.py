@@ -0,0 +1,108 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import unittest
+import io
+import os
+import zipfile
+import tempfile
+from tngsdk.package.helper import ZipMember, ChunkStream, SizedChunkStream
+from tngsdk.package.helper import open_upload_body, file_hash, MemoryFile
+from tngsdk.package.helper import PackageArchive, package_file, \
+    package_file_source
+
+
+class TngSdkPackageHelperUploadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.content = os.urandom(3 * 1024 + 17)
+        self.path = os.path.join(self.tmp, "artifact.bin")
+        with open(self.path, "wb") as f:
+            f.write(self.content)
+        self.zip_path = os.path.join(self.tmp, "pkg.zip")
+        with zipfile.ZipFile(self.zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.write(self.path, "Files/artifact.bin")
+
+    def test_upload_body_from_disk(self):
+        with open_upload_body(self.path) as data:
+            self.assertNotIsInstance(data, bytes)
+            self.assertEqual(data.read(), self.content)
+
+    def test_upload_body_from_zip_member(self):
+        m = ZipMember(self.zip_path, "Files/artifact.bin")
+        self.assertEqual(str(m), "Files/artifact.bin")
+        self.assertEqual(m.size, len(self.content))
+        with open_upload_body(m, chunk_size=1024) as data:
+            self.assertIsInstance(data, SizedChunkStream)
+            self.assertEqual(len(data), len(self.content))
+            chunks = list(data)
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(all([len(c) <= 1024 for c in chunks]))
+        self.assertEqual(b''.join(chunks), self.content)
+        # also works with an already opened archive
+        with zipfile.ZipFile(self.zip_path, "r") as zf:
+            m = ZipMember(zf, "Files/artifact.bin")
+            with open_upload_body(m) as data:
+                self.assertEqual(b''.join(data), self.content)
+
+    def test_chunk_stream_unknown_size(self):
+        with open(self.path, "rb") as f:
+            with open_upload_body(f, chunk_size=1000) as data:
+                self.assertIsInstance(data, ChunkStream)
+                self.assertFalse(hasattr(data, "__len__"))
+                self.assertEqual(b''.join(data), self.content)
+
+    def test_memory_file(self):
+        m = MemoryFile("pkg.tgo", self.content)
+        self.assertEqual(str(m), "pkg.tgo")
+        self.assertEqual(m.size, len(self.content))
+        self.assertEqual(file_hash(m), file_hash(self.path))
+        with open_upload_body(m, chunk_size=1024) as data:
+            self.assertIsInstance(data, SizedChunkStream)
+            self.assertEqual(b''.join(data), self.content)
+
+    def test_package_file(self):
+        self.assertEqual(package_file("/tmp/wd/", "Files/a.bin"),
+                         "/tmp/wd/Files/a.bin")
+        self.assertEqual(
+            package_file_source("/tmp/wd/", "/tmp/wd/Files/a.bin"),
+            "Files/a.bin")
+        with open(self.zip_path, "rb") as f:
+            with PackageArchive(io.BytesIO(f.read())) as archive:
+                self.assertEqual(archive.path, "<memory>")
+                m = package_file(archive, "Files/artifact.bin")
+                self.assertIsInstance(m, ZipMember)
+                self.assertEqual(file_hash(m), file_hash(self.path))
+                self.assertEqual(package_file_source(archive, m),
+                                 "Files/artifact.bin")
@@ -0,0 +1,174 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import unittest
+import threading
+import time
+import zlib
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from requests.exceptions import Timeout
+from tngsdk.package.httpclient import HttpSessionPool, endpoint_key, \
+    CircuitOpenError, CircuitBreaker
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # number of 503 responses before /flaky succeeds
+    flaky_failures = 0
+
+    def _status(self):
+        if self.path.startswith("/fail"):
+            return 503
+        if self.path.startswith("/flaky"):
+            if KeepAliveHandler.flaky_failures > 0:
+                KeepAliveHandler.flaky_failures -= 1
+                return 503
+        return 200
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.do_GET()
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(self._status())
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # keep test output clean
+
+
+class TngSdkPackageHttpClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        self.url = "http://127.0.0.1:{}".format(self.server.server_port)
+        self.t = threading.Thread(target=self.server.serve_forever)
+        self.t.daemon = True
+        self.t.start()
+        self.pool = HttpSessionPool()
+        self.pool.backoff = 0.001
+
+    def tearDown(self):
+        self.pool.close_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_endpoint_key(self):
+        self.assertEqual(
+            endpoint_key("http://tng-cat:4011/catalogues/api/v2/vnfs"),
+            "http://tng-cat:4011")
+
+    def test_shared_session(self):
+        s1 = self.pool.get_session(self.url + "/a")
+        s2 = self.pool.get_session(self.url + "/b")
+        s3 = self.pool.get_session("http://other.local:4011/a")
+        self.assertIs(s1, s2)
+        self.assertIsNot(s1, s3)
+
+    def test_default_timeout(self):
+        s = self.pool.get_session(self.url, timeout=(1, 2))
+        self.assertEqual(s.timeout, (1, 2))
+
+    def test_connection_reuse(self):
+        s = self.pool.get_session(self.url)
+        for _ in range(5):
+            r = s.get(self.url + "/test")
+            self.assertEqual(r.status_code, 200)
+        m = self.pool.get_metrics().get(self.url)
+        self.assertEqual(m.get("requests"), 5)
+        self.assertEqual(m.get("connections"), 1)
+        self.assertEqual(m.get("reused"), 4)
+
+    def test_retry_idempotent(self):
+        KeepAliveHandler.flaky_failures = 2
+        s = self.pool.get_session(self.url)
+        r = s.get(self.url + "/flaky")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(s.num_retries, 2)
+        # POST requests are not retried
+        r = s.post(self.url + "/fail", data=b"x")
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(s.num_retries, 2)
+
+    def test_circuit_breaker(self):
+        self.pool.max_retries = 0
+        self.pool.breaker_failures = 2
+        self.pool.breaker_reset = 0.1
+        s = self.pool.get_session(self.url)
+        for _ in range(2):
+            self.assertEqual(s.get(self.url + "/fail").status_code, 503)
+        # open: fail fast, no request is done
+        with self.assertRaises(CircuitOpenError):
+            s.get(self.url + "/test")
+        m = self.pool.get_metrics().get(self.url)
+        self.assertEqual(m.get("requests"), 2)
+        self.assertEqual(m["breaker"]["state"], CircuitBreaker.OPEN)
+        self.assertEqual(m["breaker"]["rejected"], 1)
+        self.assertEqual(m["latency"]["count"], 2)
+        # half-open after reset timeout: successful trial closes it
+        time.sleep(0.15)
+        self.assertEqual(s.get(self.url + "/test").status_code, 200)
+        self.assertEqual(s.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_circuit_breaker_trial_body_error(self):
+        self.pool.max_retries = 0
+        self.pool.breaker_failures = 1
+        self.pool.breaker_reset = 0.05
+        s = self.pool.get_session(self.url)
+        self.assertEqual(s.get(self.url + "/fail").status_code, 503)
+        time.sleep(0.1)
+
+        def corrupt_body():
+            # e.g. a streamed ZIP member that cannot be decompressed
+            yield b"x"
+            raise zlib.error("invalid stored block lengths")
+
+        # half-open: the trial fails before the endpoint answers
+        with self.assertRaises(zlib.error):
+            s.post(self.url + "/test", data=corrupt_body())
+        self.assertEqual(s.breaker.state, CircuitBreaker.HALF_OPEN)
+        # ... but does not block all later requests
+        self.assertEqual(s.get(self.url + "/test").status_code, 200)
+        self.assertEqual(s.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_call_with_timeout(self):
+        self.pool.breaker_failures = 1
+        self.assertEqual(
+            self.pool.call(self.url, lambda x: x * 2, 21, timeout=1), 42)
+        with self.assertRaises(Timeout):
+            self.pool.call(self.url, time.sleep, 1, timeout=0.05)
+        with self.assertRaises(CircuitOpenError):
+            self.pool.call(self.url, lambda: None)
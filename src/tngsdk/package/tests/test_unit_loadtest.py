@@ -0,0 +1,142 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import unittest
+import os
+import requests
+from unittest.mock import patch
+from tngsdk.package.cli import parse_args
+from tngsdk.package.packager import PM
+from tngsdk.package.storage.tngcat import TangoCatalogBackend
+from tngsdk.package.loadtest.server import BackgroundServer
+from tngsdk.package.loadtest.fakecat import FakeCatalogue
+from tngsdk.package.loadtest.receiver import CallbackReceiver
+from tngsdk.package.loadtest.driver import percentile, summarize
+from tngsdk.package.loadtest import parse_args as parse_loadtest_args, \
+    run as run_loadtest, SERVICE_ENV
+from tngsdk.package.storage.tngcat import EXISTS_CACHE
+from tngsdk.package.unpackcache import UNPACK_CACHE
+from tngsdk.package import rest
+from tngsdk.package.tests.fixtures import misc_file
+
+
+class MockArgs(object):
+
+    def __init__(self, cat_url):
+        self.cat_url = cat_url
+
+    def __contains__(self, key):
+        return key in self.__dict__
+
+
+class TngSdkPackageLoadTestTest(unittest.TestCase):
+
+    def _unpackage(self):
+        args = parse_args([])
+        args.unpackage = misc_file(
+            "eu.5gtango.mixed-ns-package-example.0.1.tgo")
+        p = PM.new_packager(args, pkg_format="eu.5gtango")
+        napdr = p._do_unpackage()
+        wd = napdr.metadata.get("_napd_path").replace(
+            "TOSCA-Metadata/NAPD.yaml", "")
+        return napdr, wd, args.unpackage
+
+    def test_store_to_fake_catalogue(self):
+        cat = FakeCatalogue(allow_duplicates=False)
+        with BackgroundServer(cat.app) as s:
+            tcb = TangoCatalogBackend(MockArgs(s.url + cat.prefix))
+            napdr, wd, pkg_file = self._unpackage()
+            napdr = tcb.store(napdr, wd, pkg_file)
+            self.assertIn(napdr.metadata.get("_storage_uuid"), cat.packages)
+            stats = cat.get_stats()
+            self.assertEqual(stats["packages"], 1)
+            self.assertGreater(stats["files"], 0)
+            self.assertGreater(stats["bytes_received"], 0)
+            # stored packages are found
+            self.assertTrue(tcb._artifact_exists(
+                napdr.vendor, napdr.name, napdr.version))
+
+    def test_error_injection(self):
+        cat = FakeCatalogue(error_rate=1.0, error_status=500)
+        with BackgroundServer(cat.app) as s:
+            r = requests.post(s.url + cat.prefix + "/vnfs", data="a: 1")
+            self.assertEqual(r.status_code, 500)
+            self.assertEqual(
+                cat.get_stats()["injected_errors"].get("POST /vnfs"), 1)
+
+    def test_callback_receiver(self):
+        rcv = CallbackReceiver()
+        with BackgroundServer(rcv.app) as s:
+            r = requests.post(s.url + rcv.path,
+                              json={"package_process_uuid": "1234"})
+            self.assertEqual(r.status_code, 200)
+            self.assertTrue(rcv.wait_for(1, timeout=1))
+            self.assertIsNotNone(rcv.get("1234").get("t_received"))
+            self.assertIsNone(rcv.get("5678"))
+
+    def test_percentiles(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 50))
+        s = summarize([0.1, 0.2, 0.3])
+        self.assertEqual(s["count"], 3)
+        self.assertEqual(s["p50"], 0.2)
+        self.assertEqual(summarize([]), {"count": 0})
+
+    def test_run(self):
+        args = parse_loadtest_args(
+            ["--packages", misc_file("5gtango-ns-package-example.tgo"),
+             "-n", "3", "-c", "2", "--timeout", "60"])
+        cwd = os.getcwd()
+        ttl = EXISTS_CACHE.ttl
+        cliargs = getattr(rest.app, "cliargs", None)
+        # keep the results of the service out of other tests
+        with patch.dict(os.environ, {"CATALOGUE_URL": "http://cat.local"}), \
+                patch.object(UNPACK_CACHE, "max_entries", 0):
+            os.environ.pop("CATALOGUE_JOURNAL", None)
+            env = {k: os.environ.get(k) for k in SERVICE_ENV}
+            report = run_loadtest(args)
+            # process globals are restored
+            self.assertEqual({k: os.environ.get(k) for k in SERVICE_ENV},
+                             env)
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(EXISTS_CACHE.ttl, ttl)
+        self.assertIs(getattr(rest.app, "cliargs", None), cliargs)
+        self.assertIsNone(args.catalogue_url)
+        # all requests were processed and stored
+        self.assertEqual(report["requests"], 3)
+        self.assertEqual(report["errors"], 0, report["error_samples"])
+        self.assertEqual(report["by_kind"]["package"]["requests"], 3)
+        self.assertEqual(report["catalogue"]["packages"], 3)
+        self.assertEqual(report["callbacks"]["received"], 3)
@@ -0,0 +1,266 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import unittest
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import tngsdk.package
+from tngsdk.package.logger import TangoLogger, TangoJsonLogHandler, \
+    TangoColoredLogHandler, JsonLogWriter, LOG_RECORDS_DROPPED, lazy, \
+    JSON_LOG_WRITER
+from tngsdk.package.tracing import TRACER, Trace
+
+
+class CountingStream(io.StringIO):
+
+    def __init__(self, block=None):
+        super().__init__()
+        self.writes = 0
+        self.block = block
+
+    def write(self, s):
+        if self.block is not None:
+            self.block.wait()
+        self.writes += 1
+        return super().write(s)
+
+    def lines(self):
+        return [json.loads(l) for l in self.getvalue().splitlines()]
+
+
+class TngSdkPackageJsonLoggingTest(unittest.TestCase):
+
+    def _logger(self, writer):
+        logger = logging.getLogger("test.json.{}".format(id(writer)))
+        logger.propagate = False
+        logger.handlers = [TangoJsonLogHandler(writer)]
+        logger.setLevel(logging.INFO)
+        return logger
+
+    def test_batched_writes(self):
+        stream = CountingStream()
+        w = JsonLogWriter(stream=stream, queue_size=1000, batch_size=100)
+        logger = self._logger(w)
+        for i in range(200):
+            logger.info("record {}".format(i), extra={"status": "200"})
+        w.flush()
+        lines = stream.lines()
+        self.assertEqual([l["message"] for l in lines],
+                         ["record {}".format(i) for i in range(200)])
+        self.assertEqual(lines[0]["status"], "200")
+        self.assertEqual(lines[0]["type"], "I")
+        # at least two records per write
+        self.assertLessEqual(stream.writes, 100)
+        self.assertEqual(w.queue_depth(), 0)
+
+    def test_synchronous(self):
+        stream = CountingStream()
+        w = JsonLogWriter(stream=stream, queue_size=0)
+        self._logger(w).warning("now")
+        self.assertEqual(stream.lines()[0]["message"], "now")
+        self.assertEqual(stream.lines()[0]["type"], "W")
+
+    def test_drop_when_full(self):
+        block = threading.Event()
+        stream = CountingStream(block=block)
+        w = JsonLogWriter(stream=stream, queue_size=5, batch_size=1)
+        logger = self._logger(w)
+        dropped_before = LOG_RECORDS_DROPPED.get()
+        for i in range(50):
+            logger.info("record {}".format(i))  # never blocks
+        self.assertGreater(w.dropped, 0)
+        self.assertEqual(LOG_RECORDS_DROPPED.get() - dropped_before,
+                         w.dropped)
+        block.set()
+        w.flush()
+        lines = stream.lines()
+        self.assertEqual(len(lines), 50 - w.dropped + 1)
+        # reported with the next batch that is written
+        self.assertEqual(
+            len([l for l in lines if l["message"].startswith(
+                "Dropped {} log records".format(w.dropped))]), 1)
+
+    @unittest.skipUnless(hasattr(os, "register_at_fork"),
+                         "os.register_at_fork needs Python >= 3.7")
+    def test_fork_after_logging(self):
+        stream = CountingStream()
+        logger = self._logger(JSON_LOG_WRITER)
+        old_stream = JSON_LOG_WRITER.stream
+        JSON_LOG_WRITER.stream = stream
+        try:
+            # writer thread of the parent is running
+            logger.info("from parent")
+            JSON_LOG_WRITER.flush()
+            self.assertTrue(JSON_LOG_WRITER._thread.is_alive())
+            path = os.path.join(tempfile.mkdtemp(), "child.log")
+            pid = os.fork()
+            if pid == 0:  # child: inherits the queue, not the thread
+                code = 1
+                try:
+                    with open(path, "w") as f:
+                        JSON_LOG_WRITER.stream = f
+                        logger.info("from child")
+                        JSON_LOG_WRITER.flush()
+                    code = 0
+                finally:
+                    os._exit(code)
+            _, status = os.waitpid(pid, 0)
+            self.assertEqual(status, 0)
+            with open(path) as f:
+                lines = [json.loads(l) for l in f]
+            self.assertEqual([l["message"] for l in lines], ["from child"])
+            # parent keeps on writing
+            logger.info("from parent again")
+            JSON_LOG_WRITER.flush()
+            self.assertEqual([l["message"] for l in stream.lines()],
+                             ["from parent", "from parent again"])
+        finally:
+            JSON_LOG_WRITER.stream = old_stream
+
+    def test_flush_without_writer_thread(self):
+        w = JsonLogWriter(stream=CountingStream())
+        logger = self._logger(w)
+        logger.info("a")
+        w.flush()
+        # e.g. forked without resetting the writer: never blocks
+        w._thread = threading.Thread(target=lambda: None)
+        w._thread.start()
+        w._thread.join()
+        w._records.append((lambda r: {}, None))
+        w.flush()
+
+    def test_trace_and_exception_captured_by_caller(self):
+        stream = CountingStream()
+        w = JsonLogWriter(stream=stream, queue_size=10)
+        logger = self._logger(w)
+        with TRACER.span("packager", trace=Trace("t-log")) as s:
+            try:
+                raise ValueError("broken")
+            except ValueError:
+                logger.exception("failed")
+        logger.info("outside")
+        w.flush()
+        lines = stream.lines()
+        self.assertEqual(lines[0]["trace_id"], "t-log")
+        self.assertEqual(lines[0]["span_id"], s.span_id)
+        self.assertIn("broken", lines[0]["exc_info"])
+        self.assertNotIn("trace_id", lines[1])
+        self.assertIsNone(lines[1]["exc_info"])
+
+    def test_message_arguments(self):
+        stream = CountingStream()
+        w = JsonLogWriter(stream=stream, queue_size=10)
+        logger = self._logger(w)
+        data = ["a"]
+        logger.info("Found %s (%d files)", data, len(data))
+        data.append("b")  # formatted by the caller
+        w.flush()
+        self.assertEqual(stream.lines()[0]["message"],
+                         "Found ['a'] (1 files)")
+
+
+class TngSdkPackageLazyLogTest(unittest.TestCase):
+
+    def test_lazy_only_evaluated_if_enabled(self):
+        calls = list()
+
+        def payload(x):
+            calls.append(x)
+            return "payload {}".format(x)
+
+        stream = CountingStream()
+        w = JsonLogWriter(stream=stream, queue_size=0)
+        logger = logging.getLogger("test.lazy")
+        logger.propagate = False
+        logger.handlers = [TangoJsonLogHandler(w)]
+        logger.setLevel(logging.INFO)
+        logger.debug("Expensive: %s", lazy(payload, 1))
+        self.assertEqual(calls, [])
+        logger.info("Expensive: %s", lazy(payload, 2))
+        self.assertEqual(calls, [2])
+        self.assertEqual(stream.lines()[0]["message"], "Expensive: payload 2")
+
+
+class TngSdkPackageLoggerConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        self._config = TangoLogger._global_config
+
+    def tearDown(self):
+        TangoLogger._global_config = self._config
+
+    def _levels(self, logger):
+        return {type(h): h.level for h in logger.handlers}
+
+    def test_logger_created_after_reconfigure(self):
+        TangoLogger.reconfigure_all_tango_loggers(
+            log_level=logging.WARNING, log_json=True)
+        logger = TangoLogger.getLogger("test_unit_logger.late")
+        self.assertEqual(logger.level, logging.WARNING)
+        self.assertEqual(self._levels(logger),
+                         {TangoColoredLogHandler: 999,
+                          TangoJsonLogHandler: logging.WARNING})
+        # explicit arguments still win
+        logger = TangoLogger.getLogger(
+            "test_unit_logger.explicit", log_level=logging.DEBUG,
+            log_json=False)
+        self.assertEqual(self._levels(logger),
+                         {TangoColoredLogHandler: logging.DEBUG,
+                          TangoJsonLogHandler: 999})
+
+    def test_module_imported_after_setup_logging(self):
+        # fresh interpreter: the REST module is not imported yet
+        code = "\n".join([
+            "import sys",
+            "from tngsdk.package import setup_logging",
+            "from tngsdk.package.cli import parse_args",
+            "assert 'tngsdk.package.rest' not in sys.modules",
+            "setup_logging(parse_args(['--logjson', '--loglevel', 'debug']))",
+            "from tngsdk.package import rest",
+            "print(sorted([(type(h).__name__, h.level)",
+            "              for h in rest.LOG.handlers]))"])
+        # make sure the subprocess imports this tngsdk.package
+        src = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(tngsdk.package.__file__))))
+        env = dict(os.environ, PYTHONPATH=src)
+        out = subprocess.check_output(
+            [sys.executable, "-c", code], env=env, stderr=subprocess.DEVNULL)
+        self.assertEqual(
+            out.decode().strip().splitlines()[-1],
+            "[('TangoColoredLogHandler', 999), ('TangoJsonLogHandler', 10)]")
@@ -0,0 +1,89 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import unittest
+import math
+from tngsdk.package.metrics import MetricsRegistry, Counter, Gauge, \
+    Histogram
+
+
+class TngSdkPackageMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.reg = MetricsRegistry()
+
+    def test_counter_gauge(self):
+        c = self.reg.counter("test_bytes_total", "Bytes.", ["backend"])
+        c.inc(10, backend="a")
+        c.inc(5, backend="a")
+        c.inc(1, backend='b"x')
+        self.assertEqual(c.get(backend="a"), 15)
+        with self.assertRaises(ValueError):
+            c.inc(-1, backend="a")
+        with self.assertRaises(ValueError):
+            c.inc(1)  # missing label
+        g = self.reg.gauge("test_jobs", "Jobs.")
+        with g.track():
+            self.assertEqual(g.get(), 1)
+        self.assertEqual(g.get(), 0)
+        self.reg.gauge("test_queue", "Queue.", func=lambda: 7)
+        out = self.reg.render()
+        self.assertIn("# TYPE test_bytes_total counter", out)
+        self.assertIn('test_bytes_total{backend="a"} 15.0', out)
+        self.assertIn('test_bytes_total{backend="b\\"x"} 1.0', out)
+        self.assertIn("test_jobs 0.0", out)
+        self.assertIn("test_queue 7.0", out)
+        # names are unique
+        with self.assertRaises(ValueError):
+            self.reg.register(Counter("test_jobs", "Dupl."))
+
+    def test_histogram(self):
+        h = self.reg.histogram("test_seconds", "Durations.", ["stage"],
+                               buckets=[0.1, 1])
+        self.assertEqual(h.buckets, (0.1, 1, math.inf))
+        for v in [0.05, 0.5, 0.7, 5]:
+            h.observe(v, stage="zip")
+        with h.time(stage="copy"):
+            pass
+        self.assertEqual(h.get(stage="zip")[0], 4)
+        self.assertAlmostEqual(h.get(stage="zip")[1], 6.25)
+        out = self.reg.render()
+        self.assertIn('test_seconds_bucket{stage="zip",le="0.1"} 1', out)
+        self.assertIn('test_seconds_bucket{stage="zip",le="1.0"} 3', out)
+        self.assertIn('test_seconds_bucket{stage="zip",le="+Inf"} 4', out)
+        self.assertIn('test_seconds_count{stage="zip"} 4', out)
+        self.assertIn('test_seconds_count{stage="copy"} 1', out)
+        self.reg.clear()
+        self.assertEqual(h.get(stage="zip"), (0, 0.0))
+        self.assertIsInstance(Gauge("x", "y"), Gauge)
+        self.assertIsInstance(Histogram("x", "y"), Histogram)
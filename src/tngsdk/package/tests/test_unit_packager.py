@@ -39,6 +39,7 @@ import zipfile
 from tngsdk.package.cli import parse_args
 from tngsdk.package.packager import PM
 from tngsdk.package.packager.packager import parse_block_based_meta_file
+from tngsdk.package.packager.packager import PkgStatus, NapdRecord
 from tempfile import NamedTemporaryFile, mkdtemp
 
 
@@ -83,6 +84,16 @@ class TngSdkPackagePackagerHelperTest(unittest.TestCase):
         b = parse_block_based_meta_file(i)
         self.assertEqual(len(b), 4)
 
+    def test_napdr_repr_summary(self):
+        nr = NapdRecord(vendor="eu.5gtango", name="ns", version="0.1")
+        nr.package_content = [{"source": "Files/f{}.bin".format(i),
+                               "hash": "0" * 64} for i in range(5000)]
+        r = repr(nr)
+        self.assertEqual(
+            r, "NapdRecord(eu.5gtango.ns.0.1, 5000 content entries,"
+            + " error=None)")
+        self.assertIn("Files/f4999.bin", nr.pformat())
+
 
 class TngSdkPackagePackagerTest(unittest.TestCase):
 
@@ -140,6 +151,56 @@ class TngSdkPackagePackagerTest(unittest.TestCase):
         self.assertTrue(lock.acquire(timeout=3.0),
                         msg="callback was not called before timeout")
 
+    def test_get_packager(self):
+        p = PM.new_packager(self.default_args, pkg_format="test")
+        self.assertEqual(PM.get_packager(str(p.uuid)), p)
+        self.assertIsNone(PM.get_packager("foo-bar"))
+
+    def test_wait_for_status_change(self):
+        p = PM.new_packager(self.default_args, pkg_format="test")
+        # nothing happens: timeout
+        self.assertEqual(
+            p.wait_for_status_change(PkgStatus.WAITING, timeout=0.01),
+            PkgStatus.WAITING)
+        p.unpackage(callback_func=lambda p: None)
+        self.assertEqual(
+            p.wait_for_status_change(PkgStatus.RUNNING, timeout=3.0),
+            PkgStatus.SUCCESS)
+
+    def test_wait_for_events(self):
+        p = PM.new_packager(self.default_args, pkg_format="test")
+        events = p.wait_for_events(0, timeout=0.01)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].get("status"), PkgStatus.WAITING)
+        # no new events: timeout
+        self.assertEqual(len(p.wait_for_events(1, timeout=0.01)), 0)
+        p.report_progress("stage1")
+        events = p.wait_for_events(1, timeout=0.01)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].get("event"), "progress")
+        self.assertEqual(events[0].get("stage"), "stage1")
+        p.package()
+        events = p.wait_for_events(2, timeout=0.01)
+        self.assertTrue(PkgStatus.is_final(events[-1].get("status")))
+
+    def test_unexpected_error_fails_process(self):
+        for operation in ["package", "unpackage"]:
+            p = PM.new_packager(self.default_args, pkg_format="test")
+
+            def crash(*args, **kwargs):
+                raise KeyError("boom")
+
+            setattr(p, "_do_{}".format(operation), crash)
+            getattr(p, operation)(callback_func=lambda p: None)
+            # waiters wake up with the final status
+            self.assertEqual(
+                p.wait_for_status_change(PkgStatus.RUNNING, timeout=3.0),
+                PkgStatus.FAILED)
+            self.assertIn("boom", p.error_msg)
+            self.assertIn("boom", p.result.error)
+            events = p.wait_for_events(0, timeout=0.01)
+            self.assertEqual(events[-1].get("status"), PkgStatus.FAILED)
+
     def test_autoversion(self):
         p = PM.new_packager(self.default_args, pkg_format="test")
         project_descriptors = [{"package": {"version": "1.0"}},
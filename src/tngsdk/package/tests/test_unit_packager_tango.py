@@ -40,6 +40,11 @@ from tngsdk.package.packager import PM
 from tngsdk.package.packager.packager import LooseVersionExtended
 from tngsdk.package.tests.fixtures import misc_file, get_files
 from tngsdk.package.storage.tngprj import TangoProjectFilesystemBackend
+from tngsdk.package.storage import BaseStorageBackend, \
+    StorageBackendDuplicatedException
+from tngsdk.package.helper import PackageArchive, extract_zip_file_to_temp
+from tngsdk.package.buildcache import BuildCache
+from unittest.mock import patch
 from shutil import copytree
 
 
@@ -441,6 +446,50 @@ class TngSdkPackageTangoPackagerRealTgoTest(unittest.TestCase):
         r = self.p._do_unpackage()
         self.assertIsNone(r.error)
 
+    def test_collect_metadata_from_archive(self):
+        self.default_args = parse_args([])
+        self.default_args.unpackage = misc_file(
+            "5gtango-ns-package-example.tgo")
+        self.p = PM.new_packager(
+            self.default_args, pkg_format="eu.5gtango")
+        with PackageArchive(self.default_args.unpackage) as archive:
+            self.assertIsNotNone(archive.find("**/TOSCA.meta"))
+            self.assertIsNotNone(archive.find("**/NAPD.yaml"))
+            self.assertIsNone(archive.find("*.yaml"))
+            r = self.p.collect_metadata_from_archive(archive)
+        wd = extract_zip_file_to_temp(self.default_args.unpackage)
+        e = self.p.collect_metadata(wd)
+        self.assertEqual(r.vendor, e.vendor)
+        self.assertEqual(r.name, e.name)
+        self.assertEqual(r.version, e.version)
+        self.assertEqual(r.package_content, e.package_content)
+
+    def test_do_unpackage_duplicate_package(self):
+        self.default_args = parse_args([])
+        self.default_args.unpackage = misc_file(
+            "5gtango-ns-package-example.tgo")
+        checked = list()
+
+        class DuplicateStorageBackend(BaseStorageBackend):
+            def check_duplicate(self, vendor, name, version):
+                checked.append((vendor, name, version))
+                raise StorageBackendDuplicatedException("duplicate")
+
+            def store(self, napdr, wd, pkg_file):
+                raise AssertionError("must not be called")
+
+        self.p = PM.new_packager(
+            self.default_args, pkg_format="eu.5gtango",
+            storage_backend=DuplicateStorageBackend(self.default_args))
+        with patch("tngsdk.package.packager.tango_packager"
+                   ".extract_zip_file_to_temp") as m:
+            r = self.p._do_unpackage()
+            # rejected before the package was extracted
+            m.assert_not_called()
+        self.assertEqual(r.error, "duplicate")
+        self.assertEqual(len(checked), 1)
+        self.assertIsNotNone(checked[0][0])
+
     def test_do_unpackage_bad_checksum(self):
         self.default_args = parse_args([])
         self.default_args.unpackage = misc_file(
@@ -639,3 +688,141 @@ class TngSdkPackageTangoPackagerEndToEndTest(unittest.TestCase):
         names = get_files(os.path.join(storage_location, "subfolder"))
         for file in subfolder_files:
             self.assertIn(file, names)
+
+
+class TngSdkPackageTangoPackagerInMemoryTest(unittest.TestCase):
+    """
+    Unpack. tests of packages that are kept in memory (small uploads).
+    """
+
+    def _packager(self, pkg_name, storage_backend=None, args=None):
+        self.default_args = parse_args(["--offline"] + (args or []))
+        self.default_args.unpackage = pkg_name
+        self.default_args.output = tempfile.mkdtemp()
+        if storage_backend == "tngprj":
+            storage_backend = TangoProjectFilesystemBackend(self.default_args)
+        p = PM.new_packager(self.default_args, pkg_format="eu.5gtango",
+                            storage_backend=storage_backend)
+        with open(misc_file(pkg_name), "rb") as f:
+            p.package_data = f.read()
+        return p
+
+    def test_do_unpackage_in_memory(self):
+        p = self._packager("5gtango-ns-package-example.tgo", "tngprj",
+                           args=["--skip-validation"])
+        r = p._do_unpackage()
+        self.assertIsNone(r.error)
+        # nothing was written to the scratch space
+        self.assertIsNone(p.workspace)
+        pd = r.metadata.get("_storage_location")
+        self.assertEqual(os.path.basename(pd), "5gtango-ns-package-example")
+        # same result as unpacking from disk
+        args = parse_args(["--offline"])
+        args.unpackage = misc_file("5gtango-ns-package-example.tgo")
+        args.output = tempfile.mkdtemp()
+        e = PM.new_packager(
+            args, pkg_format="eu.5gtango",
+            storage_backend=TangoProjectFilesystemBackend(args)
+        )._do_unpackage()
+        self.assertEqual(r.vendor, e.vendor)
+        self.assertEqual(r.package_content, e.package_content)
+        self.assertEqual(
+            get_files(pd),
+            get_files(e.metadata.get("_storage_location")))
+
+    def test_do_unpackage_in_memory_bad_checksum(self):
+        p = self._packager("5gtango-ns-package-example-bad-checksum.tgo")
+        r = p._do_unpackage()
+        self.assertIn("Checksum mismatch", r.error)
+        p = self._packager("5gtango-ns-package-example-bad-checksum.tgo",
+                           args=["--ignore-checksums", "--skip-validation"])
+        self.assertIsNone(p._do_unpackage().error)
+
+    def test_do_unpackage_in_memory_extracted_for_backend(self):
+        stored = list()
+
+        class DiskBackend(BaseStorageBackend):
+            def store(self, napdr, wd, pkg_file):
+                stored.append((wd, pkg_file))
+                return napdr
+
+        p = self._packager("5gtango-ns-package-example.tgo",
+                           DiskBackend(None), args=["--skip-validation"])
+        r = p._do_unpackage()
+        self.assertIsNone(r.error)
+        wd, pkg_file = stored[0]
+        # backends that need files on disk get an extracted package
+        self.assertTrue(os.path.isdir(os.path.join(wd, "TOSCA-Metadata")))
+        with open(pkg_file, "rb") as f:
+            self.assertEqual(f.read(), p.package_data)
+        self.assertTrue(wd.startswith(p.workspace.path))
+        p.release_workspace()
+        self.assertFalse(os.path.exists(wd))
+
+
+class TngSdkPackageTangoPackagerReproducibleTest(unittest.TestCase):
+    """
+    Reproducible packages and build cache.
+    """
+
+    def setUp(self):
+        self.cache = BuildCache(root=tempfile.mkdtemp(), max_bytes=0)
+        self.patcher = patch(
+            "tngsdk.package.packager.tango_packager.BUILD_CACHE",
+            self.cache)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.cache.clear()
+
+    def _package(self, args=None, project="mixed-ns-project-subfolder-test"):
+        self.default_args = parse_args(
+            ["--offline", "--skip-validation"] + (args or []))
+        self.default_args.package = misc_file(project)
+        self.default_args.output = os.path.join(tempfile.mkdtemp(),
+                                                "test.tgo")
+        p = PM.new_packager(self.default_args, pkg_format="eu.5gtango")
+        r = p._do_package()
+        self.assertIsNone(r.error)
+        with open(self.default_args.output, "rb") as f:
+            return r, f.read()
+
+    def test_package_reproducible(self):
+        self.cache.disabled = True
+        r1, data1 = self._package(["--reproducible"])
+        r2, data2 = self._package(["--reproducible"])
+        self.assertEqual(data1, data2)
+        self.assertEqual(r1.release_date_time, "1980-01-01T00:00:00Z")
+        self.assertNotIn("_build_cache", r1.metadata)
+        with zipfile.ZipFile(self.default_args.output) as zf:
+            names = zf.namelist()
+            self.assertEqual(
+                set([i.date_time for i in zf.infolist()]),
+                set([(1980, 1, 1, 0, 0, 0)]))
+        self.assertIn("subfolder.zip", names)
+        self.assertEqual(names, sorted(names))
+        # without the flag, packages get the current time
+        r3, _ = self._package()
+        self.assertNotEqual(r3.release_date_time, r1.release_date_time)
+
+    def test_package_reproducible_source_date_epoch(self):
+        self.cache.disabled = True
+        with patch.dict(os.environ, {"SOURCE_DATE_EPOCH": "1546300800"}):
+            r, data1 = self._package()
+            _, data2 = self._package()
+        self.assertEqual(data1, data2)
+        self.assertEqual(r.release_date_time, "2019-01-01T00:00:00Z")
+
+    def test_package_build_cache(self):
+        r1, data1 = self._package(["--reproducible"])
+        self.assertEqual(r1.metadata.get("_build_cache"), "miss")
+        self.assertEqual(len(self.cache.entries()), 1)
+        r2, data2 = self._package(["--reproducible"])
+        self.assertEqual(r2.metadata.get("_build_cache"), "hit")
+        self.assertEqual(data1, data2)
+        # other inputs: other key
+        r3, _ = self._package(["--reproducible",
+                               "--no-subfolder-compression"])
+        self.assertEqual(r3.metadata.get("_build_cache"), "miss")
+        self.assertEqual(len(self.cache.entries()), 2)
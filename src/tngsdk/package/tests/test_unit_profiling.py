@@ -0,0 +1,93 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import unittest
+import os
+import pstats
+import tempfile
+from unittest.mock import patch
+from tngsdk.package.profiling import JobProfiler, StackSampler, sampled
+
+
+def busy_function(duration=0.05):
+    import time
+    t_end = time.time() + duration
+    n = 0
+    while time.time() < t_end:
+        n += 1
+    return n
+
+
+class TngSdkPackageProfilingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def test_sampling_profile(self):
+        with JobProfiler("job-1", mode="sampling", interval=0.001,
+                         directory=self.tmp) as prof:
+            busy_function()
+        self.assertEqual(sorted(prof.paths.keys()), ["collapsed", "pstats"])
+        with open(prof.paths["collapsed"]) as f:
+            lines = f.read().strip().split("\n")
+        self.assertTrue(any(["busy_function" in l for l in lines]))
+        # '<stack> <count>'
+        self.assertGreater(sum([int(l.rsplit(" ", 1)[1]) for l in lines]), 0)
+        s = pstats.Stats(prof.paths["pstats"])
+        self.assertTrue(any([k[2] == "busy_function" for k in s.stats]))
+
+    def test_deterministic_profile(self):
+        with JobProfiler("job-2", mode="deterministic",
+                         directory=self.tmp) as prof:
+            busy_function(0.01)
+        s = pstats.Stats(prof.paths["pstats"])
+        self.assertTrue(any([k[2] == "busy_function" for k in s.stats]))
+        self.assertTrue(os.path.isfile(prof.paths["collapsed"]))
+
+    def test_sampler_pstats(self):
+        s = StackSampler(0, interval=0.01)
+        s.samples[(("a.py", 1, "main"), ("a.py", 5, "work"))] = 3
+        s.samples[(("a.py", 1, "main"),)] = 1
+        st = s.pstats()
+        self.assertEqual(st[("a.py", 1, "main")][:2], (4, 4))
+        self.assertAlmostEqual(st[("a.py", 5, "work")][2], 0.03)
+        self.assertAlmostEqual(st[("a.py", 1, "main")][3], 0.04)
+        self.assertIn(("a.py", 1, "main"), st[("a.py", 5, "work")][4])
+        self.assertEqual(s.collapsed().split("\n")[0],
+                         "main (a.py:1) 1")
+
+    def test_sample_rate(self):
+        with patch.dict(os.environ, {"PROFILE_SAMPLE_RATE": "0"}):
+            self.assertFalse(sampled())
+        with patch.dict(os.environ, {"PROFILE_SAMPLE_RATE": "1"}):
+            self.assertTrue(sampled())
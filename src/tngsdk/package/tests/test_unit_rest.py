@@ -42,6 +42,7 @@ from tngsdk.package.rest import app, on_unpackaging_done, on_packaging_done
 from tngsdk.package.packager import PM
 from tngsdk.package.cli import parse_args
 from tngsdk.package.tests.fixtures import misc_file
+from tngsdk.package.unpackcache import UNPACK_CACHE
 from werkzeug.datastructures import FileStorage
 
 
@@ -62,7 +63,7 @@ class MockResponse(object):
     pass
 
 
-def mock_requests_post(url, json):
+def mock_requests_post(session, url, json, **kwargs):
     if url != "https://test.local:8000/cb":
         raise RequestException("bad url")
     if "event_name" not in json:
@@ -84,15 +85,20 @@ class TngSdkPackageRestTest(unittest.TestCase):
 
     def setUp(self):
         # configure mocks
-        self.patcher = patch("requests.post", mock_requests_post)
+        self.patcher = patch("requests.Session.post", mock_requests_post)
         self.patcher.start()
         # configure flask
         app.config['TESTING'] = True
         app.cliargs = parse_args([])
         self.app = app.test_client()
+        # every test unpacks its packages (processes of earlier
+        # tests might still be running and add their results)
+        self.cache_patcher = patch.object(UNPACK_CACHE, "max_entries", 0)
+        self.cache_patcher.start()
 
     def tearDown(self):
         self.patcher.stop()
+        self.cache_patcher.stop()
 
     def test_project_package_project(self):
         # create package
@@ -248,19 +254,87 @@ class TngSdkPackageRestTest(unittest.TestCase):
             "/api/v1/packages/status/{}".format("foo-bar"))
         self.assertEqual(r2.status_code, 404)
 
+    def test_packager_v1_status_endpoint_long_poll(self):
+        r = self.app.post("/api/v1/packages",
+                          content_type="multipart/form-data",
+                          data={"package": (
+                              open("misc/5gtango-ns-package-example.tgo",
+                                   "rb"), "5gtango-ns-package-example.tgo"),
+                                "skip_store": True})
+        self.assertEqual(r.status_code, 200)
+        rd = json.loads(r.get_data(as_text=True))
+        # block until the process left the running state
+        r2 = self.app.get(
+            "/api/v1/packages/status/{}?wait=60&status=running".format(
+                rd.get("package_process_uuid")))
+        self.assertEqual(r2.status_code, 200)
+        rd2 = json.loads(r2.get_data(as_text=True))
+        self.assertIn(rd2.get("status"), ["success", "failed"])
+        # final status: returns immediately
+        t_start = time.time()
+        r2 = self.app.get(
+            "/api/v1/packages/status/{}?wait=60".format(
+                rd.get("package_process_uuid")))
+        self.assertEqual(r2.status_code, 200)
+        self.assertLess(time.time() - t_start, 5)
+        r2 = self.app.get(
+            "/api/v1/packages/status/{}?wait=1".format("foo-bar"))
+        self.assertEqual(r2.status_code, 404)
+
+    def test_packager_v1_status_events_endpoint(self):
+        r = self.app.post("/api/v1/packages",
+                          content_type="multipart/form-data",
+                          data={"package": (
+                              open("misc/5gtango-ns-package-example.tgo",
+                                   "rb"), "5gtango-ns-package-example.tgo"),
+                                "skip_store": True})
+        self.assertEqual(r.status_code, 200)
+        rd = json.loads(r.get_data(as_text=True))
+        # stream is closed once the process is done
+        r2 = self.app.get(
+            "/api/v1/packages/status/{}/events".format(
+                rd.get("package_process_uuid")))
+        self.assertEqual(r2.status_code, 200)
+        self.assertIn("text/event-stream", r2.content_type)
+        data = r2.get_data(as_text=True)
+        self.assertIn("event: status", data)
+        self.assertIn("event: progress", data)
+        last = json.loads(
+            [l for l in data.split("\n") if l.startswith("data: ")][-1][6:])
+        self.assertIn(last.get("status"), ["success", "failed"])
+        # resumed after the final event: closed right away
+        for last_event_id in [last.get("id"), last.get("id") + 10]:
+            t_start = time.time()
+            r2 = self.app.get(
+                "/api/v1/packages/status/{}/events".format(
+                    rd.get("package_process_uuid")),
+                headers={"Last-Event-ID": str(last_event_id)})
+            self.assertEqual(r2.status_code, 200)
+            self.assertEqual(r2.get_data(as_text=True), "")
+            self.assertLess(time.time() - t_start, 5)
+        # negative IDs replay the whole stream
+        r2 = self.app.get(
+            "/api/v1/packages/status/{}/events".format(
+                rd.get("package_process_uuid")),
+            headers={"Last-Event-ID": "-2"})
+        self.assertEqual(r2.get_data(as_text=True), data)
+        r2 = self.app.get(
+            "/api/v1/packages/status/{}/events".format("foo-bar"))
+        self.assertEqual(r2.status_code, 404)
+
     def test_on_packaging_done(self):
         args = MockArgs()
         p = PM.new_packager(args)
         p.result.metadata["_storage_location"] = "testdir/test.tgo"
         with app.test_request_context():
-            s = on_packaging_done(p)
-        self.assertEqual(s, 200)
+            cb = on_packaging_done(p)
+        self.assertEqual(cb.wait(timeout=5.0), 200)
 
     def test_on_unpackaging_done(self):
         args = MockArgs()
         p = PM.new_packager(args)
-        s = on_unpackaging_done(p)
-        self.assertEqual(s, 200)
+        cb = on_unpackaging_done(p)
+        self.assertEqual(cb.wait(timeout=5.0), 200)
 
     def test_ping_v1_endpoint(self):
         # do a call to the ping endpoint
@@ -268,3 +342,164 @@ class TngSdkPackageRestTest(unittest.TestCase):
         self.assertEqual(r1.status_code, 200)
         rd1 = json.loads(r1.get_data(as_text=True))
         self.assertIn("alive_since", rd1)
+        self.assertIn("connection_pools", rd1)
+
+    def test_metrics_v1_endpoint(self):
+        r = self.app.post("/api/v1/packages",
+                          content_type="multipart/form-data",
+                          data={"package": (
+                              open("misc/5gtango-ns-package-example.tgo",
+                                   "rb"), "5gtango-ns-package-example.tgo"),
+                                "skip_store": True})
+        self.assertEqual(r.status_code, 200)
+        rd = json.loads(r.get_data(as_text=True))
+        # wait until the process is done
+        r = self.app.get("/api/v1/packages/status/{}?wait=30&status=running"
+                         .format(rd.get("package_process_uuid")))
+        self.assertEqual(r.status_code, 200)
+        r = self.app.get("/api/v1/metrics")
+        self.assertEqual(r.status_code, 200)
+        self.assertIn("text/plain", r.headers["Content-Type"])
+        m = r.get_data(as_text=True)
+        self.assertIn("# TYPE tng_package_stage_duration_seconds histogram",
+                      m)
+        self.assertIn('tng_package_stage_duration_seconds_count{'
+                      'operation="unpackage",stage="extract"}', m)
+        self.assertIn('tng_package_job_duration_seconds_count{'
+                      'operation="unpackage",status=', m)
+        self.assertIn("tng_package_hashed_bytes_total", m)
+        self.assertIn('tng_package_active_jobs{operation="unpackage"} 0', m)
+        self.assertIn("tng_package_callback_queue_depth 0", m)
+
+    def test_profiles_v1_endpoint(self):
+        def _post(**kwargs):
+            r = self.app.post("/api/v1/packages",
+                              content_type="multipart/form-data",
+                              data=dict(kwargs, package=(
+                                  open("misc/5gtango-ns-package-example.tgo",
+                                       "rb"),
+                                  "5gtango-ns-package-example.tgo"),
+                                  skip_store=True))
+            self.assertEqual(r.status_code, 200)
+            uuid = json.loads(r.get_data(as_text=True)).get(
+                "package_process_uuid")
+            PM.get_packager(uuid).wait_for_status_change("running", 30)
+            return uuid
+        with patch.dict(os.environ, {"PROFILE_DIR": tempfile.mkdtemp()}):
+            # not requested
+            uuid = _post()
+            r = self.app.get("/api/v1/profiles/{}".format(uuid))
+            self.assertEqual(r.status_code, 404)
+            # requested using the form
+            uuid = _post(profile=True)
+            r = self.app.get("/api/v1/profiles/{}".format(uuid))
+            self.assertEqual(r.status_code, 200)
+            r = self.app.get("/api/v1/profiles/{}?format=pstats"
+                             .format(uuid))
+            self.assertEqual(r.status_code, 200)
+            self.assertGreater(len(r.get_data()), 0)
+            # unknown process
+            r = self.app.get("/api/v1/profiles/foo")
+            self.assertEqual(r.status_code, 404)
+
+    def test_package_v1_endpoint_in_memory(self):
+        def _post():
+            r = self.app.post("/api/v1/packages",
+                              content_type="multipart/form-data",
+                              data={"package": (
+                                  open("misc/5gtango-ns-package-example.tgo",
+                                       "rb"),
+                                  "5gtango-ns-package-example.tgo"),
+                                    "skip_store": True})
+            p = PM.get_packager(json.loads(r.get_data(as_text=True)).get(
+                "package_process_uuid"))
+            self.app.get("/api/v1/packages/status/{}?wait=30&status=running"
+                         .format(p.uuid))
+            self.assertEqual(p.status, "success")
+            return p
+        # small uploads are not written to disk
+        p = _post()
+        self.assertIsNotNone(p.package_data)
+        self.assertEqual(p.args.unpackage, "5gtango-ns-package-example.tgo")
+        with patch("tngsdk.package.rest.UNPACK_IN_MEMORY_MAX_BYTES", 0):
+            p = _post()
+        self.assertIsNone(p.package_data)
+        self.assertTrue(p.args.unpackage.startswith(p.workspace.path))
+
+    def test_package_v1_endpoint_unpack_cache(self):
+        UNPACK_CACHE.max_entries = 8
+        UNPACK_CACHE.clear()
+
+        def _post(**kwargs):
+            # offline: other results than the ones of other tests
+            data = {"package": (
+                open("misc/5gtango-ns-package-example.tgo", "rb"),
+                "5gtango-ns-package-example.tgo"),
+                "skip_store": True,
+                "offline": True}
+            data.update(kwargs)
+            r = self.app.post("/api/v1/packages",
+                              content_type="multipart/form-data",
+                              data=data)
+            p = PM.get_packager(json.loads(r.get_data(as_text=True)).get(
+                "package_process_uuid"))
+            self.app.get("/api/v1/packages/status/{}?wait=30&status=running"
+                         .format(p.uuid))
+            self.assertEqual(p.status, "success")
+            return p
+        p1 = _post()
+        self.assertNotIn("_unpack_cache", p1.result.metadata)
+        # same package, same options: cached result
+        p2 = _post()
+        self.assertEqual(p2.result.metadata.get("_unpack_cache"), "hit")
+        self.assertNotIn("extract", [e.get("stage") for e in p2._events])
+        self.assertEqual(p2.result.package_content,
+                         p1.result.package_content)
+        # other options: unpacked again
+        p3 = _post(skip_validation=True)
+        self.assertNotIn("_unpack_cache", p3.result.metadata)
+
+    def test_package_v1_inspect_endpoint(self):
+        n_processes = len(PM.packager_list)
+        r = self.app.post("/api/v1/packages/inspect",
+                          content_type="multipart/form-data",
+                          data={"package": (
+                              open("misc/5gtango-ns-package-example.tgo",
+                                   "rb"), "5gtango-ns-package-example.tgo")})
+        self.assertEqual(r.status_code, 200)
+        rd = json.loads(r.get_data(as_text=True))
+        self.assertEqual(rd.get("vendor"), "eu.5gtango")
+        self.assertEqual(rd.get("package_type"),
+                         "application/vnd.5gtango.package.nsp")
+        self.assertIsNone(rd.get("error_msg"))
+        self.assertEqual(len(rd.get("package_content")), 2)
+        for pc in rd.get("package_content"):
+            self.assertIn("content-type", pc)
+            self.assertGreater(pc.get("size"), pc.get("compressed_size"))
+        # no (un)packaging process started
+        self.assertEqual(len(PM.packager_list), n_processes)
+        # not a package
+        r = self.app.post("/api/v1/packages/inspect",
+                          content_type="multipart/form-data",
+                          data={"package": (
+                              open("misc/callback_mock.py", "rb"),
+                              "callback_mock.py")})
+        self.assertEqual(r.status_code, 400)
+        self.assertIsNotNone(
+            json.loads(r.get_data(as_text=True)).get("error_msg"))
+
+    def test_packager_v1_status_resources(self):
+        r = self.app.post("/api/v1/packages",
+                          content_type="multipart/form-data",
+                          data={"package": (
+                              open("misc/5gtango-ns-package-example.tgo",
+                                   "rb"), "5gtango-ns-package-example.tgo"),
+                                "skip_store": True})
+        uuid = json.loads(r.get_data(as_text=True)).get(
+            "package_process_uuid")
+        r = self.app.get("/api/v1/packages/status/{}?wait=30&status=running"
+                         .format(uuid))
+        rd = json.loads(r.get_data(as_text=True))
+        self.assertIn("resources", rd)
+        self.assertGreater(rd["resources"]["wall_time"], 0)
+        self.assertIn("stages", rd["resources"])
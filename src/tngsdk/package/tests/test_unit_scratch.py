@@ -0,0 +1,176 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import unittest
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from tngsdk.package.cli import parse_args
+from tngsdk.package.packager import PM
+from tngsdk.package.scratch import ScratchSpaceManager, \
+    ScratchQuotaExceededException, OWNER_FILE, WORKSPACE_PREFIX, \
+    estimate_scratch_bytes
+from tngsdk.package.tests.fixtures import misc_file
+
+
+class TngSdkPackageScratchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.sm = ScratchSpaceManager(
+            root=os.path.join(self.root, "disk"),
+            tmpfs_root=os.path.join(self.root, "tmpfs"),
+            tmpfs_max_bytes=1024, quota=0, keep=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _write(self, path, size):
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+
+    def test_workspace_release(self):
+        ws = self.sm.workspace("job1")
+        self.assertTrue(os.path.basename(ws.path).startswith(
+            WORKSPACE_PREFIX + "job1-"))
+        self.assertTrue(os.path.isfile(os.path.join(ws.path, OWNER_FILE)))
+        tmp = ws.mkdtemp()
+        self.assertEqual(os.path.dirname(tmp), ws.path)
+        self._write(os.path.join(tmp, "f"), 100)
+        self.assertIn(ws, self.sm.active())
+        ws.release()
+        ws.release()  # no-op
+        self.assertFalse(os.path.exists(ws.path))
+        self.assertEqual(len(self.sm.active()), 0)
+
+    def test_workspace_placement(self):
+        self.assertEqual(os.path.dirname(
+            self.sm.workspace(expected_bytes=100).path), self.sm.tmpfs_root)
+        self.assertEqual(os.path.dirname(
+            self.sm.workspace(expected_bytes=4096).path), self.sm.root)
+        self.assertEqual(os.path.dirname(
+            self.sm.workspace().path), self.sm.root)
+        self.sm.release_all()
+        self.assertEqual(len(self.sm.active()), 0)
+
+    def test_quota(self):
+        self.sm.quota = 1024
+        with self.assertRaises(ScratchQuotaExceededException):
+            self.sm.workspace(expected_bytes=4096)
+        ws = self.sm.workspace(expected_bytes=512)
+        self._write(os.path.join(ws.mkdtemp(), "f"), 2048)
+        with self.assertRaises(ScratchQuotaExceededException):
+            ws.check_quota()
+        with self.assertRaises(ScratchQuotaExceededException):
+            ws.mkdtemp()
+        ws.release()
+
+    def test_sweep(self):
+        active = self.sm.workspace()
+        # workspace of a process that is gone
+        child = subprocess.Popen([sys.executable, "-c", "pass"])
+        child.wait()
+        dead = self.sm.workspace()
+        with open(os.path.join(dead.path, OWNER_FILE), "w") as f:
+            json.dump({"pid": child.pid, "host": os.uname()[1]}, f)
+        # workspace without owner (e.g., killed while created)
+        unmarked = os.path.join(self.sm.root, WORKSPACE_PREFIX + "x-y")
+        os.makedirs(unmarked)
+        os.utime(unmarked, (time.time() - 3600, time.time() - 3600))
+        removed = self.sm.sweep()
+        self.assertEqual(removed, [dead.path])
+        self.assertTrue(os.path.exists(active.path))
+        self.assertTrue(os.path.exists(unmarked))
+        # workspace of an earlier instance of this process (same PID)
+        self.sm._workspaces.pop(active.path)
+        self.assertEqual(self.sm.sweep(), [active.path])
+
+    def test_sweep_keeps_unrelated_folders(self):
+        # scratch root shared with other programs
+        child = subprocess.Popen([sys.executable, "-c", "pass"])
+        child.wait()
+        unrelated = list()
+        for name in ["my-project", "tng-pkg", WORKSPACE_PREFIX[:-1]]:
+            path = os.path.join(self.sm.root, name)
+            os.makedirs(path)
+            with open(os.path.join(path, "data.txt"), "w") as f:
+                f.write("data")
+            unrelated.append(path)
+        # not ours, even if it looks like a dead workspace
+        with open(os.path.join(unrelated[0], OWNER_FILE), "w") as f:
+            json.dump({"pid": child.pid, "host": os.uname()[1]}, f)
+        for path in unrelated:
+            os.utime(path, (time.time() - 3600, time.time() - 3600))
+        self.assertEqual(self.sm.sweep(), [])
+        for path in unrelated:
+            self.assertTrue(os.path.isfile(os.path.join(path, "data.txt")))
+
+    def test_estimate(self):
+        pkg = misc_file("5gtango-ns-package-example.tgo")
+        self.assertGreater(estimate_scratch_bytes(pkg), os.path.getsize(pkg))
+        self.assertIsNone(estimate_scratch_bytes(None))
+
+
+class TngSdkPackageScratchPackagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sm = ScratchSpaceManager(root=tempfile.mkdtemp(), keep=False)
+        self.args = parse_args(
+            ["-u", misc_file("5gtango-ns-package-example.tgo"),
+             "--skip-validation", "--store-skip"])
+
+    def test_unpackage_removes_workspace(self):
+        ws = self.sm.workspace()
+        p = PM.new_packager(self.args, workspace=ws)
+        p.unpackage()
+        self.assertIsNone(p.result.error)
+        self.assertFalse(os.path.exists(ws.path))
+        # measured before the workspace was removed
+        self.assertGreater(p.resources.get("scratch_bytes"), 0)
+
+    def test_unpackage_quota_exceeded(self):
+        self.sm.quota = 4096
+        ws = self.sm.workspace()
+        p = PM.new_packager(self.args, workspace=ws)
+        p.unpackage()
+        self.assertIn("quota exceeded", p.result.error)
+        self.assertEqual(p.status, "failed")
+        self.assertFalse(os.path.exists(ws.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
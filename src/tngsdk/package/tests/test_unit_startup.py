@@ -0,0 +1,86 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import unittest
+import io
+import logging
+import os
+import sys
+from unittest.mock import patch
+from tngsdk.package.benchmark.startup import import_times, \
+    eager_dependencies
+from tngsdk.package.logger import TangoColoredLogHandler
+
+
+# cumulative import time budget (ms) of 'import tngsdk.package'
+# (incl. the CLI and all packagers), e.g., 350. Wall-clock based,
+# so only checked if set (not on loaded CI machines by default).
+STARTUP_BUDGET_MS = os.environ.get("STARTUP_BUDGET_MS")
+
+
+@unittest.skipIf(sys.version_info < (3, 7),
+                 "python -X importtime needs Python >= 3.7")
+class TngSdkPackageStartupTest(unittest.TestCase):
+
+    def test_lazy_dependencies(self):
+        times = import_times("tngsdk.package")
+        self.assertIn("tngsdk.package.cli", times)
+        self.assertEqual(eager_dependencies(times), [])
+
+    @unittest.skipIf(STARTUP_BUDGET_MS is None,
+                     "set STARTUP_BUDGET_MS to check the import time")
+    def test_import_time_budget(self):
+        budget = int(STARTUP_BUDGET_MS)
+        # best of three to not fail on a busy machine
+        t = min([import_times("tngsdk.package")["tngsdk.package"][1]
+                 for _ in range(3)])
+        self.assertLess(t / 1000.0, budget)
+
+
+class TngSdkPackageColoredLogHandlerTest(unittest.TestCase):
+
+    def test_format_on_first_emit(self):
+        h = TangoColoredLogHandler()
+        self.assertIsNone(h.formatter)
+        out = io.StringIO()
+        logger = logging.getLogger("tango.test_unit_startup")
+        logger.propagate = False
+        logger.addHandler(h)
+        try:
+            with patch.object(sys, "stderr", out):
+                logger.warning("hello %s", "world")
+        finally:
+            logger.removeHandler(h)
+        self.assertIsNotNone(h.formatter)
+        self.assertIn("tango.test_unit_startup", out.getvalue())
+        self.assertIn("WARNING hello world", out.getvalue())
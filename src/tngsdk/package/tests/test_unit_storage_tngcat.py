@@ -32,13 +32,22 @@
 
 
 import unittest
+import threading
+import time
+import os
+import tempfile
 from unittest.mock import patch
 from requests.exceptions import RequestException
-from requests import get as real_get
+from requests import Session
 from tngsdk.package.cli import parse_args
 from tngsdk.package.packager import PM
+from tngsdk.package.tracing import TRACER, Trace
 from tngsdk.package.storage.tngcat import TangoCatalogBackend
-from tngsdk.package.storage.tngcat import mime_to_pltfrm
+from tngsdk.package.storage.tngcat import mime_to_pltfrm, UPLOAD_INDEX, \
+    EXISTS_CACHE
+from tngsdk.package.storage import StorageBackendUploadException, \
+    StorageBackendDuplicatedException
+from tngsdk.package.helper import PackageArchive, MemoryFile
 from tngsdk.package.tests.fixtures import misc_file
 
 
@@ -74,21 +83,26 @@ class MockArgs(object):
         return self.__dict__.get(key)
 
 
-def mock_requests_post(url, **kwargs):
+real_get = Session.get
+
+
+def mock_requests_post(session, url, **kwargs):
     if ("http://127.0.0.1:4011/catalogues/api/v2/" not in url
             and "http://tng-cat:4011/catalogues/api/v2/" not in url):
         raise RequestException("bad url received in mock")
     assert(kwargs.get("data") is not None)
+    # uploads are streamed, never loaded into memory
+    assert(not isinstance(kwargs.get("data"), bytes))
     assert(kwargs.get("headers") is not None)
     mr = MockResponsePost()
     return mr
 
 
-def mock_requests_get(url, **kwargs):
+def mock_requests_get(session, url, **kwargs):
     if ("http://127.0.0.1:4011/catalogues/api/v2/" not in url
             and "http://tng-cat:4011/catalogues/api/v2/" not in url):
         # do real request if no cat url
-        return real_get(url)
+        return real_get(session, url)
     assert(kwargs.get("headers") is not None)
     mr = MockResponseGet()
     return mr
@@ -98,8 +112,8 @@ class TngSdkPackageStorageTngCatTest(unittest.TestCase):
 
     def setUp(self):
         # configure mocks
-        self.patcher = patch("requests.post", mock_requests_post)
-        self.patcher2 = patch("requests.get", mock_requests_get)
+        self.patcher = patch("requests.Session.post", mock_requests_post)
+        self.patcher2 = patch("requests.Session.get", mock_requests_get)
         # we need a packager to setup a environment to work on
         self.default_args = parse_args([])
         self.default_args.unpackage = misc_file(
@@ -112,10 +126,17 @@ class TngSdkPackageStorageTngCatTest(unittest.TestCase):
         # patch the requests lib to not do real requests
         self.patcher.start()
         self.patcher2.start()
+        UPLOAD_INDEX.clear()
+        EXISTS_CACHE.clear()
+        # each test uses its own upload journals
+        self.env_patcher = patch.dict(
+            os.environ, {"CATALOGUE_JOURNAL_DIR": tempfile.mkdtemp()})
+        self.env_patcher.start()
 
     def tearDown(self):
         self.patcher.stop()
         self.patcher2.stop()
+        self.env_patcher.stop()
 
     def test_init(self):
         tcb = TangoCatalogBackend(MockArgs())
@@ -138,6 +159,338 @@ class TngSdkPackageStorageTngCatTest(unittest.TestCase):
         self.assertEqual(new_napdr.metadata.get("_storage_uuid"), "1111")
         self.assertIsNotNone(new_napdr.metadata.get("_storage_location"))
 
+    def test_store_traced_uploads(self):
+        tcb = TangoCatalogBackend(MockArgs())
+        napdr = self.p._do_unpackage()
+        wd = napdr.metadata.get("_napd_path").replace(
+            "/TOSCA-Metadata/NAPD.yaml", "")
+        trace = Trace("test-trace")
+        with TRACER.span("store", trace=trace) as parent:
+            tcb.store(napdr, wd, self.default_args.unpackage)
+        uploads = [s for s in trace.spans if s.name == "upload"]
+        self.assertGreater(len(uploads), 1)
+        for s in uploads:
+            self.assertEqual(s.parent_id, parent.span_id)
+            self.assertEqual(s.status, "ok")
+            self.assertIn("file", s.attributes)
+            self.assertIn("uuid", s.attributes)
+        self.assertIn("pkg", [s.attributes["kind"] for s in uploads])
+
+    def test_store_concurrent_uploads(self):
+        tcb = TangoCatalogBackend(MockArgs())
+        # use an own upload limit for this test
+        tcb.cat_url = "http://tng-cat:4011/catalogues/api/v2/limit-test"
+        tcb.max_concurrent_uploads = 2
+        napdr = self.p._do_unpackage()
+        wd = napdr.metadata.get("_napd_path").replace(
+            "TOSCA-Metadata/NAPD.yaml", "")
+        lock = threading.Lock()
+        state = {"active": 0, "max_active": 0, "kinds": list()}
+
+        def mock_upload_artifact(kind, mime, path, checksum=None):
+            with lock:
+                state["active"] += 1
+                state["max_active"] = max(
+                    state["max_active"], state["active"])
+                state["kinds"].append(kind)
+            time.sleep(0.01)
+            with lock:
+                state["active"] -= 1
+            return "uuid-{}".format(os.path.basename(path))
+
+        tcb._upload_artifact = mock_upload_artifact
+        tcb.check_duplicate = lambda *args: None
+        new_napdr = tcb.store(napdr, wd, self.default_args.unpackage)
+        self.assertLessEqual(state["max_active"], 2)
+        self.assertGreater(state["max_active"], 1)
+        self.assertIn("pkg", state["kinds"])
+        self.assertEqual(
+            new_napdr.package_file_uuid,
+            "uuid-eu.5gtango.mixed-ns-package-example.0.1.tgo")
+        # every uploaded artifact is annotated with its own UUID
+        uploaded = [pc for pc in new_napdr.package_content
+                    if pc.get("uuid") is not None]
+        self.assertEqual(len(uploaded), len(state["kinds"]) - 1)
+        for pc in uploaded:
+            self.assertEqual(
+                pc.get("uuid"),
+                "uuid-{}".format(os.path.basename(pc.get("source"))))
+
+    def test_store_from_archive(self):
+        tcb = TangoCatalogBackend(MockArgs())
+        tcb.check_duplicate = lambda *args: None
+        uploaded = dict()
+
+        def mock_upload_artifact(kind, mime, path, checksum=None):
+            with path.open() as f:
+                uploaded[str(path)] = (kind, len(f.read()), checksum)
+            return "uuid-{}".format(os.path.basename(str(path)))
+
+        tcb._upload_artifact = mock_upload_artifact
+        with open(self.default_args.unpackage, "rb") as f:
+            pkg_file = MemoryFile(
+                os.path.basename(self.default_args.unpackage), f.read())
+        with PackageArchive(self.default_args.unpackage) as archive:
+            napdr = self.p.collect_metadata_from_archive(archive)
+            new_napdr = tcb.store(napdr, archive, pkg_file)
+        # package file and contents are uploaded from memory
+        self.assertEqual(uploaded[str(pkg_file)][1], pkg_file.size)
+        self.assertEqual(new_napdr.package_file_name, str(pkg_file))
+        annotated = [pc for pc in new_napdr.package_content
+                     if pc.get("uuid") is not None]
+        self.assertEqual(len(annotated), len(uploaded) - 1)
+        for pc in annotated:
+            self.assertEqual(
+                pc.get("uuid"),
+                "uuid-{}".format(os.path.basename(pc.get("source"))))
+        for pc in new_napdr.package_content:
+            self.assertIsNotNone(pc.get("id"))
+        generic = [u for u in uploaded.values() if u[0] == "generic"]
+        self.assertGreater(len(generic), 0)
+        for _, _, checksum in generic:
+            self.assertIsNotNone(checksum)
+
+    def test_store_fail_fast(self):
+        tcb = TangoCatalogBackend(MockArgs())
+        tcb.cat_url = "http://tng-cat:4011/catalogues/api/v2/fail-test"
+        tcb.max_concurrent_uploads = 1
+        napdr = self.p._do_unpackage()
+        wd = napdr.metadata.get("_napd_path").replace(
+            "/TOSCA-Metadata/NAPD.yaml", "")
+        calls = list()
+
+        def mock_upload_artifact(kind, mime, path, checksum=None):
+            calls.append(path)
+            raise StorageBackendUploadException("upload failed")
+
+        tcb._upload_artifact = mock_upload_artifact
+        tcb.check_duplicate = lambda *args: None
+        tcb._post_package_descriptor = None  # must never be called
+        with self.assertRaises(StorageBackendUploadException):
+            tcb.store(napdr, wd, self.default_args.unpackage)
+        # all other uploads have been cancelled
+        self.assertEqual(len(calls), 1)
+
+    def test_store_dedupe_generic_files(self):
+        tcb = TangoCatalogBackend(MockArgs())
+        tcb.dedupe = True
+        tcb.dedupe_verify = True
+        napdr = self.p._do_unpackage()
+        wd = napdr.metadata.get("_napd_path").replace(
+            "/TOSCA-Metadata/NAPD.yaml", "")
+        posted = list()
+        real_post_generic = tcb._post_generic_file_to_catalog
+
+        def mock_post_generic(endpoint, path, arg_params=None):
+            posted.append(path)
+            return real_post_generic(endpoint, path, arg_params=arg_params)
+
+        tcb._post_generic_file_to_catalog = mock_post_generic
+        tcb._file_exists = lambda uuid: True
+        tcb.check_duplicate = lambda *args: None
+        tcb.store(napdr, wd, self.default_args.unpackage)
+        self.assertGreater(len(posted), 0)
+        num_uploaded = len(posted)
+        # second time: all generic files are known, nothing is uploaded
+        napdr = self.p._do_unpackage()
+        tcb.store(napdr, wd, self.default_args.unpackage)
+        self.assertEqual(len(posted), num_uploaded)
+        self.assertGreaterEqual(UPLOAD_INDEX.hits, num_uploaded)
+        # file was deleted from catalog: upload again
+        tcb._file_exists = lambda uuid: False
+        napdr = self.p._do_unpackage()
+        tcb.store(napdr, wd, self.default_args.unpackage)
+        self.assertEqual(len(posted), 2 * num_uploaded)
+
+    def test_store_dedupe_untrusted_checksums(self):
+        args = MockArgs()
+        args.no_checksums = True  # checksum mismatches are tolerated
+        tcb = TangoCatalogBackend(args)
+        tcb.dedupe = True
+        tcb.dedupe_verify = False
+        tcb.check_duplicate = lambda *args: None
+        napdr = self.p._do_unpackage()
+        wd = napdr.metadata.get("_napd_path").replace(
+            "/TOSCA-Metadata/NAPD.yaml", "")
+        # the package claims the hashes of other known uploads
+        for pc in napdr.package_content:
+            pc["algorithm"], pc["hash"] = "SHA-256", "ab" * 32
+            UPLOAD_INDEX.put(tcb._get_upload_index_key(
+                pc.get("content-type"), None,
+                (pc.get("algorithm"), pc.get("hash"))), "other-uuid")
+        posted = list()
+        real_post_generic = tcb._post_generic_file_to_catalog
+
+        def mock_post_generic(endpoint, path, arg_params=None):
+            posted.append(path)
+            return real_post_generic(endpoint, path, arg_params=arg_params)
+
+        tcb._post_generic_file_to_catalog = mock_post_generic
+        new_napdr = tcb.store(napdr, wd, self.default_args.unpackage)
+        self.assertGreater(len(posted), 0)
+        self.assertNotIn("other-uuid",
+                         [pc.get("uuid") for pc in new_napdr.package_content])
+
+    def test_upload_index_key(self):
+        tcb = TangoCatalogBackend(MockArgs())
+        path = misc_file("5gtango-ns-package-example.tgo")
+        key = tcb._get_upload_index_key("application/octet-stream", path)
+        self.assertEqual(key, tcb._get_upload_index_key(
+            "application/octet-stream", path))
+        # same content, other platform or MIME type
+        self.assertNotEqual(key, tcb._get_upload_index_key(
+            "application/vnd.etsi.osm.cloud-init", path))
+        self.assertNotEqual(key, tcb._get_upload_index_key(
+            "text/plain", path))
+
+    def test_store_resume_from_journal(self):
+        tcb = TangoCatalogBackend(MockArgs())
+        tcb.cat_url = "http://tng-cat:4011/catalogues/api/v2/journal-test"
+        tcb.max_concurrent_uploads = 1
+        tcb.check_duplicate = lambda *args: None
+        napdr = self.p._do_unpackage()
+        wd = napdr.metadata.get("_napd_path").replace(
+            "TOSCA-Metadata/NAPD.yaml", "")
+        calls = list()
+
+        def mock_upload_artifact(kind, mime, path, checksum=None):
+            if len(calls) == 3:
+                raise StorageBackendUploadException("upload failed")
+            calls.append(path)
+            return "uuid-{}".format(os.path.basename(path))
+
+        tcb._upload_artifact = mock_upload_artifact
+        with self.assertRaises(StorageBackendUploadException):
+            tcb.store(napdr, wd, self.default_args.unpackage)
+        self.assertEqual(len(calls), 3)
+        # retry (new job): completed uploads are not repeated
+        retry_calls = list()
+
+        def mock_upload_artifact_retry(kind, mime, path, checksum=None):
+            self.assertNotIn(path.replace(wd, ""),
+                             [c.replace(wd, "") for c in calls])
+            retry_calls.append(path)
+            return "uuid-{}".format(os.path.basename(path))
+
+        tcb2 = TangoCatalogBackend(MockArgs())
+        tcb2.cat_url = tcb.cat_url
+        tcb2.check_duplicate = lambda *args: None
+        tcb2._upload_artifact = mock_upload_artifact_retry
+        checked = list()
+        tcb2._uuid_exists = lambda e, uuid: checked.append(uuid) or True
+        napdr = self.p._do_unpackage()
+        wd = napdr.metadata.get("_napd_path").replace(
+            "TOSCA-Metadata/NAPD.yaml", "")
+        new_napdr = tcb2.store(napdr, wd, self.default_args.unpackage)
+        self.assertGreater(len(retry_calls), 0)
+        self.assertEqual(
+            new_napdr.package_file_uuid,
+            "uuid-eu.5gtango.mixed-ns-package-example.0.1.tgo")
+        # journaled UUIDs were checked before reusing them
+        self.assertEqual(len(checked), 3)
+        # journal is removed after success
+        self.assertEqual(len(os.listdir(tcb2.journal_dir)), 0)
+
+    def test_store_resume_stale_journal_entries(self):
+        tcb = TangoCatalogBackend(MockArgs())
+        tcb.check_duplicate = lambda *args: None
+        napdr = self.p._do_unpackage()
+        wd = napdr.metadata.get("_napd_path").replace(
+            "TOSCA-Metadata/NAPD.yaml", "")
+        journal = tcb._open_journal(self.default_args.unpackage)
+        journal.record("pkg", "deleted-uuid")
+        uploads = list()
+
+        def mock_upload_artifact(kind, mime, path, checksum=None):
+            uploads.append(kind)
+            return "uuid-{}".format(os.path.basename(str(path)))
+
+        tcb._upload_artifact = mock_upload_artifact
+        # package file was deleted from the catalog since
+        tcb._uuid_exists = lambda endpoint, uuid: (
+            endpoint != "/tgo-packages")
+        new_napdr = tcb.store(napdr, wd, self.default_args.unpackage)
+        self.assertIn("pkg", uploads)
+        self.assertEqual(
+            new_napdr.package_file_uuid,
+            "uuid-eu.5gtango.mixed-ns-package-example.0.1.tgo")
+
+    def test_expired_journals_removed(self):
+        tcb = TangoCatalogBackend(MockArgs())
+        tcb.journal_max_age = 3600
+        old = tcb._open_journal(misc_file("5gtango-ns-package-example.tgo"))
+        old.record("pkg", "old-uuid")
+        os.utime(old.path, (time.time() - 7200, time.time() - 7200))
+        recent = tcb._open_journal(misc_file(
+            "eu.5gtango.mixed-ns-package-example.0.1.tgo"))
+        recent.record("pkg", "recent-uuid")
+        other = os.path.join(tcb.journal_dir, "other.txt")
+        open(other, "w").close()
+        os.utime(other, (time.time() - 7200, time.time() - 7200))
+        # opening any journal sweeps expired ones
+        self.assertEqual(len(tcb._open_journal(
+            misc_file("5gtango-ns-package-example.tgo"))), 0)
+        self.assertFalse(os.path.exists(old.path))
+        self.assertTrue(os.path.exists(recent.path))
+        self.assertTrue(os.path.exists(other))
+
+    def test_check_duplicate(self):
+        tcb = TangoCatalogBackend(MockArgs())
+        requested = list()
+
+        def mock_get_artifact(vendor, name, version, endpoint="/packages"):
+            requested.append((vendor, name, version))
+            if name == "existing":
+                return [{"uuid": "3333"}]
+            return []
+
+        tcb._get_artifact = mock_get_artifact
+        tcb.check_duplicate("eu.5gtango", "new", "0.1")
+        with self.assertRaises(StorageBackendDuplicatedException):
+            tcb.check_duplicate("eu.5gtango", "existing", "0.1")
+        # found packages are answered from cache
+        with self.assertRaises(StorageBackendDuplicatedException):
+            tcb.check_duplicate("eu.5gtango", "existing", "0.1")
+        self.assertEqual(len(requested), 2)
+        # 'not found' is never cached (concurrent uploads)
+        tcb.check_duplicate("eu.5gtango", "new", "0.1")
+        self.assertEqual(len(requested), 3)
+        # expired entries are requested again
+        EXISTS_CACHE.ttl = 0
+        try:
+            with self.assertRaises(StorageBackendDuplicatedException):
+                tcb.check_duplicate("eu.5gtango", "existing", "0.1")
+        finally:
+            EXISTS_CACHE.ttl = 10.0
+        self.assertEqual(len(requested), 4)
+
+    def test_store_rechecks_duplicate(self):
+        # a second upload of the same package, started while the
+        # first one was running, passed the early check
+        tcb = TangoCatalogBackend(MockArgs())
+        napdr = self.p._do_unpackage()
+        wd = napdr.metadata.get("_napd_path").replace(
+            "/TOSCA-Metadata/NAPD.yaml", "")
+        tcb.check_duplicate(napdr.vendor, napdr.name, napdr.version)
+        # ... the first upload completed meanwhile
+        tcb._get_artifact = lambda *args, **kwargs: [{"uuid": "3333"}]
+        uploads = list()
+        tcb._run_uploads = lambda u, *args: uploads.extend(u)
+        with self.assertRaises(StorageBackendDuplicatedException):
+            tcb.store(napdr, wd, self.default_args.unpackage)
+        self.assertEqual(uploads, [])
+
+    def test_store_updates_exists_cache(self):
+        tcb = TangoCatalogBackend(MockArgs())
+        napdr = self.p._do_unpackage()
+        wd = napdr.metadata.get("_napd_path").replace(
+            "/TOSCA-Metadata/NAPD.yaml", "")
+        tcb.store(napdr, wd, self.default_args.unpackage)
+        # package is known now: no catalog request needed
+        tcb._get_artifact = None
+        with self.assertRaises(StorageBackendDuplicatedException):
+            tcb.check_duplicate(napdr.vendor, napdr.name, napdr.version)
+
     def test_file_match(self):
         tcb = TangoCatalogBackend(MockArgs())
         self.assertIsNotNone(tcb)
@@ -0,0 +1,121 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import unittest
+import json
+import os
+import logging
+import tempfile
+from tngsdk.package.tracing import Tracer, Trace, JsonFileSpanExporter, \
+    InMemorySpanExporter, NOOP_SPAN, TRACER
+from tngsdk.package.logger import TangoJsonLogHandler
+from tngsdk.package.packager import PM
+from tngsdk.package.cli import parse_args
+from tngsdk.package.tests.fixtures import misc_file
+
+
+class TngSdkPackageTracingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.exporter = InMemorySpanExporter()
+        self.tracer = Tracer(exporter=self.exporter)
+
+    def test_span_tree(self):
+        trace = Trace("t1", tracer=self.tracer)
+        with self.tracer.span("packager", trace=trace, file="a.tgo") as r:
+            self.assertIs(self.tracer.current_span(), r)
+            with self.tracer.span("extract"):
+                pass
+            for _ in range(2):
+                with self.tracer.span("upload", size=10) as u:
+                    self.assertEqual(u.parent_id, r.span_id)
+            with self.assertRaises(ValueError):
+                with self.tracer.span("store"):
+                    raise ValueError("boom")
+        self.assertIsNone(self.tracer.current_span())
+        self.assertEqual(len(self.exporter.spans), 5)
+        d = self.exporter.spans[-1].to_dict()
+        self.assertEqual(d["trace_id"], "t1")
+        self.assertEqual(d["attributes"]["file"], "a.tgo")
+        self.assertEqual(self.exporter.spans[-2].status, "error")
+        rows = trace.breakdown()
+        self.assertEqual([(r["depth"], r["name"], r["count"], r["errors"])
+                          for r in rows],
+                         [(0, "packager", 1, 0), (1, "extract", 1, 0),
+                          (1, "upload", 2, 0), (1, "store", 1, 1)])
+
+    def test_no_trace(self):
+        # spans without a trace are not recorded
+        with self.tracer.span("orphan") as s:
+            self.assertIs(s, NOOP_SPAN)
+        self.assertEqual(len(self.exporter.spans), 0)
+
+    def test_file_exporter(self):
+        path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+        tracer = Tracer(exporter=JsonFileSpanExporter(path))
+        trace = Trace("t2", tracer=tracer)
+        with tracer.span("packager", trace=trace):
+            with tracer.span("zip"):
+                pass
+        with open(path) as f:
+            spans = [json.loads(l) for l in f]
+        self.assertEqual([s["name"] for s in spans], ["zip", "packager"])
+        self.assertEqual(spans[0]["parent_id"], spans[1]["span_id"])
+
+    def test_log_lines_linked(self):
+        trace = Trace("t3")
+        record = logging.LogRecord("x", logging.INFO, "f", 1, "msg",
+                                   None, None)
+        with TRACER.span("packager", trace=trace) as s:
+            d = TangoJsonLogHandler()._to_tango_dict(record)
+        self.assertEqual(d["trace_id"], "t3")
+        self.assertEqual(d["span_id"], s.span_id)
+        d = TangoJsonLogHandler()._to_tango_dict(record)
+        self.assertNotIn("trace_id", d)
+
+    def test_unpackage_trace(self):
+        args = parse_args(["-u", misc_file("5gtango-ns-package-example.tgo"),
+                           "--offline", "--skip-validation", "--store-skip"])
+        p = PM.new_packager(args)
+        p.unpackage()
+        names = [s.name for s in p.trace.spans]
+        self.assertIn("extract", names)
+        self.assertIn("collect_metadata", names)
+        self.assertIn("validate_checksums", names)
+        root = p.trace.spans[-1]
+        self.assertEqual(root.name, "packager")
+        self.assertEqual(root.trace_id, str(p.uuid))
+        self.assertEqual(root.attributes["status"], "success")
+        self.assertGreater(root.attributes["size"], 0)
+        for s in p.trace.spans[:-1]:
+            self.assertEqual(s.parent_id, root.span_id)
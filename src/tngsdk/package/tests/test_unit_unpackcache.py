@@ -0,0 +1,110 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from tngsdk.package.cli import parse_args
+from tngsdk.package.packager import PM
+from tngsdk.package.packager.packager import NapdRecord
+from tngsdk.package.storage.tngprj import TangoProjectFilesystemBackend
+from tngsdk.package.tests.fixtures import misc_file
+from tngsdk.package.unpackcache import UnpackResultCache
+
+
+class TngSdkPackageUnpackCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = UnpackResultCache(max_entries=2)
+
+    def test_get_put(self):
+        k = self.cache.key("abc", offline=True, validation_level="t")
+        self.assertEqual(
+            k, self.cache.key("abc", validation_level="t", offline=True))
+        self.assertIsNone(self.cache.get(k))
+        nr = NapdRecord(name="pkg", metadata={"_storage_location": "/x"})
+        self.cache.put(k, nr)
+        r = self.cache.get(k)
+        self.assertEqual(r.name, "pkg")
+        self.assertNotIn("_storage_location", r.metadata)
+        # copies: changes do not affect the cache
+        r.name = "other"
+        self.assertEqual(self.cache.get(k).name, "pkg")
+
+    def test_evict_least_recently_used(self):
+        for k in ["k1", "k2"]:
+            self.cache.put(k, NapdRecord(name=k))
+        self.assertIsNotNone(self.cache.get("k1"))
+        self.cache.put("k3", NapdRecord(name="k3"))
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get("k2"))
+        self.assertIsNotNone(self.cache.get("k1"))
+        # disabled
+        self.cache.max_entries = 0
+        self.assertFalse(self.cache.enabled)
+
+
+class TngSdkPackageUnpackCachePackagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = UnpackResultCache(max_entries=8)
+
+    def _unpackage(self, pkg_name):
+        args = parse_args(["--offline"])
+        args.unpackage = misc_file(pkg_name)
+        args.output = tempfile.mkdtemp()
+        p = PM.new_packager(
+            args, pkg_format="eu.5gtango",
+            storage_backend=TangoProjectFilesystemBackend(args))
+        p.unpack_cache = self.cache
+        return p._do_unpackage()
+
+    def test_unpackage_cached_result_is_stored(self):
+        r1 = self._unpackage("5gtango-ns-package-example.tgo")
+        self.assertIsNone(r1.error)
+        with patch("tngsdk.package.packager.tango_packager"
+                   + ".extract_zip_file_to_temp") as m:
+            r2 = self._unpackage("5gtango-ns-package-example.tgo")
+            m.assert_not_called()
+        self.assertIsNone(r2.error)
+        self.assertEqual(r2.metadata.get("_unpack_cache"), "hit")
+        # stored again (by the storage backend)
+        self.assertTrue(os.path.exists(r2.metadata["_storage_location"]))
+        self.assertNotEqual(r1.metadata["_storage_location"],
+                            r2.metadata["_storage_location"])
+
+    def test_unpackage_cached_error(self):
+        r1 = self._unpackage("5gtango-ns-package-example-bad-checksum.tgo")
+        self.assertIn("Checksum mismatch!", r1.error)
+        r2 = self._unpackage("5gtango-ns-package-example-bad-checksum.tgo")
+        self.assertEqual(r2.metadata.get("_unpack_cache"), "hit")
+        self.assertEqual(r2.error, r1.error)
@@ -0,0 +1,180 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import unittest
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from unittest.mock import patch
+import tngsdk.package.cli as cli
+import tngsdk.package.verify as verify
+from tngsdk.package.logger import TangoLogger, JSON_LOG_WRITER
+from tngsdk.package.tests.fixtures import misc_file
+from tngsdk.package.verify import verify_package, verify_packages, \
+    read_package_list
+
+
+GOOD = misc_file("5gtango-ns-package-example.tgo")
+BAD_CHECKSUM = misc_file("5gtango-ns-package-example-bad-checksum.tgo")
+MALFORMED = misc_file("5gtango-ns-package-example-malformed.tgo")
+NO_PACKAGE = misc_file("callback_mock.py")
+
+
+class TngSdkPackageVerifyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.args = cli.parse_args(["--verify", GOOD])
+
+    def test_verify_package(self):
+        r = verify_package(GOOD, self.args)
+        self.assertEqual(r["status"], "valid")
+        self.assertEqual(r["exit_code"], 0)
+        self.assertEqual(r["errors"], [])
+        self.assertEqual(r["name"], "5gtango-project-sample")
+        self.assertEqual(r["artifacts"], 2)
+        self.assertGreater(r["bytes_hashed"], 0)
+        # hashing with multiple threads
+        r2 = verify_package(GOOD, self.args, workers=4)
+        self.assertEqual(r2["bytes_hashed"], r["bytes_hashed"])
+
+    def test_verify_package_invalid(self):
+        r = verify_package(BAD_CHECKSUM, self.args)
+        self.assertEqual(r["status"], "invalid")
+        self.assertEqual(r["exit_code"], 1)
+        self.assertEqual(len(r["errors"]), 1)
+        self.assertIn("Checksum mismatch!", r["errors"][0])
+        # all problems are reported, not only the first one
+        r = verify_package(MALFORMED, self.args, workers=4)
+        self.assertEqual(r["status"], "invalid")
+        self.assertEqual(len(r["errors"]), 4)
+        self.assertTrue(any(["File not found" in e for e in r["errors"]]))
+
+    def test_verify_package_error(self):
+        for path in [NO_PACKAGE, "/does/not/exist.tgo"]:
+            r = verify_package(path, self.args)
+            self.assertEqual(r["status"], "error")
+            self.assertEqual(r["exit_code"], 2)
+            self.assertEqual(len(r["errors"]), 1)
+
+    def test_verify_packages_parallel(self):
+        paths = [GOOD, BAD_CHECKSUM, NO_PACKAGE, MALFORMED] * 3
+        reports = list(verify_packages(paths, self.args, workers=2))
+        # same order as the inputs
+        self.assertEqual([r["package"] for r in reports], paths)
+        self.assertEqual([r["exit_code"] for r in reports[:4]],
+                         [0, 1, 2, 1])
+
+    def test_read_package_list(self):
+        stdin = io.StringIO("{}\n\n{}\n".format(GOOD, MALFORMED))
+        self.assertEqual(
+            read_package_list([BAD_CHECKSUM, "-"], stdin=stdin),
+            [BAD_CHECKSUM, GOOD, MALFORMED])
+
+    def test_cli_verify(self):
+        report = os.path.join(tempfile.mkdtemp(), "report.json")
+        args = cli.parse_args(["--verify", GOOD, GOOD,
+                               "--verify-report", report])
+        self.assertEqual(cli.verify(args), 0)
+        args = cli.parse_args(["--verify", GOOD, BAD_CHECKSUM, NO_PACKAGE,
+                               "--verify-workers", "1",
+                               "--verify-report", report])
+        self.assertEqual(cli.verify(args), 2)
+        with open(report) as f:
+            reports = [json.loads(line) for line in f]
+        self.assertEqual([r["status"] for r in reports],
+                         ["valid", "invalid", "error"])
+
+    def test_cli_verify_report_not_mixed_with_json_logs(self):
+        config = TangoLogger._global_config
+        TangoLogger.reconfigure_all_tango_loggers(
+            log_level=logging.INFO, log_json=True)
+        out, err = io.StringIO(), io.StringIO()
+        try:
+            args = cli.parse_args(["--verify", GOOD, NO_PACKAGE,
+                                   "--verify-workers", "1"])
+            with patch.object(sys, "stdout", out), \
+                    patch.object(sys, "stderr", err):
+                self.assertEqual(cli.verify(args), 2)
+        finally:
+            TangoLogger.reconfigure_all_tango_loggers(
+                *(config or (logging.INFO, False)))
+        # stdout: only reports, stderr: JSON log lines
+        reports = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([r["status"] for r in reports], ["valid", "error"])
+        logs = [json.loads(line) for line in err.getvalue().splitlines()]
+        self.assertTrue(any(["Verified 2 packages" in l["message"]
+                             for l in logs]))
+        self.assertIsNone(JSON_LOG_WRITER.stream)
+
+    def test_packager_reused(self):
+        verify._READERS.clear()
+        verify_package(GOOD, self.args)
+        reader = verify._READERS.get(self.args.pkg_format)
+        self.assertIsNotNone(reader)
+        verify_package(BAD_CHECKSUM, self.args)
+        self.assertIs(verify._READERS.get(self.args.pkg_format), reader)
+
+    @unittest.skipUnless(hasattr(os, "register_at_fork"),
+                         "os.register_at_fork needs Python >= 3.7")
+    def test_cli_verify_worker_logs_after_logging(self):
+        # fresh interpreter: JSON log writer used before the
+        # worker processes are forked
+        code = "\n".join([
+            "import sys",
+            "from tngsdk.package import setup_logging, LOG",
+            "from tngsdk.package.cli import parse_args, verify",
+            "setup_logging(parse_args(['--logjson']))",
+            "LOG.info('before verify')",
+            "sys.exit(verify(parse_args(['--logjson', '--verify', {!r}, {!r},"
+            " '--verify-workers', '2'])))".format(BAD_CHECKSUM, BAD_CHECKSUM)])
+        src = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(cli.__file__))))
+        p = subprocess.run([sys.executable, "-c", code],
+                           env=dict(os.environ, PYTHONPATH=src),
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                           timeout=120)
+        self.assertEqual(p.returncode, 1)
+        lines = [json.loads(line) for line in p.stdout.decode().splitlines()]
+        # logged before verify mode was entered
+        self.assertEqual(lines[0].get("message"), "before verify")
+        self.assertEqual([r["status"] for r in lines[1:]],
+                         ["invalid", "invalid"])
+        logs = [json.loads(line) for line in p.stderr.decode().splitlines()]
+        # error records of the workers reach stderr
+        mismatches = [l for l in logs
+                      if l["message"].startswith("Checksum mismatch")]
+        self.assertEqual(len(mismatches), 2)
+        self.assertNotIn("MainProcess",
+                         [l.get("processName") for l in mismatches])
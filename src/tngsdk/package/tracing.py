@@ -0,0 +1,292 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+"""
+Per-job tracing. Each (un)packaging process has a Trace (its
+ID is the UUID of the Packager) that collects a tree of spans:
+packager -> stages (extract, collect_metadata, ...) -> uploads,
+callbacks. Finished spans are handed to a pluggable exporter,
+e.g., a JSON-lines trace file.
+"""
+import contextlib
+import importlib
+import json
+import os
+import threading
+import time
+import uuid
+from tngsdk.package.logger import TangoLogger
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+# upper bound for spans kept in memory per trace
+MAX_SPANS_PER_TRACE = 10000
+
+
+class Span(object):
+
+    def __init__(self, trace, name, parent=None, attributes=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.start = time.time()
+        self.end_time = None
+        self.thread = threading.current_thread().name
+
+    def __repr__(self):
+        return "Span({}, {})".format(self.name, self.span_id)
+
+    @property
+    def trace_id(self):
+        return self.trace.trace_id
+
+    @property
+    def parent_id(self):
+        return self.parent.span_id if self.parent is not None else None
+
+    @property
+    def duration(self):
+        if self.end_time is None:
+            return None
+        return self.end_time - self.start
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, status=None):
+        if self.end_time is not None:
+            return  # already ended
+        if status is not None:
+            self.status = status
+        self.end_time = time.time()
+        self.trace._on_end(self)
+
+    def to_dict(self):
+        return {"trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent_id,
+                "name": self.name,
+                "start": self.start,
+                "end": self.end_time,
+                "duration": self.duration,
+                "status": self.status,
+                "thread": self.thread,
+                "attributes": self.attributes}
+
+
+class _NoopSpan(object):
+    """
+    Used if there is no trace to add a span to.
+    """
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def end(self, status=None):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace(object):
+    """
+    All spans of one (un)packaging process.
+    """
+
+    def __init__(self, trace_id, tracer=None):
+        self.trace_id = str(trace_id)
+        self.tracer = tracer if tracer is not None else TRACER
+        self.spans = list()
+        self._lock = threading.Lock()
+
+    def start_span(self, name, parent=None, **attributes):
+        return Span(self, name, parent=parent, attributes=attributes)
+
+    def _on_end(self, span):
+        with self._lock:
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+        self.tracer.export(span)
+
+    def breakdown(self):
+        """
+        Aggregates the finished spans by their path in the
+        span tree. Returns a list of dicts (depth, name, count,
+        total duration) in order of their first start.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        rows = dict()
+        for s in sorted(spans, key=lambda s: s.start):
+            path = list()
+            p = s
+            while p is not None:
+                path.insert(0, p.name)
+                p = p.parent
+            path = tuple(path)
+            r = rows.get(path)
+            if r is None:
+                r = rows[path] = {"path": path,
+                                  "depth": len(path) - 1,
+                                  "name": s.name,
+                                  "count": 0,
+                                  "total": 0.0,
+                                  "errors": 0}
+            r["count"] += 1
+            r["total"] += s.duration or 0.0
+            if s.status != "ok":
+                r["errors"] += 1
+        # children below their parents, ordered by first start
+        order = {p: i for i, p in enumerate(rows.keys())}
+        return sorted(rows.values(), key=lambda r: [
+            order.get(r["path"][:i + 1], 0) for i in range(len(r["path"]))])
+
+
+class JsonFileSpanExporter(object):
+    """
+    Appends finished spans as JSON lines to a file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+class InMemorySpanExporter(object):
+    """
+    Keeps finished spans in memory (tests).
+    """
+
+    def __init__(self):
+        self.spans = list()
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+def _exporter_from_env():
+    """
+    TRACE_EXPORTER: 'file', 'none' or '<module>:<class>'
+    TRACE_FILE: path of the trace file
+    """
+    name = os.environ.get("TRACE_EXPORTER")
+    path = os.environ.get("TRACE_FILE")
+    if name is None:
+        name = "file" if path is not None else "none"
+    if name == "none":
+        return None
+    if name == "file":
+        return JsonFileSpanExporter(path or "tng-sdk-package-traces.jsonl")
+    try:
+        module, cls = name.split(":")
+        return getattr(importlib.import_module(module), cls)()
+    except BaseException as e:
+        LOG.warning("Cannot load trace exporter '%s': %s", name, e)
+    return None
+
+
+class Tracer(object):
+    """
+    Keeps track of the current span of each thread and
+    hands finished spans to the configured exporter.
+    """
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self._context = threading.local()
+
+    def set_exporter(self, exporter):
+        self.exporter = exporter
+
+    def export(self, span):
+        if self.exporter is None:
+            return
+        try:
+            self.exporter.export(span)
+        except BaseException as e:
+            LOG.warning("Could not export span %s: %s", span, e)
+
+    def current_span(self):
+        return getattr(self._context, "span", None)
+
+    def set_current_span(self, span):
+        """
+        Sets the current span of this thread.
+        Returns the previous one.
+        """
+        prev = self.current_span()
+        self._context.span = span
+        return prev
+
+    @contextlib.contextmanager
+    def span(self, name, trace=None, parent=None, **attributes):
+        """
+        Runs the block in a new span. The span is added to the
+        given trace, the trace of the given parent span or the
+        trace of the current span of this thread (in this order).
+        If there is no trace, nothing is recorded.
+        """
+        if parent is None and trace is None:
+            parent = self.current_span()
+        if trace is None and parent is not None:
+            trace = parent.trace
+        if trace is None:
+            yield NOOP_SPAN
+            return
+        s = trace.start_span(name, parent=parent, **attributes)
+        prev = self.set_current_span(s)
+        try:
+            yield s
+        except BaseException as e:
+            s.set_attribute("error", str(e))
+            s.end(status="error")
+            raise
+        finally:
+            s.end()
+            self.set_current_span(prev)
+
+
+# have one global tracer
+TRACER = Tracer(exporter=_exporter_from_env())
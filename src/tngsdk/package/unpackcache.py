@@ -0,0 +1,147 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+"""
+Results of unpackaging processes, by package.
+Clients (e.g., CI pipelines) often upload the same package many
+times. The service keeps the validated NAPDR (or the validation
+error) of a package so that an unchanged package is not extracted
+and validated again: it goes straight to the storage backend or
+fails with the error found before.
+"""
+import collections
+import copy
+import os
+import threading
+from tngsdk.package.logger import TangoLogger
+from tngsdk.package.metrics import METRICS
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        LOG.warning("Invalid value of %s: %s", name, os.environ.get(name))
+        return default
+
+
+class UnpackResultCache(object):
+    """
+    Unpackaging results (NAPDR incl. error) by package checksum and
+    the options that influence the validation (LRU, in memory).
+    Configured by (environment):
+    - UNPACK_CACHE_MAX_ENTRIES: max. number of cached results,
+      least recently used results are removed first (0 = disabled)
+    """
+
+    def __init__(self, max_entries=None):
+        if max_entries is None:
+            max_entries = _env_int("UNPACK_CACHE_MAX_ENTRIES", 128)
+        self.max_entries = max_entries
+        self._results = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._results)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(package_hash, **options):
+        """
+        Key of the result of the package with the given checksum
+        unpacked with the given options (validation level etc.).
+        """
+        return (package_hash,) + tuple(sorted(options.items()))
+
+    def get(self, key):
+        """
+        Returns (a copy of) the NAPDR cached for key or None.
+        """
+        # imported here: avoids a cyclic import (packager uses the cache)
+        from tngsdk.package.packager.packager import NapdRecord
+        with self._lock:
+            data = self._results.get(key)
+            if data is not None:
+                self._results.move_to_end(key)  # recently used
+        if data is None:
+            UNPACK_CACHE_REQUESTS.inc(result="miss")
+            return None
+        UNPACK_CACHE_REQUESTS.inc(result="hit")
+        LOG.debug("Unpack cache hit: %s", key)
+        return NapdRecord(**copy.deepcopy(data))
+
+    def put(self, key, napdr):
+        """
+        Caches (a copy of) the given NAPDR, without the
+        annotations of storage backends.
+        """
+        if not self.enabled:
+            return
+        data = copy.deepcopy(napdr.to_dict())
+        data["metadata"] = {k: v for k, v in data["metadata"].items()
+                            if not k.startswith("_storage")}
+        evicted = 0
+        with self._lock:
+            self._results[key] = data
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+                evicted += 1
+        if evicted > 0:
+            UNPACK_CACHE_EVICTIONS.inc(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+# have one global instance of the cache (used by the service)
+UNPACK_CACHE = UnpackResultCache()
+
+
+UNPACK_CACHE_REQUESTS = METRICS.counter(
+    "tng_package_unpack_cache_requests_total",
+    "Unpack result cache lookups of the service.",
+    ["result"])
+UNPACK_CACHE_EVICTIONS = METRICS.counter(
+    "tng_package_unpack_cache_evictions_total",
+    "Results removed from the unpack result cache (size limit).")
+METRICS.gauge("tng_package_unpack_cache_entries",
+              "Number of results in the unpack result cache.",
+              func=lambda: len(UNPACK_CACHE))
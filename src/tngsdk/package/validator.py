@@ -29,10 +29,8 @@
 # the Horizon 2020 and 5G-PPP programmes. The authors would like to
 # acknowledge the contributions of their colleagues of the SONATA
 # partner consortium (www.5gtango.eu).
-import requests
 import yaml
 import os
-from jsonschema import validate
 from tngsdk.package.logger import TangoLogger
 
 
@@ -75,9 +73,9 @@ def validate_project_with_external_validator(args, project_path):
     # check validation result
     # - warnings
     if v.warning_count > 0:
-        LOG.warning("There have been {} tng-validate warnings"
-                    .format(v.warning_count))
-        LOG.warning("tng-validate warnings: '{}'".format(v.warnings))
+        LOG.warning("There have been %s tng-validate warnings",
+                    v.warning_count)
+        LOG.warning("tng-validate warnings: '%s'", v.warnings)
     # - errors
     if v.error_count > 0:
         raise TangoValidationException("tng-validate error(s): '{}'"
@@ -98,25 +96,26 @@ def validate_yaml_online(data, schema_uri=None):
     if schema_uri is None:
         LOG.error("Cannot find URI pointing to schema.")
         return False
+    # imported here: only needed for online validation
+    import requests
+    from jsonschema import validate
     try:
         # try to download schema
         r = requests.get(schema_uri, timeout=3)
         # try to parse schema
         schema = yaml.load(r.text)
     except BaseException as e:
-        LOG.warning("Couldn't fetch schema from '{}': {}".format(
-            schema_uri, e))
+        LOG.warning("Couldn't fetch schema from '%s': %s", schema_uri, e)
         # ok, no internet? lets try to use a local NAPD schema
         try:
             path = os.path.join(
                 os.path.expanduser("~"),
                 ".tng-schema/package-specification/napd-schema.yml")
-            LOG.info("Using local schema: {}".format(path))
+            LOG.info("Using local schema: %s", path)
             with open(path, "r") as f:
                 schema = yaml.load(f)
         except BaseException as e:
-            LOG.error("Get schema from '{}' or '{}': {}".format(
-                      schema_uri, path, e))
+            LOG.error("Get schema from '%s' or '%s': %s", schema_uri, path, e)
             return False
     try:
         if schema is None:
@@ -124,7 +123,7 @@ def validate_yaml_online(data, schema_uri=None):
         # validate data against schema
         validate(data, schema)
     except BaseException as e:
-        LOG.error("Couldn't validate against schema from '{}': {}".format(
-            schema_uri, e))
+        LOG.error("Couldn't validate against schema from '%s': %s",
+                  schema_uri, e)
         return False
     return True
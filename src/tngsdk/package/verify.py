@@ -0,0 +1,203 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+"""
+Verify-only mode: checks the integrity of many packages at once
+(metadata and artifact checksums) without extracting, validating
+(tng-sdk-validate, online schemas) or storing them.
+Every package gets a machine-readable report (JSON line) with a
+status and exit code:
+- 0 (valid): metadata is usable, all checksums match
+- 1 (invalid): unusable metadata, missing files or checksum mismatches
+- 2 (error): the package cannot be read (e.g., not a ZIP file)
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from tngsdk.package.helper import PackageArchive
+from tngsdk.package.logger import TangoLogger
+from tngsdk.package.packager import PM
+from tngsdk.package.packager.packager import validate_file_checksum
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+VALID = "valid"
+INVALID = "invalid"
+ERROR = "error"
+EXIT_CODES = {VALID: 0, INVALID: 1, ERROR: 2}
+
+
+def _check_content_entry(archive, ce):
+    """
+    Checks a single package_content entry (like
+    _validate_package_content_checksums, but returns
+    the problem instead of raising it).
+    Returns (error or None, bytes hashed).
+    """
+    if "source" not in ce:
+        return "Malformed package_content entry: {}".format(ce), 0
+    if ce.get("algorithm") is None:
+        LOG.warning("Package content without checksum: %s", ce)
+        return None, 0
+    if ce.get("hash") is None:
+        return "Checksum missing: {}".format(ce), 0
+    name = archive.find(ce.get("source"))
+    if name is None:
+        return "Checksum: File not found: {}:{}".format(
+            archive.path, ce.get("source")), 0
+    try:
+        # streamed: members are decompressed and hashed chunk by chunk
+        validate_file_checksum(
+            archive.member(name), ce.get("algorithm"), ce.get("hash"))
+    except BaseException as e:
+        return str(e), 0
+    return None, archive.getinfo(name).file_size
+
+
+# one metadata reader (packager) per format and (worker) process
+_READERS = dict()
+
+
+def _metadata_reader(args):
+    """
+    Packager used to read the metadata of the packages. Created
+    once per process, not per package: only its (stateless)
+    metadata readers and checks are used.
+    """
+    r = _READERS.get(args.pkg_format)
+    if r is None:
+        r = PM.packager_class(args.pkg_format)(args)
+        _READERS[args.pkg_format] = r
+    return r
+
+
+def verify_package(path, args, workers=1):
+    """
+    Verifies a single package file.
+    workers: number of threads hashing its artifacts
+    (hashlib and zlib release the GIL for large buffers).
+    Returns the report (dict).
+    """
+    t_start = time.time()
+    r = {"package": path,
+         "status": VALID,
+         "errors": list()}
+    try:
+        p = _metadata_reader(args)
+        with PackageArchive(path) as archive:
+            napdr = p.collect_metadata_from_archive(archive)
+            r.update({"vendor": napdr.vendor,
+                      "name": napdr.name,
+                      "version": napdr.version,
+                      "package_type": napdr.package_type,
+                      "artifacts": len(napdr.package_content)})
+            if hasattr(p, "_assert_usable_tango_package"):
+                try:
+                    p._assert_usable_tango_package(napdr)
+                except BaseException as e:
+                    r["errors"].append(
+                        "Package metadata unusable: {}".format(e))
+            if workers > 1 and len(napdr.package_content) > 1:
+                with ThreadPoolExecutor(max_workers=workers) as ex:
+                    results = list(ex.map(
+                        lambda ce: _check_content_entry(archive, ce),
+                        napdr.package_content))
+            else:
+                results = [_check_content_entry(archive, ce)
+                           for ce in napdr.package_content]
+        r["errors"].extend([e for e, _ in results if e is not None])
+        r["bytes_hashed"] = sum([b for _, b in results])
+        if len(r["errors"]) > 0:
+            r["status"] = INVALID
+    except BaseException as e:
+        LOG.error("Cannot verify package %s: %s", path, e)
+        r["status"] = ERROR
+        r["errors"].append(str(e))
+    r["exit_code"] = EXIT_CODES[r["status"]]
+    r["duration"] = time.time() - t_start
+    return r
+
+
+def _verify_package_task(task):
+    # top-level function: runs in the worker processes
+    path, args = task
+    return verify_package(path, args)
+
+
+def verify_packages(paths, args, workers=None):
+    """
+    Verifies the given packages using a pool of worker processes
+    (one package per task: parses, decompresses and hashes on all
+    cores). A single package is verified in this process with
+    'workers' threads hashing its artifacts.
+    Yields the reports in the order of the given paths.
+    """
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    if len(paths) == 1 or workers == 1:
+        for path in paths:
+            yield verify_package(
+                path, args, workers=workers if len(paths) == 1 else 1)
+        return
+    # a few tasks per worker and round trip: balances package sizes
+    chunksize = max(1, min(16, len(paths) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for r in ex.map(_verify_package_task,
+                        [(path, args) for path in paths],
+                        chunksize=chunksize):
+            yield r
+
+
+def read_package_list(paths, stdin=None):
+    """
+    Expands '-' in the given list to the paths read
+    from stdin (one per line), e.g., from 'find'.
+    """
+    if stdin is None:
+        stdin = sys.stdin
+    result = list()
+    for path in paths:
+        if path == "-":
+            result.extend([line.strip() for line in stdin
+                           if len(line.strip()) > 0])
+        else:
+            result.append(path)
+    return result
+
+
+def write_report(r, f):
+    f.write(json.dumps(r, sort_keys=True) + "\n")
+    f.flush()